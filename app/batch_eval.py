@@ -0,0 +1,96 @@
+# batch_eval.py
+"""
+Parse-and-evaluate for the forecast cron, runnable inline or in a process pool.
+
+Work sent to the pool stays compact: each spot is a tuple of the fields
+evaluate_surf_quality reads, and the Open-Meteo responses are the undecoded
+JSON bytes, so JSON decoding happens in the worker as well. Rows come back as
+plain tuples in HOURLY_COLUMNS / PACKED_COLUMNS order rather than pickled
+pydantic objects. Alongside the rows each spot returns a small summary dict
+(spot_id and its session windows with the horizon they cover, see
+app/sessions.py).
+"""
+import json
+from typing import List, Optional, Tuple
+
+import pytz
+
+from app.forecast import parse_forecast
+from app.heuristics import evaluate_surf_quality
+from app.registry import SPOT_COLUMNS, SpotRecord
+from app.sessions import horizon_start, session_windows
+from app.storage import (
+    HOURLY_COLUMNS, PACKED_COLUMNS, build_hourly_rows, build_packed_rows, writes_packed,
+)
+
+# What parse/evaluate/row building read from a spot
+EVAL_SPOT_FIELDS = (
+    "id", "name", "timezone", "facing_direction", "swell_min_m",
+    "swell_dir_min", "swell_dir_max", "preferred_wind_wave_max_m",
+)
+
+# (spot name, surf_forecast_hourly rows, surf_forecast_daily rows, summary)
+SpotRows = Tuple[str, List[dict], List[dict], dict]
+
+
+def spot_payload(spot) -> tuple:
+    return tuple(str(spot.id) if f == "id" else getattr(spot, f) for f in EVAL_SPOT_FIELDS)
+
+
+def spot_from_payload(payload: tuple) -> SpotRecord:
+    return SpotRecord({**dict.fromkeys(SPOT_COLUMNS), **dict(zip(EVAL_SPOT_FIELDS, payload))})
+
+
+def evaluate_spot_rows(spot, marine_data: Optional[dict], weather_data: Optional[dict]) -> SpotRows:
+    forecasts = parse_forecast(spot.name, marine_data, weather_data)
+    print(f"[DEBUG] {spot.name} → {len(forecasts)} total valid forecasts from Open-Meteo")
+
+    evaluated = []
+    for f in forecasts:
+        try:
+            evaluated.append((f, evaluate_surf_quality(spot, f)))
+        except Exception as e:
+            print(f"[ERROR] Parsing forecast for {spot.name}: {e}")
+
+    spot_id = str(spot.id)
+    if writes_packed():
+        hourly, packed = [], build_packed_rows(spot_id, evaluated)
+    else:
+        hourly, packed = build_hourly_rows(spot_id, pytz.timezone(spot.timezone), evaluated), []
+    summary = {
+        "spot_id": spot_id,
+        "windows": session_windows(spot_id, evaluated),
+        "since": horizon_start(evaluated),
+    }
+    return spot.name, hourly, packed, summary
+
+
+def evaluate_batch(batch: List[Tuple[tuple, Optional[bytes], Optional[bytes]]]) -> List[tuple]:
+    """
+    Pool entry point: [(spot_payload, marine_bytes, weather_bytes)] →
+    [(name, hourly tuples, packed tuples, summary)].
+    """
+    results = []
+    for payload, marine_raw, weather_raw in batch:
+        spot = spot_from_payload(payload)
+        try:
+            marine_data = json.loads(marine_raw) if marine_raw else None
+            weather_data = json.loads(weather_raw) if weather_raw else None
+            name, hourly, packed, summary = evaluate_spot_rows(spot, marine_data, weather_data)
+        except Exception as e:
+            print(f"[ERROR] Evaluating {spot.name} failed: {e}")
+            continue
+        results.append((
+            name,
+            [tuple(r[c] for c in HOURLY_COLUMNS) for r in hourly],
+            [tuple(r[c] for c in PACKED_COLUMNS) for r in packed],
+            summary,
+        ))
+    return results
+
+
+def rows_from_batch(results: List[tuple]) -> List[SpotRows]:
+    return [
+        (name, [dict(zip(HOURLY_COLUMNS, r)) for r in hourly], [dict(zip(PACKED_COLUMNS, r)) for r in packed], summary)
+        for name, hourly, packed, summary in results
+    ]
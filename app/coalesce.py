@@ -0,0 +1,60 @@
+# coalesce.py
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight fetch instead of
+each running the same query. The fetch runs as its own task, so a caller that
+disconnects does not cancel it for the others.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0     # fetches actually run
+        self.followers = 0   # callers that joined an in-flight fetch
+        self.errors = 0
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        requests = self.leaders + self.followers
+        return {
+            "requests": requests,
+            "fetches": self.leaders,
+            "coalesced": self.followers,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(self.followers / requests, 4) if requests else 0.0,
+        }
+
+
+_flights: Dict[str, SingleFlight] = {}
+
+
+def single_flight(name: str) -> SingleFlight:
+    if name not in _flights:
+        _flights[name] = SingleFlight(name)
+    return _flights[name]
+
+
+def coalescing_stats() -> Dict[str, dict]:
+    return {name: flight.stats() for name, flight in _flights.items()}
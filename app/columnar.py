@@ -0,0 +1,147 @@
+# columnar.py
+"""
+Compact columnar MessagePack encoding for forecast responses.
+
+Clients opt in with `Accept: application/x-msgpack`; everyone else keeps JSON.
+A payload is a MessagePack map holding one entry per column:
+
+- numeric columns are little-endian typed arrays packed as raw bytes
+  (`dtypes` gives each one's numpy dtype string; float NaN means null),
+  so a browser can wrap them in Float32Array / Int8Array without parsing;
+- enum columns (rating, wind_type, wind_severity) are int8 codes into the
+  lists in `dictionaries` (-1 = null);
+- timestamps are a base (epoch seconds, or an ISO date for daily rows) plus
+  an int32/int16 offset column;
+- text columns (names, explanations) are plain MessagePack string arrays.
+"""
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.storage import NULL_CODE, RATINGS, WIND_SEVERITIES, WIND_TYPES, encode
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+    print("[WARNING] msgpack not installed, forecast endpoints will only serve JSON")
+
+MEDIA_TYPE = "application/x-msgpack"
+ACCEPTED_TYPES = (MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack")
+FORMAT_VERSION = 1
+
+DICTIONARIES = {"rating": RATINGS, "wind_type": WIND_TYPES, "wind_severity": WIND_SEVERITIES}
+HOURLY_FLOATS = (
+    "swell_wave_height", "swell_wave_direction", "swell_wave_peak_period",
+    "wind_speed_kmh", "wind_direction_deg", "wind_wave_height_m",
+)
+DAILY_FLOATS = ("swell_wave_height", "swell_wave_peak_period", "wind_speed_kmh", "swell_wave_direction")
+
+
+def wants_columnar(accept: Optional[str]) -> bool:
+    return msgpack is not None and bool(accept) and any(t in accept for t in ACCEPTED_TYPES)
+
+
+class _Columns:
+    def __init__(self, n: int):
+        self.n = n
+        self.columns: Dict[str, object] = {}
+        self.dtypes: Dict[str, str] = {}
+
+    def array(self, name: str, values, dtype):
+        array = np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+        self.columns[name] = array.tobytes()
+        self.dtypes[name] = array.dtype.str
+
+    def floats(self, name: str, values):
+        self.array(name, [np.nan if v is None else v for v in values], "<f4")
+
+    def codes(self, name: str, values):
+        self.array(name, [encode(v, DICTIONARIES[name]) for v in values], "<i1")
+
+    def reason_codes(self, values):
+        self.array("reason_code", [NULL_CODE if v is None else v for v in values], "<i2")
+
+    def pack(self, **meta) -> bytes:
+        return msgpack.packb({
+            "v": FORMAT_VERSION, "n": self.n, **meta,
+            "dtypes": self.dtypes, "dictionaries": DICTIONARIES, "columns": self.columns,
+        }, use_bin_type=True)
+
+
+def encode_spot_forecasts(spot_id, tz_name: str, forecasts: List, explain: bool = False) -> bytes:
+    """get_spot_forecasts' SurfForecast list as columns; `time` is base + int32 seconds."""
+    epochs = [int(datetime.fromisoformat(f.time).timestamp()) for f in forecasts]
+    base = epochs[0] if epochs else 0
+
+    cols = _Columns(len(forecasts))
+    cols.array("time_offset_s", [e - base for e in epochs], "<i4")
+    for name in HOURLY_FLOATS:
+        cols.floats(name, [getattr(f, name) for f in forecasts])
+    cols.codes("rating", [f.rating for f in forecasts])
+    cols.codes("wind_type", [f.wind_type for f in forecasts])
+    cols.codes("wind_severity", [f.wind_severity for f in forecasts])
+    cols.reason_codes([f.reason_code for f in forecasts])
+    if explain:
+        cols.columns["explanation"] = [f.explanation for f in forecasts]
+    return cols.pack(spot_id=str(spot_id), timezone=tz_name, time_base=base)
+
+
+def encode_forecasted_spots(spots: List[dict], explain: bool = False, **meta) -> bytes:
+    """
+    group_daily_best output as two tables: `spots` (one row per spot) and the
+    flattened daily forecasts, linked by a uint32 `spot_index` column.
+    `date` is an ISO base date plus int16 day offsets, `time` minutes since local midnight.
+    Only the keys present in the (possibly projected) entries are encoded.
+    """
+    spot_keys = set(spots[0]) if spots else set()
+    spot_cols = _Columns(len(spots))
+    for name in ("lat", "lon"):
+        if name in spot_keys:
+            spot_cols.array(name, [s[name] for s in spots], "<f8")
+    for name in ("id", "name", "region", "town", "surf_benchmark_url", "timezone"):
+        if name in spot_keys:
+            spot_cols.columns[name] = [None if s.get(name) is None else str(s[name]) for s in spots]
+
+    rows = [(i, f) for i, s in enumerate(spots) for f in s.get("forecasts", [])]
+    keys = set(rows[0][1]) if rows else set()
+
+    cols = _Columns(len(rows))
+    cols.array("spot_index", [i for i, _ in rows], "<u4")
+    if "date" in keys:
+        days = [date.fromisoformat(f["date"]) for _, f in rows]
+        base = min(days)
+        meta["date_base"] = base.isoformat()
+        cols.array("day_offset", [(d - base).days for d in days], "<i2")
+    if "time" in keys:
+        cols.array("minute", [int(f["time"][:2]) * 60 + int(f["time"][3:5]) for _, f in rows], "<i2")
+    for name in DAILY_FLOATS:
+        if name in keys:
+            cols.floats(name, [f.get(name) for _, f in rows])
+    for name in DICTIONARIES:
+        if name in keys:
+            cols.codes(name, [f.get(name) for _, f in rows])
+    if "reason_code" in keys:
+        cols.reason_codes([f.get("reason_code") for _, f in rows])
+    if explain and "explanation" in keys:
+        cols.columns["explanation"] = [f.get("explanation") for _, f in rows]
+
+    return cols.pack(
+        spots={"n": spot_cols.n, "dtypes": spot_cols.dtypes, "columns": spot_cols.columns},
+        **meta,
+    )
+
+
+def decode(payload: bytes) -> dict:
+    """Python-side decoder (tools, tests): typed columns become numpy arrays."""
+    message = msgpack.unpackb(payload, raw=False)
+
+    def arrays(table):
+        for name, dtype in table["dtypes"].items():
+            table["columns"][name] = np.frombuffer(table["columns"][name], dtype=np.dtype(dtype))
+
+    arrays(message)
+    if "spots" in message:
+        arrays(message["spots"])
+    return message
@@ -0,0 +1,125 @@
+# coverage.py
+"""
+Per-spot upstream (Open-Meteo) coverage, as recorded by check_forecast_availability.py.
+
+Some coordinates never get usable marine data (inland or sheltered grid cells,
+variables the marine model doesn't cover there). The probe stores what each spot
+gets back in spot_upstream_coverage (sql/spot_upstream_coverage.sql). The
+forecast cron then skips spots that came back unusable on SKIP_AFTER_PROBES
+probes in a row, and moves degraded spots to the back of its queue.
+"""
+import json
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.forecast import parse_forecast
+
+MARINE_VARIABLES = ("time", "swell_wave_height", "swell_wave_direction", "swell_wave_peak_period",
+                    "wind_wave_height", "swell_wave_period")
+WEATHER_VARIABLES = ("wind_speed_10m", "wind_direction_10m")
+
+OK, DEGRADED, UNUSABLE, UNREACHABLE = "ok", "degraded", "unusable", "unreachable"
+# Share of hours parse_forecast must keep for a spot to count as fully covered
+USABLE_OK_RATIO = 0.9
+SKIP_AFTER_PROBES = 3
+# A skip is only trusted while the probe that set it is this recent
+SKIP_MAX_AGE_DAYS = 14
+
+COVERAGE_UPSERT_SQL = """
+    INSERT INTO spot_upstream_coverage (
+        spot_id, checked_at, status, marine_ok, weather_ok, hours,
+        usable_ratio, missing_vars, null_ratios, consecutive_unusable
+    )
+    VALUES ($1, now(), $2, $3, $4, $5, $6, $7, $8::jsonb, CASE WHEN $2 = 'unusable' THEN 1 ELSE 0 END)
+    ON CONFLICT (spot_id) DO UPDATE SET
+        checked_at = excluded.checked_at,
+        status = excluded.status,
+        marine_ok = excluded.marine_ok,
+        weather_ok = excluded.weather_ok,
+        hours = excluded.hours,
+        usable_ratio = excluded.usable_ratio,
+        missing_vars = excluded.missing_vars,
+        null_ratios = excluded.null_ratios,
+        consecutive_unusable = CASE
+            WHEN excluded.status = 'unusable' THEN spot_upstream_coverage.consecutive_unusable + 1
+            -- An unreachable upstream says nothing about the spot's coverage
+            WHEN excluded.status = 'unreachable' THEN spot_upstream_coverage.consecutive_unusable
+            ELSE 0
+        END
+"""
+COVERAGE_PLAN_SQL = f"""
+    SELECT spot_id, status, consecutive_unusable >= {SKIP_AFTER_PROBES} AS skip
+    FROM spot_upstream_coverage
+    WHERE checked_at > now() - interval '{SKIP_MAX_AGE_DAYS} days'
+      AND (status = '{DEGRADED}' OR consecutive_unusable >= {SKIP_AFTER_PROBES})
+"""
+
+SKIPPED_SPOT_SQL = f"""
+    SELECT EXISTS (
+        SELECT 1 FROM spot_upstream_coverage
+        WHERE spot_id = $1
+          AND checked_at > now() - interval '{SKIP_MAX_AGE_DAYS} days'
+          AND consecutive_unusable >= {SKIP_AFTER_PROBES}
+    )
+"""
+
+
+def _null_ratios(hourly: dict, variables) -> Dict[str, float]:
+    ratios = {}
+    for name in variables:
+        values = hourly.get(name)
+        if values:
+            ratios[name] = round(sum(v is None for v in values) / len(values), 4)
+    return ratios
+
+
+def assess_coverage(spot_name: str, marine_data: Optional[dict], weather_data: Optional[dict]) -> dict:
+    """Coverage summary of one spot's Open-Meteo responses (None = request failed)."""
+    if marine_data is None or weather_data is None:
+        return {"status": UNREACHABLE, "marine_ok": marine_data is not None, "weather_ok": weather_data is not None,
+                "hours": 0, "usable_ratio": None, "missing_vars": [], "null_ratios": {}}
+
+    marine = marine_data.get("hourly", {})
+    weather = weather_data.get("hourly", {})
+    missing = [v for v in MARINE_VARIABLES if v not in marine] + [v for v in WEATHER_VARIABLES if v not in weather]
+    hours = len(marine.get("time") or [])
+    # parse_forecast indexes every variable, so a missing one makes the spot unusable
+    usable = len(parse_forecast(spot_name, marine_data, weather_data)) if hours and not missing else 0
+    ratio = usable / hours if hours else 0.0
+
+    if usable == 0:
+        status = UNUSABLE
+    elif ratio < USABLE_OK_RATIO:
+        status = DEGRADED
+    else:
+        status = OK
+    return {
+        "status": status,
+        "marine_ok": True,
+        "weather_ok": True,
+        "hours": hours,
+        "usable_ratio": round(ratio, 4),
+        "missing_vars": missing,
+        "null_ratios": {**_null_ratios(marine, MARINE_VARIABLES[1:]), **_null_ratios(weather, WEATHER_VARIABLES)},
+    }
+
+
+def coverage_record(spot_id, coverage: dict) -> Tuple:
+    """COVERAGE_UPSERT_SQL arguments; null_ratios goes in as JSON text."""
+    return (
+        spot_id, coverage["status"], coverage["marine_ok"], coverage["weather_ok"], coverage["hours"],
+        coverage["usable_ratio"], coverage["missing_vars"], json.dumps(coverage["null_ratios"]),
+    )
+
+
+async def load_coverage_plan(conn) -> Tuple[Set[str], Set[str]]:
+    """(spot ids to skip, spot ids to fetch last), as strings."""
+    skip, deprioritise = set(), set()
+    for row in await conn.fetch(COVERAGE_PLAN_SQL):
+        (skip if row["skip"] else deprioritise).add(str(row["spot_id"]))
+    return skip, deprioritise
+
+
+def plan_spots(spots: List, skip: Set[str], deprioritise: Set[str]) -> List:
+    """Spots minus the skip-list, degraded ones moved to the end (order otherwise kept)."""
+    kept = [s for s in spots if str(s.id) not in skip]
+    return [s for s in kept if str(s.id) not in deprioritise] + [s for s in kept if str(s.id) in deprioritise]
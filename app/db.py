@@ -0,0 +1,238 @@
+# db.py
+"""
+Read/write routing for the API's database access.
+
+Writes, and reads that must see them, go to the primary (SUPABASE_DB_URL).
+Other reads are spread round-robin over the replicas in DB_READ_REPLICA_URLS
+(comma-separated), so the forecast cron's bulk upserts on the primary don't
+queue user-facing reads behind them. With no replicas configured every read
+uses the primary pool.
+
+A monitor polls each replica's replay lag every REPLICA_LAG_CHECK_SEC. A read
+only goes to a replica that answered its last check and is at most
+`max_staleness` seconds behind (MAX_REPLICA_LAG_SEC by default, 0 forces the
+primary); otherwise, or when the replica can't hand out a connection, it falls
+back to the primary. Per-pool latency and error counters are in db.stats().
+"""
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, List, Optional
+from urllib.parse import urlparse
+
+import asyncpg
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+READ_REPLICA_URLS = [u.strip() for u in os.getenv("DB_READ_REPLICA_URLS", "").split(",") if u.strip()]
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+MAX_REPLICA_LAG_SEC = float(os.getenv("MAX_REPLICA_LAG_SEC", "5"))
+REPLICA_LAG_CHECK_SEC = float(os.getenv("REPLICA_LAG_CHECK_SEC", "5"))
+ACQUIRE_TIMEOUT_SEC = 5
+LATENCY_SAMPLES = 500
+
+# 0 when caught up (no WAL waiting to be replayed) or not a replica at all;
+# otherwise how old the last replayed transaction is
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END::float8
+"""
+
+CONNECTION_ERRORS = (OSError, asyncio.TimeoutError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError)
+QUERY_ERRORS = CONNECTION_ERRORS + (asyncpg.PostgresError,)
+
+
+class PoolStats:
+    def __init__(self):
+        self.queries = 0
+        self.errors = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, seconds: float, ok: bool):
+        self.queries += 1
+        if not ok:
+            self.errors += 1
+        self._latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def as_dict(self) -> dict:
+        stats = {"queries": self.queries, "errors": self.errors}
+        for q in (50, 95, 99):
+            value = self.percentile(q / 100)
+            stats[f"p{q}_ms"] = None if value is None else round(value * 1000, 1)
+        return stats
+
+
+class DatabasePool:
+    """One asyncpg pool plus its health, lag and latency bookkeeping."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.pool: Optional[asyncpg.Pool] = None
+        self.lag_sec: Optional[float] = 0.0 if name == "primary" else None
+        self.checked_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.stats = PoolStats()
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> asyncpg.Pool:
+        async with self._lock:
+            if self.pool is None:
+                self.pool = await asyncpg.create_pool(self.url, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE)
+        return self.pool
+
+    async def close(self):
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            await pool.close()
+
+    async def acquire(self) -> asyncpg.Connection:
+        pool = self.pool or await self.open()
+        return await pool.acquire(timeout=ACQUIRE_TIMEOUT_SEC)
+
+    async def release(self, conn: asyncpg.Connection):
+        if self.pool is not None:
+            await self.pool.release(conn)
+
+    def mark_down(self, error: Exception):
+        self.lag_sec = None
+        self.last_error = f"{type(error).__name__}: {error}"
+        print(f"[WARNING] Read replica {self.name} unavailable: {self.last_error}")
+
+    def fresh_enough(self, max_staleness: float) -> bool:
+        """Answered a recent lag check and was at most max_staleness seconds behind."""
+        if self.lag_sec is None or self.checked_at is None:
+            return False
+        if time.monotonic() - self.checked_at > REPLICA_LAG_CHECK_SEC * 3:
+            return False
+        return self.lag_sec <= max_staleness
+
+    def as_dict(self) -> dict:
+        return {
+            "host": urlparse(self.url).hostname,
+            "open": self.pool is not None,
+            "size": self.pool.get_size() if self.pool else 0,
+            "idle": self.pool.get_idle_size() if self.pool else 0,
+            "lag_sec": None if self.lag_sec is None else round(self.lag_sec, 2),
+            "last_error": self.last_error,
+            **self.stats.as_dict(),
+        }
+
+
+class DatabaseRouter:
+    def __init__(self, primary_url: Optional[str] = DATABASE_URL, replica_urls: List[str] = READ_REPLICA_URLS):
+        self.primary = DatabasePool("primary", primary_url)
+        self.replicas = [DatabasePool(f"replica-{i}", url) for i, url in enumerate(replica_urls, start=1)]
+        self._next = itertools.count()
+        # Reads that wanted a replica but none was fresh enough or reachable
+        self.fallbacks = 0
+        self._monitor: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Opens the pools and starts the lag monitor; replicas that are down are retried by it."""
+        if self.replicas and self._monitor is None:
+            await self.check_replicas()
+            self._monitor = asyncio.create_task(self._monitor_loop())
+        await self.primary.open()
+
+    async def stop(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+            self._monitor = None
+        for pool in [self.primary, *self.replicas]:
+            await pool.close()
+
+    async def check_replicas(self):
+        async def check(replica: DatabasePool):
+            try:
+                pool = replica.pool or await replica.open()
+                async with pool.acquire(timeout=ACQUIRE_TIMEOUT_SEC) as conn:
+                    replica.lag_sec = await conn.fetchval(REPLICA_LAG_SQL, timeout=ACQUIRE_TIMEOUT_SEC)
+                replica.checked_at = time.monotonic()
+                replica.last_error = None
+            except QUERY_ERRORS as e:
+                replica.mark_down(e)
+        await asyncio.gather(*(check(r) for r in self.replicas))
+
+    async def _monitor_loop(self):
+        while True:
+            await asyncio.sleep(REPLICA_LAG_CHECK_SEC)
+            try:
+                await self.check_replicas()
+            except Exception as e:
+                print(f"[ERROR] Replica lag check failed: {e}")
+
+    def _pick_replica(self, max_staleness: float) -> Optional[DatabasePool]:
+        candidates = [r for r in self.replicas if r.fresh_enough(max_staleness)]
+        if not candidates:
+            return None
+        return candidates[next(self._next) % len(candidates)]
+
+    @asynccontextmanager
+    async def _use(self, pool: DatabasePool, conn: asyncpg.Connection):
+        start = time.monotonic()
+        ok = True
+        try:
+            yield conn
+        except QUERY_ERRORS:
+            ok = False
+            raise
+        finally:
+            pool.stats.record(time.monotonic() - start, ok)
+            await pool.release(conn)
+
+    @asynccontextmanager
+    async def read(self, max_staleness: Optional[float] = None):
+        """A connection whose data is at most max_staleness seconds old (default MAX_REPLICA_LAG_SEC)."""
+        bound = MAX_REPLICA_LAG_SEC if max_staleness is None else max_staleness
+        replica = self._pick_replica(bound) if bound > 0 else None
+        if replica is not None:
+            try:
+                conn = await replica.acquire()
+            except CONNECTION_ERRORS as e:
+                replica.mark_down(e)
+            else:
+                async with self._use(replica, conn) as conn:
+                    yield conn
+                return
+        if self.replicas and bound > 0:
+            self.fallbacks += 1
+        async with self._use(self.primary, await self.primary.acquire()) as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._use(self.primary, await self.primary.acquire()) as conn:
+            yield conn
+
+    def stats(self) -> dict:
+        return {
+            "max_replica_lag_sec": MAX_REPLICA_LAG_SEC,
+            "primary_fallbacks": self.fallbacks,
+            "pools": {p.name: p.as_dict() for p in [self.primary, *self.replicas]},
+        }
+
+
+db = DatabaseRouter()
@@ -0,0 +1,130 @@
+# events.py
+"""
+Cross-process cache invalidation over Postgres LISTEN/NOTIFY.
+
+Publishers (the forecast cron, spot maintenance scripts, the surf_spots trigger)
+send JSON events such as {"event": "forecast_generation", ...} on EVENTS_CHANNEL.
+Each API worker runs one `invalidation_bus` listener, started from the FastAPI
+lifespan, and dispatches events to the handlers its caches subscribed.
+"""
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+EVENTS_CHANNEL = "surfcast_events"
+RECONNECT_DELAY_SEC = 5
+
+FORECAST_GENERATION = "forecast_generation"
+SPOT_CHANGED = "spot_changed"
+
+
+async def publish(conn: asyncpg.Connection, event: str, **payload):
+    """Sends an event on an existing connection (delivered when its transaction commits)."""
+    await conn.execute(
+        "SELECT pg_notify($1, $2)",
+        EVENTS_CHANNEL,
+        json.dumps({"event": event, **payload}, default=str),
+    )
+
+
+async def publish_event(event: str, **payload):
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        await publish(conn, event, **payload)
+    finally:
+        await conn.close()
+    print(f"[EVENT] Published {event} {payload or ''}")
+
+
+class InvalidationBus:
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable]] = defaultdict(list)
+        self._conn: Optional[asyncpg.Connection] = None
+        self._tasks = set()
+        self._closing = False
+
+    def subscribe(self, event: str, handler: Callable):
+        """`handler(payload: dict)` may be a plain function or a coroutine function."""
+        self._handlers[event].append(handler)
+
+    def dispatch(self, payload: dict):
+        for handler in self._handlers.get(payload.get("event"), []):
+            try:
+                result = handler(payload)
+                if asyncio.iscoroutine(result):
+                    self._spawn(result)
+            except Exception as e:
+                print(f"[ERROR] Invalidation handler {handler.__qualname__} failed: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError as e:
+            print(f"[WARNING] Ignoring malformed {channel} payload {payload!r}: {e}")
+            return
+        self.dispatch(event)
+
+    def _on_terminate(self, connection):
+        if not self._closing:
+            print("[WARNING] Invalidation bus lost its LISTEN connection, reconnecting")
+            self._spawn(self._reconnect())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reconnect(self):
+        while not self._closing:
+            await asyncio.sleep(RECONNECT_DELAY_SEC)
+            try:
+                await self.start()
+                # Events may have been missed while disconnected: treat everything as stale
+                self.dispatch({"event": SPOT_CHANGED})
+                self.dispatch({"event": FORECAST_GENERATION})
+                return
+            except Exception as e:
+                print(f"[ERROR] Invalidation bus reconnect failed: {e}")
+
+    async def start(self):
+        self._closing = False
+        conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            await conn.add_listener(EVENTS_CHANNEL, self._on_notify)
+        except Exception:
+            await conn.close()
+            raise
+        conn.add_termination_listener(self._on_terminate)
+        self._conn = conn
+        print(f"[INFO] Listening for cache invalidation events on '{EVENTS_CHANNEL}'")
+
+    async def start_or_retry(self):
+        """start(), or keep retrying it in the background so the worker doesn't run without invalidation."""
+        try:
+            await self.start()
+        except Exception as e:
+            print(f"[ERROR] Invalidation bus startup failed, retrying every {RECONNECT_DELAY_SEC}s: {e}")
+            self._spawn(self._reconnect())
+
+    async def stop(self):
+        self._closing = True
+        for task in list(self._tasks):
+            task.cancel()
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+
+invalidation_bus = InvalidationBus()
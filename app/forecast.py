@@ -1,40 +1,92 @@
 # forecast.py
 import httpx
 import asyncio
+import os
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
 from app.models import MarineForecast
+from app.resilience import NETWORK_ERRORS, CircuitOpenError, resilient_get
 from app.spots import SurfSpot
 import requests
 from bs4 import BeautifulSoup
 from timezonefinder import TimezoneFinder
 
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+    print("[WARNING] selectolax not installed, surf-forecast pages will be parsed with BeautifulSoup")
 
+try:
+    import lxml  # noqa: F401
+    BS4_PARSER = "lxml"
+except ImportError:
+    BS4_PARSER = "html.parser"
 
-timeout = httpx.Timeout(10.0, connect=5.0)
-retries = 2
 
 
-async def fetch_with_retry(url, params, label, spot_name):
-    for attempt in range(retries + 1):
-        try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
-        except (httpx.ConnectTimeout, httpx.ReadTimeout,
-                httpx.ConnectError, httpx.NetworkError,
-                BrokenPipeError, ConnectionResetError) as e:
-            print(f"[WARNING] Network issue fetching {label} (attempt {attempt + 1}/{retries}) for spot {spot_name}: {e}")
-            if attempt == retries:
-                return None
-            await asyncio.sleep(1.5)
-        except httpx.HTTPStatusError as e:
-            print(f"[ERROR] HTTP error fetching {label} for {spot_name}: {e.response.status_code} {e.response.text}")
-            return None
-        except Exception as e:
-            print(f"[ERROR] Unexpected error fetching {label} for {spot_name}: {e}")
-            return None
+timeout = httpx.Timeout(10.0, connect=5.0)
+retries = 4
+# Upper bound on the time one fetch_with_retry call spends retrying
+fetch_budget = float(os.getenv("FETCH_BUDGET_SEC", "30"))
+# Set HEDGE_REQUESTS=1 to hedge Open-Meteo GETs that run past the host's p95 latency
+hedge_requests = os.getenv("HEDGE_REQUESTS", "0") == "1"
+
+MARINE_URL = "https://marine-api.open-meteo.com/v1/marine"
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+
+# surf-forecast.com politeness limits, per host
+scrape_host_concurrency = 4
+scrape_host_interval = 0.25
+SCRAPE_USER_AGENT = "Mozilla/5.0"
+SCRAPED_ROWS = ("time", "rating", "wave-height", "periods", "wind-state")
+
+_http_client: Optional[httpx.AsyncClient] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+_host_locks: Dict[str, asyncio.Lock] = {}
+_host_last_request: Dict[str, float] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide AsyncClient so connections are pooled across calls."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+async def fetch_with_retry(url, params, label, spot_name, raw: bool = False):
+    """Decoded JSON body, or the undecoded bytes with raw=True; None on failure."""
+    try:
+        response = await resilient_get(
+            get_http_client(), url, params=params,
+            retries=retries, budget=fetch_budget, hedge=hedge_requests,
+        )
+        return response.content if raw else response.json()
+    except CircuitOpenError as e:
+        print(f"[WARNING] Skipping {label} for {spot_name}: {e}")
+        return None
+    except httpx.HTTPStatusError as e:
+        print(f"[ERROR] HTTP error fetching {label} for {spot_name}: {e.response.status_code} {e.response.text}")
+        return None
+    except NETWORK_ERRORS as e:
+        print(f"[ERROR] Network issue fetching {label} for {spot_name}, giving up after {retries + 1} attempts: {e!r}")
+        return None
+    except Exception as e:
+        print(f"[ERROR] Unexpected error fetching {label} for {spot_name}: {e}")
+        return None
 
 def resolve_swell_period(marine_hourly: dict, i: int) -> Optional[float]:
     """
@@ -54,21 +106,13 @@ def resolve_swell_period(marine_hourly: dict, i: int) -> Optional[float]:
     return None
 
 
-async def get_forecast(
-    spot: SurfSpot,
-    timezone_str: str,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None
-) -> List[MarineForecast]:
-
+def forecast_request_params(spot, timezone_str: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """(marine_params, weather_params) for the Open-Meteo requests of one spot."""
     if not start_date:
         start_date = datetime.utcnow().date().isoformat()
     if not end_date:
         end_date = (datetime.utcnow().date() + timedelta(days=10)).isoformat()
 
-    marine_url = "https://marine-api.open-meteo.com/v1/marine"
-    weather_url = "https://api.open-meteo.com/v1/forecast"
-
     marine_params = {
         "latitude": spot.lat,
         "longitude": spot.lon,
@@ -89,14 +133,43 @@ async def get_forecast(
         "hourly": ["wind_speed_10m", "wind_direction_10m"],
         "timezone": timezone_str,
     }
+    return marine_params, weather_params
 
-    print(f"[DEBUG] Fetching marine data for {spot.name} from {marine_url} with params: {marine_params}")
 
-    marine_data = await fetch_with_retry(marine_url, marine_params, "marine forecast", spot.name)
-    weather_data = await fetch_with_retry(weather_url, weather_params, "weather forecast", spot.name)
+async def fetch_forecast_payloads(
+    spot,
+    timezone_str: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    raw: bool = False,
+):
+    """
+    (marine_data, weather_data) for one spot; the two requests run concurrently.
+    With raw=True the bodies are returned as undecoded JSON bytes.
+    """
+    marine_params, weather_params = forecast_request_params(spot, timezone_str, start_date, end_date)
 
+    print(f"[DEBUG] Fetching marine data for {spot.name} from {MARINE_URL} with params: {marine_params}")
+
+    return await asyncio.gather(
+        fetch_with_retry(MARINE_URL, marine_params, "marine forecast", spot.name, raw=raw),
+        fetch_with_retry(WEATHER_URL, weather_params, "weather forecast", spot.name, raw=raw),
+    )
+
+
+async def get_forecast(
+    spot: SurfSpot,
+    timezone_str: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> List[MarineForecast]:
+    marine_data, weather_data = await fetch_forecast_payloads(spot, timezone_str, start_date, end_date)
+    return parse_forecast(spot.name, marine_data, weather_data)
+
+
+def parse_forecast(spot_name: str, marine_data: Optional[dict], weather_data: Optional[dict]) -> List[MarineForecast]:
     if not marine_data or not weather_data:
-        print(f"[ERROR] Missing data for {spot.name}, skipping...")
+        print(f"[ERROR] Missing data for {spot_name}, skipping...")
         return []
 
     marine_hourly = {k: v for k, v in marine_data.get("hourly", {}).items()}
@@ -111,7 +184,7 @@ async def get_forecast(
     for key in required_keys:
         source = marine_hourly if key not in ["wind_speed_10m", "wind_direction_10m"] else weather_hourly
         if key not in source:
-            print(f"[WARNING] Missing key '{key}' in Open-Meteo response for spot {spot.name}")
+            print(f"[WARNING] Missing key '{key}' in Open-Meteo response for spot {spot_name}")
             return []
 
     forecasts = []
@@ -129,12 +202,12 @@ async def get_forecast(
 
         if marine_hourly.get("swell_wave_peak_period", [None])[i] is None:
            values["swell_wave_peak_period"] = resolve_swell_period(marine_hourly, i)
-           #print(f"[DEBUG] No swell_wave_peak_period found for {spot.name}, estimating as {values['swell_wave_peak_period']}")
+           #print(f"[DEBUG] No swell_wave_peak_period found for {spot_name}, estimating as {values['swell_wave_peak_period']}")
            
         if any(v is None for v in values.values()):
             missing = [k for k, v in values.items() if v is None]
-            #print(f"[DEBUG] Skipping index {i} for {spot.name} due to missing: {missing}")
-            #print(f"[DEBUG] Raw values for {spot.name}, index {i}, time {t}: {values}")
+            #print(f"[DEBUG] Skipping index {i} for {spot_name} due to missing: {missing}")
+            #print(f"[DEBUG] Raw values for {spot_name}, index {i}, time {t}: {values}")
             continue
 
         try:
@@ -149,85 +222,104 @@ async def get_forecast(
             )
             forecasts.append(forecast)
         except Exception as e:
-            print(f"[WARNING] Skipping index {i} for {spot.name} due to error: {e}")
+            print(f"[WARNING] Skipping index {i} for {spot_name} due to error: {e}")
             continue
 
     return forecasts
 
 
 
-def scrape_surf_forecast(url: str):
-    response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-    if response.status_code != 200:
-        raise Exception(f"Failed to fetch URL {url} - Status Code: {response.status_code}")
+def _extract_hour(time_str: str) -> int:
+    try:
+        # Try parsing formats like "10 AM" or "1 PM"
+        return datetime.strptime(time_str.strip(), "%I %p").hour
+    except ValueError:
+        try:
+            return datetime.strptime(time_str.strip(), "%H:%M").hour
+        except ValueError:
+            print(f"[WARN] Could not parse hour from time '{time_str}'")
+            return 0
 
-    soup = BeautifulSoup(response.text, "html.parser")
 
-    def extract_row(row_name):
-        row = soup.find("tr", {"data-row-name": row_name})
-        if not row:
+def _select_rows(html: str):
+    """
+    Single pass over the forecast table: returns the cell texts of every
+    `tr[data-row-name]` we care about, plus (day-name, colspan) for each day header.
+    """
+    rows = {}
+    day_cells = []
+
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        for row in tree.css("tr[data-row-name]"):
+            name = row.attributes.get("data-row-name")
+            if name in SCRAPED_ROWS and name not in rows:
+                rows[name] = [
+                    cell.text(deep=True, separator=" ", strip=True)
+                    for cell in row.css("td.forecast-table__cell")
+                ]
+        for cell in tree.css("td.js-fctable-day"):
+            day_cells.append((cell.attributes.get("data-day-name") or "", cell.attributes.get("colspan") or "1"))
+        return rows, day_cells
+
+    soup = BeautifulSoup(html, BS4_PARSER)
+    for row in soup.find_all("tr", attrs={"data-row-name": True}):
+        name = row.get("data-row-name")
+        if name in SCRAPED_ROWS and name not in rows:
+            rows[name] = [
+                " ".join(cell.stripped_strings)
+                for cell in row.find_all("td", class_="forecast-table__cell")
+            ]
+    for cell in soup.select("td.js-fctable-day"):
+        day_cells.append((cell.get("data-day-name", ""), cell.get("colspan", "1")))
+    return rows, day_cells
+
+
+def parse_surf_forecast_html(html: str, today: Optional[datetime] = None) -> List[dict]:
+    rows, day_cells = _select_rows(html)
+
+    for row_name in SCRAPED_ROWS:
+        if row_name not in rows:
             print(f"[WARN] Row '{row_name}' not found")
-            return []
-        values = [
-            " ".join(cell.stripped_strings)
-            for cell in row.find_all("td", class_="forecast-table__cell")
-        ]
-        print(f"[INFO] Extracted {len(values)} entries for '{row_name}'")
-        return values
-
-    times = extract_row("time")
-    ratings = extract_row("rating")
-    heights = extract_row("wave-height")
-    periods = extract_row("periods")
-    winds = extract_row("wind-state")
-
-    # Extract date headers and map them to time slots
-    date_cells = soup.select("td.js-fctable-day")
-    print(f"[DEBUG] Found {len(date_cells)} day header cells")
+            rows[row_name] = []
 
+    times = rows["time"]
+    ratings = rows["rating"]
+    heights = rows["wave-height"]
+    periods = rows["periods"]
+    winds = rows["wind-state"]
+
+    # Map day headers to time slots; the table can run over a month boundary
     column_to_date = {}
     current_col = 0
-    today = datetime.today()
-    for cell in date_cells:
+    today = today or datetime.today()
+    year, month, previous_day = today.year, today.month, None
+    for day_text, colspan in day_cells:
         try:
-            day_text = cell.get("data-day-name", "").strip()
+            day_text = day_text.strip()
             if "_" in day_text:
                 _, day = day_text.split("_")
-                date = datetime(today.year, today.month, int(day))
-                colspan = int(cell.get("colspan", "1"))
-                for _ in range(colspan):
+                day = int(day)
+                if previous_day is not None and day < previous_day:
+                    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+                previous_day = day
+                date = datetime(year, month, day)
+                for _ in range(int(colspan)):
                     column_to_date[current_col] = date
                     current_col += 1
-        except Exception as e:
-            print(f"[WARN] Could not parse day from cell: {cell}")
+        except Exception:
+            print(f"[WARN] Could not parse day from cell: {day_text}")
             continue
 
-    print(f"[INFO] Mapped {len(column_to_date)} columns to dates")
-
     min_len = min(len(times), len(ratings), len(heights), len(periods), len(winds))
-    print(f"[INFO] Preparing {min_len} forecast entries")
     forecast = []
     for i in range(min_len):
-        # Parse hour from time string
-        time_str = times[i]
-        try:
-            # Try parsing formats like "10 AM" or "1 PM"
-            parsed_time = datetime.strptime(time_str.strip(), "%I %p")
-            hour = parsed_time.hour
-        except ValueError:
-            try:
-                parsed_time = datetime.strptime(time_str.strip(), "%H:%M")
-                hour = parsed_time.hour
-            except ValueError:
-                print(f"[WARN] Could not parse hour from time '{time_str}'")
-                hour = 0
-
         date = column_to_date.get(i)
         if not date:
             print(f"[WARN] No date found for index {i}")
             continue
 
-        dt = datetime(date.year, date.month, date.day, hour)
+        dt = datetime(date.year, date.month, date.day, _extract_hour(times[i]))
         forecast.append({
             "datetime": dt.isoformat(),
             "rating": ratings[i],
@@ -236,9 +328,65 @@ def scrape_surf_forecast(url: str):
             "wind": winds[i],
         })
 
+    print(f"[INFO] Parsed {len(forecast)} forecast entries ({len(column_to_date)} dated columns)")
     return forecast
 
 
+def scrape_surf_forecast(url: str):
+    response = requests.get(url, headers={"User-Agent": SCRAPE_USER_AGENT})
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch URL {url} - Status Code: {response.status_code}")
+
+    return parse_surf_forecast_html(response.text)
+
+
+async def _polite_get(url: str) -> httpx.Response:
+    """
+    GET through the shared client, allowing at most `scrape_host_concurrency`
+    in-flight requests and one request start every `scrape_host_interval` seconds per host.
+    """
+    host = urlparse(url).netloc
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(scrape_host_concurrency)
+        _host_locks[host] = asyncio.Lock()
+
+    async with _host_semaphores[host]:
+        async with _host_locks[host]:
+            wait = _host_last_request.get(host, 0.0) + scrape_host_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            _host_last_request[host] = time.monotonic()
+        return await get_http_client().get(url, headers={"User-Agent": SCRAPE_USER_AGENT})
+
+
+async def fetch_surf_forecast(url: str) -> List[dict]:
+    response = await _polite_get(url)
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch URL {url} - Status Code: {response.status_code}")
+
+    # Parsing is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(parse_surf_forecast_html, response.text)
+
+
+async def scrape_surf_forecasts(urls: Iterable[str]) -> Dict[str, List[dict]]:
+    """
+    Scrapes many surf-forecast.com pages concurrently. Returns {url: rows},
+    with an empty list for pages that failed.
+    """
+    unique_urls = list(dict.fromkeys(u for u in urls if u))
+
+    async def scrape(url: str):
+        try:
+            return url, await fetch_surf_forecast(url)
+        except Exception as e:
+            print(f"[ERROR] Scraping {url} failed: {e}")
+            return url, []
+
+    results = await asyncio.gather(*(scrape(url) for url in unique_urls))
+    print(f"[INFO] Scraped {sum(1 for _, rows in results if rows)}/{len(unique_urls)} benchmark pages")
+    return dict(results)
+
+
 # Sample matching function for ratings
 def map_our_rating_to_range(score: str) -> tuple:
     mapping = {
@@ -1,7 +1,14 @@
-from typing import Tuple
+from collections import defaultdict
+from typing import List, Mapping, Optional, Tuple
+
+import pytz
+
 from app.spots import SurfSpot
 from app.models import MarineForecast
 from app.models import SurfForecast
+from app.models import HeuristicParams
+
+DEFAULT_PARAMS = HeuristicParams()
 
 def fmt(value, unit="", decimals=2):
     if value is None:
@@ -42,9 +49,96 @@ def wind_quality(facing_deg: int, wind_deg: int, wind_speed_kmh: float) -> Tuple
 
     return wind_type, severity
 
-def evaluate_surf_quality(spot: SurfSpot, forecast: MarineForecast) -> SurfForecast:
+
+def in_swell_window(direction: float, dir_range: Tuple[float, float]) -> bool:
+    """A min above the max is a window wrapping through north, e.g. (330, 30)."""
+    low, high = dir_range
+    if low <= high:
+        return low <= direction <= high
+    return direction >= low or direction <= high
+
+# Reason codes: what evaluate_surf_quality stores instead of explanation text.
+# explain_reason() renders them from the stored metrics when a response asks for it.
+REASON_FIRING_LONG_CLEAN = 1
+REASON_SOLID_LONG_OFFSHORE = 2
+REASON_SOLID_LONG_LIGHT_ONSHORE = 3
+REASON_PLAYABLE_LONG_WIND = 4
+REASON_SKETCHY_LONG_MESSY = 5
+REASON_SOLID_MID_CLEAN = 6
+REASON_PLAYABLE_MID_LIGHT_ONSHORE = 7
+REASON_SKETCHY_MID_WIND = 8
+REASON_PLAYABLE_SHORT_CLEAN = 9
+REASON_SKETCHY_SHORT_WIND = 10
+REASON_LAKE_WEAK = 11
+
+# Disqualified hours store REASON_DISQUALIFIED | a bitmask of the failed checks
+REASON_DISQUALIFIED = 0x100
+DQ_SWELL_SMALL = 0x1
+DQ_BAD_DIRECTION = 0x2
+DQ_CHOPPY = 0x4
+DQ_SHORT_PERIOD = 0x8
+
+REASON_TEXT = {
+    REASON_FIRING_LONG_CLEAN: lambda m: f"Powerful long-period swell with clean/glassy wind ({fmt(m['swell_wave_height'], 'm')} @ {fmt(m['swell_wave_peak_period'], 's')}, wind: {m['wind_type']})",
+    REASON_SOLID_LONG_OFFSHORE: lambda m: f"Long-period swell with manageable offshore wind ({fmt(m['swell_wave_height'], 'm')} @ {fmt(m['swell_wave_peak_period'], 's')}, wind: {m['wind_type']})",
+    REASON_SOLID_LONG_LIGHT_ONSHORE: lambda m: f"Strong swell handling light onshore wind ({m['wind_type']}, {fmt(m['wind_speed_kmh'], 'km/h', 0)})",
+    REASON_PLAYABLE_LONG_WIND: lambda m: f"Long swell period with some wind degradation ({m['wind_type']}, {fmt(m['wind_speed_kmh'], 'km/h', 0)})",
+    REASON_SKETCHY_LONG_MESSY: lambda m: f"Long swell but messy wind ({m['wind_type']}, {fmt(m['wind_speed_kmh'], 'km/h', 0)})",
+    REASON_SOLID_MID_CLEAN: lambda m: f"Solid swell and favorable wind ({fmt(m['swell_wave_peak_period'], 's')} and {m['wind_type']})",
+    REASON_PLAYABLE_MID_LIGHT_ONSHORE: lambda m: f"Decent swell with light onshore wind ({fmt(m['wind_speed_kmh'], 'km/h', 0)})",
+    REASON_SKETCHY_MID_WIND: lambda m: f"Decent swell but degraded by wind ({m['wind_type']}, {fmt(m['wind_speed_kmh'], 'km/h', 0)})",
+    REASON_PLAYABLE_SHORT_CLEAN: lambda m: f"Short-period swell made surfable by clean wind ({fmt(m['swell_wave_peak_period'], 's')} / {m['wind_type']})",
+    REASON_SKETCHY_SHORT_WIND: lambda m: f"Short-period swell and imperfect wind ({m['wind_type']}, {fmt(m['wind_speed_kmh'], 'km/h', 0)})",
+    REASON_LAKE_WEAK: lambda m: f"Too weak or disorganized (swell {fmt(m['swell_wave_height'], 'm')} @ {fmt(m['swell_wave_peak_period'], 's')})",
+}
+
+REASON_METRICS = (
+    "swell_wave_height", "swell_wave_peak_period", "swell_wave_direction",
+    "wind_wave_height_m", "wind_speed_kmh", "wind_type",
+)
+
+
+def swell_min_text(spot, params: HeuristicParams = DEFAULT_PARAMS) -> str:
+    """The swell minimum as explanations have always quoted it; scaled (backtest) values are shortened."""
+    if params.swell_min_scale == 1:
+        return str(spot.swell_min_m or params.default_swell_min_m)
+    return f"{(spot.swell_min_m or params.default_swell_min_m) * params.swell_min_scale:g}"
+
+
+def explain_reason(reason_code: Optional[int], metrics: Mapping, spot=None,
+                   params: HeuristicParams = DEFAULT_PARAMS) -> Optional[str]:
+    """
+    Explanation text for a stored reason code. `metrics` is any row or mapping
+    holding the forecast columns in REASON_METRICS. The spot supplies the
+    thresholds quoted by disqualifier messages; without it they are left out.
+    """
+    if reason_code is None:
+        return None
+    m = {name: metrics.get(name) for name in REASON_METRICS}
+
+    if not reason_code & REASON_DISQUALIFIED:
+        render = REASON_TEXT.get(reason_code)
+        return render(m) if render else None
+
     explanations = []
+    if reason_code & DQ_SWELL_SMALL:
+        if spot is not None:
+            explanations.append(f"Swell too small ({fmt(m['swell_wave_height'], 'm')} < {swell_min_text(spot, params)}m)")
+        else:
+            explanations.append(f"Swell too small ({fmt(m['swell_wave_height'], 'm')})")
+    if reason_code & DQ_BAD_DIRECTION:
+        if spot is not None:
+            explanations.append(f"Bad swell direction ({fmt(m['swell_wave_direction'], '°')} not in {spot.swell_dir_range})")
+        else:
+            explanations.append(f"Bad swell direction ({fmt(m['swell_wave_direction'], '°')})")
+    if reason_code & DQ_CHOPPY:
+        explanations.append(f"Too choppy (wind wave {fmt(m['wind_wave_height_m'], 'm')})")
+    if reason_code & DQ_SHORT_PERIOD:
+        explanations.append(f"Swell period too short ({fmt(m['swell_wave_peak_period'], 's')} < {params.min_period_s:g}s)")
+    return "; ".join(explanations)
 
+
+def evaluate_surf_quality(spot: SurfSpot, forecast: MarineForecast, params: HeuristicParams = DEFAULT_PARAMS) -> SurfForecast:
     swell_wave_height = forecast.swell_wave_height
     swell_period = forecast.swell_wave_peak_period
     wave_dir = forecast.swell_wave_direction
@@ -56,63 +150,65 @@ def evaluate_surf_quality(spot: SurfSpot, forecast: MarineForecast) -> SurfForec
     wind_type, wind_severity = wind_quality(spot.facing_direction, wind_dir, wind_speed) if wind_dir is not None else ("unknown", "unknown")
 
     # Check for basic issues
-    if swell_wave_height is None or swell_wave_height < (spot.swell_min_m or 0.5):
-        explanations.append(f"Swell too small ({fmt(swell_wave_height, 'm')} < {spot.swell_min_m or '0.5'}m)")
+    disqualified = 0
+    swell_min = (spot.swell_min_m or params.default_swell_min_m) * params.swell_min_scale
+    if swell_wave_height is None or swell_wave_height < swell_min:
+        disqualified |= DQ_SWELL_SMALL
 
-    if wave_dir is None or not (spot.swell_dir_range[0] <= wave_dir <= spot.swell_dir_range[1]):
-        explanations.append(f"Bad swell direction ({fmt(wave_dir, '°')} not in {spot.swell_dir_range})")
+    if wave_dir is None or not in_swell_window(wave_dir, spot.swell_dir_range):
+        disqualified |= DQ_BAD_DIRECTION
 
-    if wind_wave_height is None or wind_wave_height > (spot.preferred_wind_wave_max_m or 1.0):
-        explanations.append(f"Too choppy (wind wave {fmt(wind_wave_height, 'm')})")
+    if wind_wave_height is None or wind_wave_height > (spot.preferred_wind_wave_max_m or params.default_wind_wave_max_m):
+        disqualified |= DQ_CHOPPY
 
-    if swell_period is None or swell_period < 7:
-        explanations.append(f"Swell period too short ({fmt(swell_period, 's')} < 7s)")
+    if swell_period is None or swell_period < params.min_period_s:
+        disqualified |= DQ_SHORT_PERIOD
 
     # If we have disqualifying conditions
-    if explanations:
+    if disqualified:
         rating = "Lake Mode"
-        reason = "; ".join(explanations)
+        reason = REASON_DISQUALIFIED | disqualified
     else:
         # Heuristic logic — can be tweaked
-        if swell_period >= 12:
-            if wind_type in ["offshore", "glassy"] and wind_speed <= 12:
+        if swell_period >= params.long_period_s:
+            if wind_type in ["offshore", "glassy"] and wind_speed <= params.clean_wind_kmh:
                 rating = "Firing"
-                reason = f"Powerful long-period swell with clean/glassy wind ({fmt(swell_wave_height, 'm')} @ {fmt(swell_period, 's')}, wind: {wind_type})"
-            elif wind_type == "offshore" and wind_speed <= 18:
+                reason = REASON_FIRING_LONG_CLEAN
+            elif wind_type == "offshore" and wind_speed <= params.offshore_wind_kmh:
                 rating = "Solid"
-                reason = f"Long-period swell with manageable offshore wind ({fmt(swell_wave_height, 'm')} @ {fmt(swell_period, 's')}, wind: {wind_type})"
-            elif wind_type in ["onshore", "cross-shore"] and wind_speed < 8:
+                reason = REASON_SOLID_LONG_OFFSHORE
+            elif wind_type in ["onshore", "cross-shore"] and wind_speed < params.light_wind_kmh:
                 rating = "Solid"
-                reason = f"Strong swell handling light onshore wind ({wind_type}, {fmt(wind_speed, 'km/h', 0)})"
-            elif (wind_type == "onshore" and wind_speed < 12) or (wind_type == "cross-shore" and wind_speed < 15):
+                reason = REASON_SOLID_LONG_LIGHT_ONSHORE
+            elif (wind_type == "onshore" and wind_speed < params.onshore_wind_kmh) or (wind_type == "cross-shore" and wind_speed < params.cross_wind_kmh):
                 rating = "Playable"
-                reason = f"Long swell period with some wind degradation ({wind_type}, {fmt(wind_speed, 'km/h', 0)})"
+                reason = REASON_PLAYABLE_LONG_WIND
             else:
                 rating = "Sketchy"
-                reason = f"Long swell but messy wind ({wind_type}, {fmt(wind_speed, 'km/h', 0)})"
+                reason = REASON_SKETCHY_LONG_MESSY
 
-        elif 10 <= swell_period < 12:
-            if wind_type in ["offshore", "glassy"] and wind_speed <= 15:
+        elif params.mid_period_s <= swell_period < params.long_period_s:
+            if wind_type in ["offshore", "glassy"] and wind_speed <= params.mid_clean_wind_kmh:
                 rating = "Solid"
-                reason = f"Solid swell and favorable wind ({fmt(swell_period, 's')} and {wind_type})"
-            elif wind_type == "onshore" and wind_speed < 8:
+                reason = REASON_SOLID_MID_CLEAN
+            elif wind_type == "onshore" and wind_speed < params.light_wind_kmh:
                 rating = "Playable"
-                reason = f"Decent swell with light onshore wind ({fmt(wind_speed, 'km/h', 0)})"
+                reason = REASON_PLAYABLE_MID_LIGHT_ONSHORE
             else:
                 rating = "Sketchy"
-                reason = f"Decent swell but degraded by wind ({wind_type}, {fmt(wind_speed, 'km/h', 0)})"
+                reason = REASON_SKETCHY_MID_WIND
 
-        elif 8 <= swell_period < 10:
-            if wind_type in ["offshore", "glassy"] and wind_speed <= 10:
+        elif params.short_period_s <= swell_period < params.mid_period_s:
+            if wind_type in ["offshore", "glassy"] and wind_speed <= params.short_clean_wind_kmh:
                 rating = "Playable"
-                reason = f"Short-period swell made surfable by clean wind ({fmt(swell_period, 's')} / {wind_type})"
+                reason = REASON_PLAYABLE_SHORT_CLEAN
             else:
                 rating = "Sketchy"
-                reason = f"Short-period swell and imperfect wind ({wind_type}, {fmt(wind_speed, 'km/h', 0)})"
+                reason = REASON_SKETCHY_SHORT_WIND
 
         else:
             rating = "Lake Mode"
-            reason = f"Too weak or disorganized (swell {fmt(swell_wave_height, 'm')} @ {fmt(swell_period, 's')})"
+            reason = REASON_LAKE_WEAK
 
     return SurfForecast(
         time=forecast.time,
@@ -124,8 +220,81 @@ def evaluate_surf_quality(spot: SurfSpot, forecast: MarineForecast) -> SurfForec
         wind_direction_deg=wind_dir,
         wind_type=wind_type,
         wind_severity=wind_severity,
-        explanation=reason,
+        reason_code=reason,
         rating=rating
     )
 
 
+# Rating priority for sorting
+rating_priority = {"Firing": 4, "Solid": 3, "Playable": 2, "Sketchy": 1, "Lake Mode":0}
+
+
+def group_daily_best(rows) -> List[dict]:
+    """
+    Collapses forecast rows (spot columns + hourly columns, ordered by spot and time)
+    into one entry per spot holding its best forecast per local day,
+    sorted by each spot's soonest forecast.
+    """
+    # Group rows by spot ID
+    grouped = defaultdict(list)
+    spot_info = {}
+    for row in rows:
+        spot_id = row["id"]
+        grouped[spot_id].append(row)
+        if spot_id not in spot_info:
+            # Columns a projected query did not select come back as None
+            spot_info[spot_id] = {
+                "id": spot_id,
+                "name": row.get("name"),
+                "lat": row.get("lat"),
+                "lon": row.get("lon"),
+                "region": row.get("region"),
+                "town": row.get("town"),
+                "surf_benchmark_url": row.get("surf_benchmark_url"),
+                "timezone": row["timezone"]
+            }
+
+    # Find best forecast per day per spot (local time)
+    output = []
+    for spot_id, forecasts in grouped.items():
+        tz_str = spot_info[spot_id]["timezone"] or "UTC"
+        tz = pytz.timezone(tz_str)
+
+        daily_best = {}
+        for f in forecasts:
+            dt_utc = f["timestamp_utc"]
+            dt_local = dt_utc.replace(tzinfo=pytz.utc).astimezone(tz)
+            day_str = dt_local.date().isoformat()
+            current_best = daily_best.get(day_str)
+
+            if not current_best or rating_priority[f["surf_rating"]] > rating_priority[current_best["rating"]]:
+                daily_best[day_str] = {
+                    "date": day_str,
+                    "time": dt_local.strftime("%H:%M"),
+                    "rating": f["surf_rating"],
+                    "explanation": f.get("explanation"),
+                    "reason_code": f.get("reason_code"),
+                    "swell_wave_height": f.get("swell_wave_height"),
+                    "swell_wave_peak_period": f.get("swell_wave_peak_period"),
+                    "wind_speed_kmh": f.get("wind_speed_kmh"),
+                    "wind_type": f.get("wind_type"),
+                    "wind_severity": f.get("wind_severity"),
+                    "swell_wave_direction": f.get("swell_wave_direction"),
+                    "timestamp_sort": dt_local,
+                    "timezone": tz_str
+                }
+
+        if daily_best:
+            sorted_daily = sorted(daily_best.values(), key=lambda d: d["timestamp_sort"])
+            spot_entry = spot_info[spot_id]
+            spot_entry["forecasts"] = [
+                {k: v for k, v in d.items() if k != "timestamp_sort"} for d in sorted_daily
+            ]
+            # Ensure timezone is included in the spot entry
+            spot_entry["timezone"] = tz_str
+            output.append(spot_entry)
+
+    # Sort all spots by their soonest forecast timestamp (then id: the keyset pagination order)
+    output.sort(key=lambda s: (s["forecasts"][0]["date"] + s["forecasts"][0]["time"], str(s["id"])))
+
+    return output
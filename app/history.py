@@ -0,0 +1,222 @@
+# history.py
+"""
+Columnar archive of past forecasts.
+
+`export_expiring_forecasts()` streams forecast rows that are about to be deleted
+into zstd-compressed Parquet files, one directory per local date:
+
+    HISTORY_DIR/date_local=2025-06-03/part-2025-06-04.parquet
+
+With packed storage on, surf_forecast_daily days are unnested into the same
+hourly layout (all 24 hours, explanation left empty) and hourly rows are only
+taken for spot-days with no packed row, so each hour is archived once. Otherwise
+surf_forecast_daily isn't touched; it may not exist.
+
+`read_history()` memory-maps those files back for analysis and backtests.
+"""
+import os
+from datetime import date
+from typing import List, Optional, Sequence
+
+import pytz
+
+from app.storage import PACKED_UNNEST, unpack_hour, writes_packed
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    print("[WARNING] pyarrow not installed, forecast history export is unavailable")
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+EXPORT_BATCH_ROWS = 5000
+
+COLUMNS = [
+    ("spot_id", "string"),
+    ("timestamp_utc", "timestamp_utc"),
+    ("timestamp_local", "timestamp"),
+    ("date_local", "date"),
+    ("swell_wave_height", "float"),
+    ("swell_wave_direction", "float"),
+    ("swell_wave_peak_period", "float"),
+    ("wind_speed_kmh", "float"),
+    ("wind_direction_deg", "float"),
+    ("wind_wave_height_m", "float"),
+    ("wind_type", "string"),
+    ("wind_severity", "string"),
+    ("surf_rating", "string"),
+    ("reason_code", "int16"),
+    ("explanation", "string"),
+]
+
+
+HOURLY_PARTITIONS_SQL = """
+    SELECT DISTINCT date_local FROM surf_forecast_hourly WHERE timestamp_utc < $1
+    ORDER BY date_local
+"""
+PARTITIONS_SQL = """
+    SELECT date_local FROM surf_forecast_hourly WHERE timestamp_utc < $1
+    UNION
+    SELECT date_local FROM surf_forecast_daily WHERE date_local < $1
+    ORDER BY date_local
+"""
+PACKED_EXPIRING_SQL = f"""
+    SELECT d.spot_id, s.timezone, d.date_local, u.*
+    FROM surf_forecast_daily d
+    JOIN surf_spots s ON s.id = d.spot_id,
+    {PACKED_UNNEST}
+    WHERE d.date_local = $1 AND d.date_local < $2
+    ORDER BY d.spot_id, u.hour
+"""
+HOURLY_EXPIRING_SQL = f"""
+    SELECT {", ".join(f"h.{name}" for name, _ in COLUMNS)}
+    FROM surf_forecast_hourly h
+    WHERE h.date_local = $1 AND h.timestamp_utc < $2
+    ORDER BY h.spot_id, h.timestamp_utc
+"""
+UNPACKED_HOURLY_EXPIRING_SQL = f"""
+    SELECT {", ".join(f"h.{name}" for name, _ in COLUMNS)}
+    FROM surf_forecast_hourly h
+    WHERE h.date_local = $1 AND h.timestamp_utc < $2
+      AND NOT EXISTS (
+          SELECT 1 FROM surf_forecast_daily d
+          WHERE d.spot_id = h.spot_id AND d.date_local = h.date_local AND d.date_local < $2
+      )
+    ORDER BY h.spot_id, h.timestamp_utc
+"""
+
+
+def history_schema():
+    types = {
+        "string": pa.string(),
+        "timestamp_utc": pa.timestamp("us", tz="UTC"),
+        "timestamp": pa.timestamp("us"),
+        "date": pa.date32(),
+        "float": pa.float32(),
+        "int16": pa.int16(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+
+
+def _record_batch(rows, schema):
+    columns = {name: [] for name, _ in COLUMNS}
+    for r in rows:
+        for name, _ in COLUMNS:
+            columns[name].append(r[name])
+    columns["spot_id"] = [str(v) for v in columns["spot_id"]]
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def _unpacked(r) -> dict:
+    tz = pytz.timezone(r["timezone"] or "UTC")
+    return {"spot_id": r["spot_id"], **unpack_hour(r, tz)}
+
+
+async def export_expiring_forecasts(conn, cutoff: date) -> int:
+    """
+    Writes every row the retention cleanup deletes (surf_forecast_hourly with
+    timestamp_utc < cutoff and, with packed storage on, surf_forecast_daily with date_local < cutoff) to
+    Parquet, streaming through server-side cursors so memory stays at one batch.
+    Re-running for the same cutoff overwrites the same files.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to export forecast history")
+
+    schema = history_schema()
+    if writes_packed():
+        partitions = await conn.fetch(PARTITIONS_SQL, cutoff)
+        queries = ((PACKED_EXPIRING_SQL, _unpacked), (UNPACKED_HOURLY_EXPIRING_SQL, None))
+    else:
+        partitions = await conn.fetch(HOURLY_PARTITIONS_SQL, cutoff)
+        queries = ((HOURLY_EXPIRING_SQL, None),)
+
+    total = 0
+    for p in partitions:
+        date_local = p["date_local"]
+        part_dir = os.path.join(HISTORY_DIR, f"date_local={date_local.isoformat()}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f"part-{cutoff.isoformat()}.parquet")
+        tmp_path = path + ".tmp"
+
+        written = 0
+        batch = []
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            # asyncpg cursors are server-side and need a transaction
+            async with conn.transaction():
+                for sql, to_row in queries:
+                    async for row in conn.cursor(sql, date_local, cutoff, prefetch=EXPORT_BATCH_ROWS):
+                        batch.append(to_row(row) if to_row else row)
+                        if len(batch) >= EXPORT_BATCH_ROWS:
+                            writer.write_batch(_record_batch(batch, schema))
+                            written += len(batch)
+                            batch = []
+            if batch:
+                writer.write_batch(_record_batch(batch, schema))
+                written += len(batch)
+
+        os.replace(tmp_path, path)
+        total += written
+        print(f"[HISTORY] {date_local} → {written} rows ({path})")
+
+    return total
+
+
+def history_files(start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+    """Parquet files whose date_local partition falls within [start, end]."""
+    if not os.path.isdir(HISTORY_DIR):
+        return []
+    files = []
+    for part in sorted(os.listdir(HISTORY_DIR)):
+        if not part.startswith("date_local="):
+            continue
+        day = date.fromisoformat(part.split("=", 1)[1])
+        if (start and day < start) or (end and day > end):
+            continue
+        part_dir = os.path.join(HISTORY_DIR, part)
+        files.extend(os.path.join(part_dir, f) for f in sorted(os.listdir(part_dir)) if f.endswith(".parquet"))
+    return files
+
+
+def read_history(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    columns: Optional[Sequence[str]] = None,
+    spot_ids: Optional[Sequence[str]] = None,
+):
+    """
+    Memory-maps the archived partitions in [start, end] and returns one Arrow table.
+    Only `columns` are decoded; use `.to_pandas()` on the result for DataFrame work.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to read forecast history")
+
+    schema = history_schema()
+    if columns:
+        schema = pa.schema([schema.field(c) for c in columns])
+
+    tables = []
+    for path in history_files(start, end):
+        # Older partitions may predate some columns (e.g. reason_code): read what they have, null-fill the rest
+        present = set(pq.read_schema(path).names)
+        table = pq.read_table(
+            path,
+            columns=[name for name in schema.names if name in present],
+            filters=[("spot_id", "in", [str(s) for s in spot_ids])] if spot_ids else None,
+            memory_map=True,
+        )
+        for field in schema:
+            if field.name not in present:
+                table = table.append_column(field, pa.nulls(len(table), field.type))
+        tables.append(table.select(schema.names))
+
+    if not tables:
+        return schema.empty_table()
+    return pa.concat_tables(tables)
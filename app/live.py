@@ -0,0 +1,92 @@
+# live.py
+"""
+On-demand forecasts for spots the tables have nothing for yet (a newly added
+spot, or a cron run that failed for it).
+
+The API fetches and evaluates the spot from Open-Meteo itself. Concurrent
+requests for a spot share one fetch, and the result is cached for a short TTL.
+It is also written back to the forecast tables in the background, so the next
+request is served from the database.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Tuple
+
+import pytz
+
+from app.coalesce import single_flight
+from app.db import db
+from app.forecast import get_forecast
+from app.heuristics import evaluate_surf_quality
+from app.storage import build_hourly_records, upsert_forecasts
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+# How long a request waits for the upstream; the fetch itself carries on and fills the cache
+LIVE_FORECAST_BUDGET_SEC = float(os.getenv("LIVE_FORECAST_BUDGET_SEC", "5"))
+LIVE_FORECAST_TTL_SEC = float(os.getenv("LIVE_FORECAST_TTL_SEC", "300"))
+
+live_flight = single_flight("live_forecast")
+_cache: Dict[str, Tuple[float, List[dict]]] = {}
+_write_tasks = set()
+
+
+class LiveForecastTimeout(Exception):
+    pass
+
+
+async def _write_back(spot, local_tz, evaluated):
+    try:
+        async with db.write() as conn:
+            written = await upsert_forecasts(conn, spot.id, local_tz, evaluated)
+        print(f"[LIVE] Wrote back {written} rows for {spot.name}")
+    except Exception as e:
+        print(f"[ERROR] Live forecast write-back failed for {spot.name}: {e}")
+
+
+async def _fetch_live(spot) -> List[dict]:
+    tz_name = spot.timezone or "UTC"
+    local_tz = pytz.timezone(tz_name)
+    forecasts = await get_forecast(spot, tz_name)
+
+    evaluated = []
+    for f in forecasts:
+        try:
+            evaluated.append((f, evaluate_surf_quality(spot, f)))
+        except Exception as e:
+            print(f"[ERROR] Parsing forecast for {spot.name}: {e}")
+
+    # Every hour: callers filter to the hours they serve
+    rows = build_hourly_records(spot.id, local_tz, evaluated, hours=range(24))
+    _cache[str(spot.id)] = (time.monotonic() + LIVE_FORECAST_TTL_SEC, rows)
+
+    if evaluated:
+        task = asyncio.create_task(_write_back(spot, local_tz, evaluated))
+        _write_tasks.add(task)
+        task.add_done_callback(_write_tasks.discard)
+    print(f"[LIVE] Fetched {len(rows)} hours for {spot.name}")
+    return rows
+
+
+async def live_forecast_rows(spot) -> List[dict]:
+    """
+    Rows in the surf_forecast_hourly layout, fetched live (or from the TTL cache).
+    Raises LiveForecastTimeout when the upstream misses the latency budget.
+    """
+    cached = _cache.get(str(spot.id))
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    try:
+        return await asyncio.wait_for(
+            live_flight.do(str(spot.id), lambda: _fetch_live(spot)),
+            timeout=LIVE_FORECAST_BUDGET_SEC,
+        )
+    except asyncio.TimeoutError:
+        raise LiveForecastTimeout(f"No live forecast for {spot.name} within {LIVE_FORECAST_BUDGET_SEC:g}s")
@@ -1,8 +1,15 @@
 # app/main.py
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import router
+from app.forecast import close_http_client
+from app.db import db
+from app.registry import spot_registry
+from app.events import FORECAST_GENERATION, SPOT_CHANGED, invalidation_bus
+from app.tiles import invalidate_tiles
+from app.snapshot import invalidate_snapshot
 
 
 try:
@@ -13,7 +20,29 @@ except ImportError:
 
 
 
-app = FastAPI(title="Surf Forecast MVP")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    invalidation_bus.subscribe(SPOT_CHANGED, spot_registry.on_spot_changed)
+    invalidation_bus.subscribe(FORECAST_GENERATION, invalidate_tiles)
+    invalidation_bus.subscribe(FORECAST_GENERATION, invalidate_snapshot)
+    try:
+        await db.start()
+    except Exception as e:
+        # Pools are opened on first use instead
+        print(f"[ERROR] Database pool startup failed: {e}")
+    await invalidation_bus.start_or_retry()
+    try:
+        await spot_registry.load()
+    except Exception as e:
+        # Endpoints load the registry lazily on first use instead
+        print(f"[ERROR] Spot registry startup load failed: {e}")
+    yield
+    await invalidation_bus.stop()
+    await db.stop()
+    await close_http_client()
+
+
+app = FastAPI(title="Surf Forecast MVP", lifespan=lifespan)
 
 # read your front-end URL from env (set this in Railway Variables)
 FRONTEND_URL = os.getenv("FRONTEND_URL", "*")
@@ -26,6 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(router)
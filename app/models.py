@@ -23,9 +23,27 @@ class SurfForecast(BaseModel):
     wind_direction_deg: Optional[float] = None
     wind_type: Optional[str] = None  # "offshore", "cross-shore", "onshore", "glassy", "unknown"
     wind_severity: Optional[str] = None  # "light", "breezy", "strong", "none"
-    explanation: Optional[str] = None
+    explanation: Optional[str] = None  # rendered from reason_code when asked for
+    reason_code: Optional[int] = None  # see REASON_* in app/heuristics.py
     rating: Optional[str] = None  # "Lake mode", "Sketchy", "Playable", "Solid", "Firing"
 
+class HeuristicParams(BaseModel):
+    """Thresholds used by evaluate_surf_quality; the defaults are the production rules."""
+    default_swell_min_m: float = 0.5     # when the spot has no swell_min_m
+    swell_min_scale: float = 1.0         # multiplier on the spot's swell_min_m
+    default_wind_wave_max_m: float = 1.0
+    min_period_s: float = 7
+    short_period_s: float = 8
+    mid_period_s: float = 10
+    long_period_s: float = 12
+    clean_wind_kmh: float = 12           # long period + offshore/glassy → Firing
+    offshore_wind_kmh: float = 18        # long period + offshore → Solid
+    light_wind_kmh: float = 8            # onshore/cross-shore still fine below this
+    onshore_wind_kmh: float = 12         # long period + onshore → Playable
+    cross_wind_kmh: float = 15           # long period + cross-shore → Playable
+    mid_clean_wind_kmh: float = 15       # mid period + offshore/glassy → Solid
+    short_clean_wind_kmh: float = 10     # short period + offshore/glassy → Playable
+
 class SurfAlertCreate(BaseModel):
     email: EmailStr
     town: str
@@ -0,0 +1,121 @@
+# pagination.py
+"""
+Keyset pagination and field projection for /api/spots/forecasted.
+
+Spots are ordered by their soonest daily-best forecast (local date + time),
+then by id; the cursor is that (timestamp, id) pair of the last spot on the
+page, so each page is an index-friendly `(sort_ts, id) > cursor` query no
+matter how deep the client has paged.
+
+`fields` takes spot columns and `forecasts.<column>` names, e.g.
+`fields=name,lat,lon,forecasts.date,forecasts.rating`; a bare `forecasts`
+keeps every forecast column. `id` is always returned.
+"""
+import base64
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+SPOT_FIELDS = ("id", "name", "lat", "lon", "region", "town", "surf_benchmark_url", "timezone")
+FORECAST_FIELDS = (
+    "date", "time", "rating", "explanation", "reason_code", "swell_wave_height",
+    "swell_wave_peak_period", "wind_speed_kmh", "wind_type", "wind_severity",
+    "swell_wave_direction", "timezone",
+)
+# Forecast field → surf_forecast_hourly column (date/time come from timestamp_utc)
+FORECAST_COLUMNS = {
+    "rating": "surf_rating",
+    "explanation": "explanation",
+    "reason_code": "reason_code",
+    "swell_wave_height": "swell_wave_height",
+    "swell_wave_peak_period": "swell_wave_peak_period",
+    "wind_speed_kmh": "wind_speed_kmh",
+    "wind_type": "wind_type",
+    "wind_severity": "wind_severity",
+    "swell_wave_direction": "swell_wave_direction",
+}
+# explain_reason reads these
+EXPLAIN_COLUMNS = ("reason_code", "explanation", "swell_wave_height", "swell_wave_peak_period",
+                   "swell_wave_direction", "wind_speed_kmh", "wind_type")
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[Set[str], Set[str]]:
+    """(spot fields, forecast fields) to return; everything when `fields` is not given."""
+    if not fields:
+        return set(SPOT_FIELDS), set(FORECAST_FIELDS)
+    spot, forecast = {"id"}, set()
+    for name in (f.strip() for f in fields.split(",")):
+        if not name:
+            continue
+        if name == "forecasts":
+            forecast.update(FORECAST_FIELDS)
+        elif name.startswith("forecasts."):
+            if name[10:] not in FORECAST_FIELDS:
+                raise InvalidQuery(f"Unknown forecast field '{name[10:]}'")
+            forecast.add(name[10:])
+        elif name in SPOT_FIELDS:
+            spot.add(name)
+        else:
+            raise InvalidQuery(f"Unknown field '{name}'")
+    return spot, forecast
+
+
+def select_columns(spot_fields: Set[str], forecast_fields: Set[str], explain: bool) -> List[str]:
+    """SQL select list for the requested fields (plus what grouping needs)."""
+    columns = ["s.id", "s.timezone", "f.timestamp_utc", "f.surf_rating"]
+    columns += [f"s.{name}" for name in SPOT_FIELDS if name in spot_fields and name not in ("id", "timezone")]
+    wanted = {FORECAST_COLUMNS[name] for name in forecast_fields if name in FORECAST_COLUMNS}
+    if explain and "explanation" in forecast_fields:
+        wanted.update(EXPLAIN_COLUMNS)
+    columns += [f"f.{c}" for c in sorted(wanted) if c != "surf_rating"]
+    return columns
+
+
+def sort_key(entry: dict) -> Tuple[str, str]:
+    first = entry["forecasts"][0]
+    return first["date"] + first["time"], str(entry["id"])
+
+
+def encode_cursor(entry: dict) -> str:
+    first = entry["forecasts"][0]
+    raw = f"{first['date']}T{first['time']}|{entry['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[Optional[datetime], Optional[UUID]]:
+    if not cursor:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, spot_id = raw.split("|")
+        return datetime.fromisoformat(ts), UUID(spot_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidQuery(f"Invalid cursor: {e}")
+
+
+def paginate(spots: List[dict], cursor: Optional[str], limit: Optional[int]) -> Tuple[List[dict], Optional[str]]:
+    """In-memory keyset page over group_daily_best output (already in sort_key order)."""
+    after_ts, after_id = decode_cursor(cursor)
+    if after_ts is not None:
+        after = (after_ts.strftime("%Y-%m-%d%H:%M"), str(after_id))
+        spots = [s for s in spots if sort_key(s) > after]
+    if limit is None or len(spots) <= limit:
+        return spots, None
+    page = spots[:limit]
+    return page, encode_cursor(page[-1])
+
+
+def project(spots: List[dict], spot_fields: Set[str], forecast_fields: Set[str]) -> List[dict]:
+    if len(spot_fields) == len(SPOT_FIELDS) and len(forecast_fields) == len(FORECAST_FIELDS):
+        return spots
+    projected = []
+    for entry in spots:
+        out: Dict = {k: v for k, v in entry.items() if k in spot_fields}
+        if forecast_fields:
+            out["forecasts"] = [{k: v for k, v in f.items() if k in forecast_fields} for f in entry["forecasts"]]
+        projected.append(out)
+    return projected
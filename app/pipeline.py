@@ -0,0 +1,155 @@
+# pipeline.py
+"""
+Small streaming pipeline: async stages connected by bounded queues.
+
+Each stage runs its own number of workers. A full queue blocks the stage
+feeding it, so memory stays bounded and the slowest stage sets the pace.
+A stage can also take its input in batches (e.g. one DB write per N spots).
+
+Stage functions receive one item, or a list of items when batch_size > 1.
+They return the item to pass downstream, or None to drop it. With fan_out=True
+they return a list instead, and each element is passed on separately.
+Exceptions are logged and counted, and the item is dropped.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+_DONE = object()
+QUEUE_SAMPLE_SEC = 0.5
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Awaitable],
+        workers: int = 1,
+        queue_size: int = 100,
+        batch_size: int = 1,
+        batch_wait: float = 0.5,
+        fan_out: bool = False,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.fan_out = fan_out
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.outbox: Optional[asyncio.Queue] = None
+
+        self.items = 0
+        self.calls = 0
+        self.errors = 0
+        self.busy_sec = 0.0
+        self.max_latency = 0.0
+        self.queue_max = 0
+        self._queue_total = 0
+        self._queue_samples = 0
+
+    async def _next_batch(self) -> tuple[List, bool]:
+        """Up to batch_size items; waits at most batch_wait after the first. Second value: input ended."""
+        first = await self.inbox.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = await asyncio.wait_for(self.inbox.get(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _worker(self):
+        done = False
+        while not done:
+            if self.batch_size > 1:
+                batch, done = await self._next_batch()
+                if not batch:
+                    break
+                payload, count = batch, len(batch)
+            else:
+                payload = await self.inbox.get()
+                if payload is _DONE:
+                    break
+                count = 1
+
+            start = time.monotonic()
+            try:
+                result = await self.fn(payload)
+            except Exception as e:
+                self.errors += 1
+                result = None
+                print(f"[ERROR] Pipeline stage '{self.name}' failed: {e}")
+            elapsed = time.monotonic() - start
+            self.calls += 1
+            self.items += count
+            self.busy_sec += elapsed
+            self.max_latency = max(self.max_latency, elapsed)
+
+            if result is not None and self.outbox is not None:
+                for out in (result if self.fan_out else [result]):
+                    await self.outbox.put(out)
+
+    async def run(self, downstream_workers: int):
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+        if self.outbox is not None:
+            for _ in range(downstream_workers):
+                await self.outbox.put(_DONE)
+
+    def sample_queue(self):
+        depth = self.inbox.qsize()
+        self.queue_max = max(self.queue_max, depth)
+        self._queue_total += depth
+        self._queue_samples += 1
+
+    def report(self) -> dict:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_sec": round(self.busy_sec, 2),
+            "avg_ms": round(1000 * self.busy_sec / self.calls) if self.calls else 0,
+            "max_ms": round(1000 * self.max_latency),
+            "queue_avg": round(self._queue_total / self._queue_samples, 1) if self._queue_samples else 0,
+            "queue_max": self.queue_max,
+        }
+
+
+class Pipeline:
+    def __init__(self, *stages: Stage):
+        self.stages = stages
+        for stage, following in zip(stages, stages[1:]):
+            stage.outbox = following.inbox
+
+    async def _monitor(self):
+        while True:
+            for stage in self.stages:
+                stage.sample_queue()
+            await asyncio.sleep(QUEUE_SAMPLE_SEC)
+
+    async def _feed(self, items: Iterable):
+        first = self.stages[0]
+        for item in items:
+            await first.inbox.put(item)
+        for _ in range(first.workers):
+            await first.inbox.put(_DONE)
+
+    async def run(self, items: Iterable) -> List[dict]:
+        """Streams `items` through every stage; returns per-stage stats once all are drained."""
+        monitor = asyncio.create_task(self._monitor())
+        try:
+            downstream = [s.workers for s in self.stages[1:]] + [0]
+            await asyncio.gather(
+                self._feed(items),
+                *(stage.run(n) for stage, n in zip(self.stages, downstream)),
+            )
+        finally:
+            monitor.cancel()
+        return [stage.report() for stage in self.stages]
@@ -0,0 +1,139 @@
+# registry.py
+"""
+Process-wide cache of surf_spots, indexed by UUID.
+
+Loaded once per process, then kept current by `spot_changed` events on the
+invalidation bus (app/events.py), which the trigger in sql/surf_spots_notify.sql
+publishes for every row change. Changed ids are batched briefly and re-read
+with one query; an event without an id triggers a full reload.
+"""
+import asyncio
+import os
+from typing import Dict, Iterator, Optional, Set
+from uuid import UUID
+
+import asyncpg
+
+from app.coalesce import single_flight
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+# Notifications arriving within this window are refreshed with one query
+REFRESH_BATCH_DELAY_SEC = 0.2
+
+# Everything but geom, which nothing in Python reads
+SPOT_COLUMNS = (
+    "id", "name", "lat", "lon", "facing_direction", "swell_min_m",
+    "swell_dir_min", "swell_dir_max", "preferred_wind_wave_max_m",
+    "best_swell_dir_label", "best_wind_dir_label", "post_code", "town",
+    "region", "surf_benchmark_url", "image_url", "image_credit", "image_credit_url",
+    "image_source_url", "timezone",
+)
+SPOT_QUERY = f"SELECT {', '.join(SPOT_COLUMNS)} FROM surf_spots"
+
+
+class SpotRecord:
+    """
+    Slot-based stand-in for SurfSpot: same attribute names and helper properties,
+    so it can be passed to get_forecast / evaluate_surf_quality directly.
+    """
+    __slots__ = SPOT_COLUMNS
+
+    def __init__(self, row):
+        for name in SPOT_COLUMNS:
+            setattr(self, name, row[name])
+
+    @property
+    def swell_dir_range(self) -> tuple[float, float]:
+        return (self.swell_dir_min or 0.0, self.swell_dir_max or 360.0)
+
+    @property
+    def facing_direction_deg(self) -> float:
+        return self.facing_direction or 0.0
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in SPOT_COLUMNS}
+
+
+class SpotRegistry:
+    def __init__(self):
+        self._spots: Dict[UUID, SpotRecord] = {}
+        self._loaded = False
+        self._pending: Set[UUID] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._spots)
+
+    def all(self) -> Iterator[SpotRecord]:
+        return iter(list(self._spots.values()))
+
+    def get(self, spot_id: UUID) -> Optional[SpotRecord]:
+        return self._spots.get(spot_id)
+
+    async def ensure_loaded(self):
+        """Loads the registry if nothing has yet (e.g. the startup load failed)."""
+        if not self._loaded:
+            await single_flight("spot_registry_load").do("all", self.load)
+
+    async def lookup(self, spot_id: UUID) -> Optional[SpotRecord]:
+        """Like get(), but loads the registry first if nothing has yet."""
+        await self.ensure_loaded()
+        return self._spots.get(spot_id)
+
+    async def load(self, conn: Optional[asyncpg.Connection] = None):
+        own_conn = conn is None
+        if own_conn:
+            conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            rows = await conn.fetch(SPOT_QUERY)
+        finally:
+            if own_conn:
+                await conn.close()
+        self._spots = {row["id"]: SpotRecord(row) for row in rows}
+        self._loaded = True
+        print(f"[DEBUG] Spot registry loaded {len(self._spots)} surf spots")
+
+    async def refresh(self, spot_ids: Set[UUID]):
+        """Re-reads the given spots, dropping those that no longer exist."""
+        conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            rows = await conn.fetch(f"{SPOT_QUERY} WHERE id = ANY($1::uuid[])", list(spot_ids))
+        finally:
+            await conn.close()
+        found = {row["id"]: SpotRecord(row) for row in rows}
+        for spot_id in spot_ids - found.keys():
+            self._spots.pop(spot_id, None)
+        self._spots.update(found)
+        print(f"[DEBUG] Spot registry refreshed {len(found)} spots, removed {len(spot_ids - found.keys())}")
+
+    async def _flush(self):
+        await asyncio.sleep(REFRESH_BATCH_DELAY_SEC)
+        spot_ids, self._pending = self._pending, set()
+        self._flush_task = None
+        try:
+            await self.refresh(spot_ids)
+        except Exception as e:
+            print(f"[ERROR] Spot registry refresh failed, reloading: {e}")
+            self._loaded = False
+
+    async def on_spot_changed(self, event: dict):
+        if "id" not in event:
+            await self.load()
+            return
+        try:
+            self._pending.add(UUID(str(event["id"])))
+        except ValueError:
+            print(f"[WARNING] Ignoring spot_changed event with bad id: {event}")
+            return
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush())
+
+
+spot_registry = SpotRegistry()
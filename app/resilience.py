@@ -0,0 +1,263 @@
+# resilience.py
+"""
+Retry, circuit-breaking and hedging for upstream HTTP calls (Open-Meteo).
+
+- Retries back off exponentially with full jitter. A 429/503 `Retry-After`
+  header is honoured, capped so that one slow host cannot stall a cron run.
+- Each host has a circuit breaker. Once the error rate over the recent window
+  crosses the threshold, calls to that host fail fast for a cooldown period.
+  After that a single probe decides whether the breaker closes again.
+- Optional hedging: if a request is still pending after the host's observed
+  p95 latency, a second identical request is started and the first response
+  wins. Only use this for idempotent GETs.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+NETWORK_ERRORS = (
+    httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError,
+    BrokenPipeError, ConnectionResetError,
+)
+
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_CAP_SEC = 8.0
+MAX_RETRY_AFTER_SEC = 30.0
+
+BREAKER_WINDOW_SEC = 60.0
+BREAKER_MIN_CALLS = 10
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN_SEC = 30.0
+
+HEDGE_MIN_SAMPLES = 20
+LATENCY_SAMPLES = 200
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SEC, cap: float = BACKOFF_CAP_SEC) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """closed → open (fail fast) → half-open (one probe) → closed or open again."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = "closed"
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - BREAKER_WINDOW_SEC:
+            self._outcomes.popleft()
+
+    def before_call(self):
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < BREAKER_COOLDOWN_SEC:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit open for {self.host}")
+            self.state = "half-open"
+        if self.state == "half-open":
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit half-open for {self.host}, probe in flight")
+            self._probing = True
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        if self.state == "half-open":
+            self._probing = False
+            self._outcomes.clear()
+            if ok:
+                self.state = "closed"
+                print(f"[INFO] Circuit for {self.host} closed again")
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, ok))
+        self._trim(now)
+        failures = sum(1 for _, success in self._outcomes if not success)
+        if (self.state == "closed" and len(self._outcomes) >= BREAKER_MIN_CALLS
+                and failures / len(self._outcomes) >= BREAKER_ERROR_RATE):
+            self._open(now)
+
+    def abandon(self):
+        """The call was cancelled: let another caller probe."""
+        if self.state == "half-open":
+            self._probing = False
+
+    def _open(self, now: float):
+        self.state = "open"
+        self._opened_at = now
+        print(f"[WARNING] Circuit for {self.host} opened, failing fast for {BREAKER_COOLDOWN_SEC:g}s")
+
+
+class LatencyTracker:
+    def __init__(self):
+        self._samples: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class HostStats:
+    def __init__(self, host: str):
+        self.breaker = CircuitBreaker(host)
+        self.latency = LatencyTracker()
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "requests": self.requests,
+            "retries": self.retries,
+            "rejected": self.breaker.rejected,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(self.latency.p95() * 1000) if self.latency.p95() is not None else None,
+        }
+
+
+_hosts: Dict[str, HostStats] = {}
+
+
+def host_stats(url: str) -> HostStats:
+    host = urlparse(url).netloc
+    if host not in _hosts:
+        _hosts[host] = HostStats(host)
+    return _hosts[host]
+
+
+def resilience_stats() -> Dict[str, dict]:
+    return {host: stats.as_dict() for host, stats in _hosts.items()}
+
+
+async def _timed_get(client: httpx.AsyncClient, stats: HostStats, url: str, **kwargs) -> httpx.Response:
+    start = time.monotonic()
+    response = await client.get(url, **kwargs)
+    stats.latency.add(time.monotonic() - start)
+    return response
+
+
+async def _hedged_get(client: httpx.AsyncClient, stats: HostStats, url: str, **kwargs) -> httpx.Response:
+    deadline = stats.latency.p95()
+    primary = asyncio.create_task(_timed_get(client, stats, url, **kwargs))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=deadline)
+        if done:
+            return primary.result()
+
+        stats.hedges += 1
+        hedge = asyncio.create_task(_timed_get(client, stats, url, **kwargs))
+        tasks.append(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        stats.hedge_wins += 1
+                    return task.result()
+        # Both failed: surface the primary's error
+        return primary.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def resilient_get(
+    client: httpx.AsyncClient,
+    url: str,
+    retries: int = 3,
+    budget: Optional[float] = None,
+    hedge: bool = False,
+    **kwargs,
+) -> httpx.Response:
+    """
+    GET `url` with retries on network errors and RETRYABLE_STATUS. Returns the
+    response (raise_for_status() has been called on it). Raises CircuitOpenError
+    without calling the host while its breaker is open. Raises the last error
+    once retries are exhausted, or once the next wait would overrun `budget` seconds.
+    """
+    stats = host_stats(url)
+    started = time.monotonic()
+    for attempt in range(retries + 1):
+        stats.breaker.before_call()
+        stats.requests += 1
+        delay = backoff_delay(attempt)
+        try:
+            if hedge:
+                response = await _hedged_get(client, stats, url, **kwargs)
+            else:
+                response = await _timed_get(client, stats, url, **kwargs)
+            if response.status_code in RETRYABLE_STATUS:
+                stats.breaker.record(False)
+                wait = retry_after_seconds(response)
+                if wait is not None:
+                    delay = min(wait, MAX_RETRY_AFTER_SEC)
+            else:
+                stats.breaker.record(response.status_code < 500)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in RETRYABLE_STATUS or attempt == retries:
+                raise
+            error = e
+        except NETWORK_ERRORS as e:
+            stats.breaker.record(False)
+            if attempt == retries:
+                raise
+            error = e
+        except asyncio.CancelledError:
+            stats.breaker.abandon()
+            raise
+        except Exception:
+            stats.breaker.record(False)
+            raise
+
+        if stats.breaker.state == "open":
+            raise error
+        if budget is not None and time.monotonic() - started + delay > budget:
+            raise error
+        stats.retries += 1
+        print(f"[WARNING] {url} failed (attempt {attempt + 1}/{retries + 1}): {error!r}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
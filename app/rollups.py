@@ -0,0 +1,109 @@
+# rollups.py
+"""
+Per-region "best spots" rollup, maintained by the forecast cron.
+
+A spot's best surfable hour of a local day is the best peak among its stored
+session windows for that day (app/sessions.py: same SURF_HOURS, MIN_RATING and
+best_key). After the run the cron rebuilds surf_region_daily_best
+(sql/surf_region_daily_best.sql) from surf_session_windows in SQL, ranking
+every spot per region and day and keeping the top REGION_TOP_N, so
+/api/regions/{region}/best is one primary-key range read.
+
+Ranking the stored windows rather than this run's evaluations means spots the
+run skipped or failed to fetch keep their place instead of dropping out.
+"""
+from typing import Optional, Tuple
+
+from app.storage import RATINGS
+
+REGION_TOP_N = 10
+# Local hours worth surfing; night-time ratings don't make a spot "best"
+SURF_HOURS = range(6, 21)
+MIN_RATING = RATINGS.index("Playable")
+
+BEST_FIELDS = (
+    "rating", "swell_wave_height", "swell_wave_peak_period", "swell_wave_direction",
+    "wind_wave_height_m", "wind_speed_kmh", "wind_type", "wind_severity", "reason_code",
+)
+ROLLUP_COLUMNS = (
+    "region_key", "region", "date_local", "rank", "spot_id", "spot_name", "town",
+    "lat", "lon", "timezone", "best_time", *BEST_FIELDS,
+)
+
+
+def region_key(region: Optional[str]) -> Optional[str]:
+    """Case/whitespace-insensitive lookup key for a region name."""
+    return region.strip().lower() if region and region.strip() else None
+
+
+def rating_rank(rating: Optional[str]) -> int:
+    return RATINGS.index(rating) if rating in RATINGS else -1
+
+
+def best_key(entry: dict) -> Tuple:
+    """Rating first, then swell energy (height x period), then lighter wind."""
+    return (
+        rating_rank(entry["rating"]),
+        (entry["swell_wave_height"] or 0) * (entry["swell_wave_peak_period"] or 0),
+        -(entry["wind_speed_kmh"] or 0),
+    )
+
+
+def hour_entry(forecast, surf) -> dict:
+    """One evaluated hour as a plain dict: local date/time, rating and BEST_FIELDS metrics."""
+    return {
+        "date_local": forecast.time[:10],
+        "time": forecast.time[11:16],
+        "rating": surf.rating,
+        "swell_wave_height": surf.swell_wave_height,
+        "swell_wave_peak_period": surf.swell_wave_peak_period,
+        "swell_wave_direction": surf.swell_wave_direction,
+        "wind_wave_height_m": surf.wind_wave_height_m,
+        "wind_speed_kmh": surf.wind_speed_kmh,
+        "wind_type": surf.wind_type,
+        "wind_severity": surf.wind_severity,
+        "reason_code": surf.reason_code,
+    }
+
+
+def is_surfable(forecast, surf) -> bool:
+    return int(forecast.time[11:13]) in SURF_HOURS and rating_rank(surf.rating) >= MIN_RATING
+
+
+_PEAK_AS = ",\n               ".join(f"w.peak_{f} AS {f}" for f in BEST_FIELDS[1:])
+
+# Same order as best_key; ties go to the earliest hour, then the larger spot id
+REBUILD_ROLLUP_SQL = f"""
+    WITH spot_best AS (
+        SELECT DISTINCT ON (w.spot_id, w.date_local)
+               lower(btrim(s.region)) AS region_key, btrim(s.region) AS region, w.date_local,
+               w.spot_id, s.name AS spot_name, s.town, s.lat, s.lon, s.timezone,
+               w.peak_time::time AS best_time, w.peak_rating AS rating,
+               {_PEAK_AS},
+               array_position($1::text[], w.peak_rating) AS rating_rank,
+               COALESCE(w.peak_swell_wave_height, 0) * COALESCE(w.peak_swell_wave_peak_period, 0) AS energy,
+               COALESCE(w.peak_wind_speed_kmh, 0) AS wind
+        FROM surf_session_windows w
+        JOIN surf_spots s ON s.id = w.spot_id
+        WHERE btrim(COALESCE(s.region, '')) <> ''
+        ORDER BY w.spot_id, w.date_local, rating_rank DESC, energy DESC, wind, w.peak_time
+    ), ranked AS (
+        SELECT *, row_number() OVER (
+            PARTITION BY region_key, date_local
+            ORDER BY rating_rank DESC, energy DESC, wind, spot_id::text DESC
+        ) AS rank
+        FROM spot_best
+    )
+    INSERT INTO surf_region_daily_best ({", ".join(ROLLUP_COLUMNS)})
+    SELECT {", ".join(ROLLUP_COLUMNS)}
+    FROM ranked
+    WHERE rank <= $2
+"""
+
+
+async def rebuild_region_rollup(conn, top_n: int = REGION_TOP_N) -> int:
+    """Re-ranks the stored windows into a new rollup atomically; readers see the old one until commit."""
+    async with conn.transaction():
+        await conn.execute("DELETE FROM surf_region_daily_best")
+        status = await conn.execute(REBUILD_ROLLUP_SQL, RATINGS, top_n)
+    return int(status.split()[-1])
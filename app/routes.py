@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Query, HTTPException, Path
-from typing import List, Dict
+from fastapi import APIRouter, Query, HTTPException, Path, Request, Response
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta, date
 
 from fastapi.responses import StreamingResponse
@@ -14,6 +14,21 @@ from collections import defaultdict
 import pytz
 from timezonefinder import TimezoneFinder
 from app.models import SurfForecast, SurfAlertCreate
+from app.heuristics import explain_reason, group_daily_best
+from app.registry import spot_registry
+from app.live import LiveForecastTimeout, live_forecast_rows
+from app.snapshot import current_snapshot
+from app.coalesce import coalescing_stats, single_flight
+from app.pagination import (
+    InvalidQuery, decode_cursor, encode_cursor, paginate, parse_fields, project, select_columns,
+)
+from app.columnar import MEDIA_TYPE as COLUMNAR_MEDIA_TYPE, encode_forecasted_spots, encode_spot_forecasts, wants_columnar
+from app.tiles import TILE_MAX_AGE_SEC, get_tile
+from app.storage import PACKED_READ_SQL, RELEVANT_HOURS, forecast_source, reads_packed, unpack_hour
+from app.rollups import BEST_FIELDS, REGION_TOP_N, rating_rank, region_key
+from app.sessions import PEAK_FIELDS, SPOT_WINDOWS_SQL
+from app.db import db
+from app.coverage import SKIPPED_SPOT_SQL
 from uuid import UUID
 
 try:
@@ -28,156 +43,204 @@ router = APIRouter()
 DATABASE_URL = os.getenv("SUPABASE_DB_URL")
 tf = TimezoneFinder()
 
-# Rating priority for sorting
-rating_priority = {"Firing": 4, "Solid": 3, "Playable": 2, "Sketchy": 1, "Lake Mode":0}
+# Concurrent identical reads share one in-flight query
+forecasted_flight = single_flight("spots_forecasted")
+spot_forecasts_flight = single_flight("spot_forecasts")
+COALESCE_COORD_DECIMALS = 2
+
+def with_explanations(spots: List[dict]) -> List[dict]:
+    """Copies of group_daily_best entries with explanation text rendered from reason codes."""
+    rendered = []
+    for entry in spots:
+        spot = spot_registry.get(UUID(str(entry["id"])))
+        forecasts = [
+            {**f, "explanation": explain_reason(f["reason_code"], f, spot)} if f.get("reason_code") is not None else f
+            for f in entry["forecasts"]
+        ]
+        rendered.append({**entry, "forecasts": forecasts})
+    return rendered
+
+
+# Page of spot ids in keyset order: each spot's soonest daily best (local), then id
+FORECASTED_PAGE_SQL = f"""
+    WITH hits AS (
+        SELECT s.id, f.surf_rating,
+               (f.timestamp_utc AT TIME ZONE 'UTC') AT TIME ZONE COALESCE(s.timezone, 'UTC') AS local_ts
+        FROM surf_spots s
+        JOIN {forecast_source()} f ON f.spot_id = s.id
+        WHERE ST_DWithin(
+            s.geom,
+            ST_SetSRID(ST_MakePoint($1, $2), 4326),
+            $3 * 1000
+        )
+        AND f.timestamp_utc >= NOW()
+        AND f.surf_rating IN ('Firing', 'Solid', 'Playable')
+    ),
+    spot_keys AS (
+        SELECT DISTINCT ON (id) id, date_trunc('minute', local_ts) AS sort_ts
+        FROM hits
+        ORDER BY id, local_ts::date,
+                 CASE surf_rating WHEN 'Firing' THEN 3 WHEN 'Solid' THEN 2 ELSE 1 END DESC,
+                 local_ts
+    )
+    SELECT id FROM spot_keys
+    WHERE $4::timestamp IS NULL OR (sort_ts, id) > ($4::timestamp, $5::uuid)
+    ORDER BY sort_ts, id
+    LIMIT $6
+"""
+
 
 @router.get("/api/spots/forecasted")
 async def get_forecasted_spots(
+    request: Request,
+    response: Response,
     lat: float,
     lon: float,
-    max_distance_km: int = Query(100, ge=1, le=500)
+    max_distance_km: int = Query(100, ge=1, le=500),
+    explain: bool = Query(False, description="Render explanation text for each forecast"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Spots per page (all when omitted)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="e.g. name,lat,lon,forecasts.date,forecasts.rating"),
 ):
-    query = """
-    SELECT
-        s.id, s.name, s.lat, s.lon, s.region, s.town, s.surf_benchmark_url, s.timezone,
-        f.timestamp_utc, f.surf_rating, f.explanation, f.swell_wave_height, f.swell_wave_peak_period, f.wind_speed_kmh, f.wind_type, f.wind_severity, f.swell_wave_direction
-    FROM surf_spots s
-    JOIN surf_forecast_hourly f ON f.spot_id = s.id
-    WHERE ST_DWithin(
-        s.geom,
-        ST_SetSRID(ST_MakePoint($1, $2), 4326),
-        $3 * 1000
-    )
-    AND f.timestamp_utc >= NOW() 
-    AND f.surf_rating IN ('Firing', 'Solid', 'Playable')
-    ORDER BY s.id, f.timestamp_utc
-    """
+    try:
+        spot_fields, forecast_fields = parse_fields(fields)
+        after_ts, after_id = decode_cursor(cursor)
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    columns = select_columns(spot_fields, forecast_fields, explain)
+
+    # Searches within ~1 km of each other share one bucket, so concurrent ones coalesce;
+    # the bucket is only the coalescing key, each query still uses the exact centre
+    bucket = (round(lat, COALESCE_COORD_DECIMALS), round(lon, COALESCE_COORD_DECIMALS))
+
+    def respond(spots, next_cursor):
+        if explain:
+            spots = with_explanations(spots)
+        spots = project(spots, spot_fields, forecast_fields)
+        headers = {"Vary": "Accept"}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        if wants_columnar(request.headers.get("accept")):
+            return Response(encode_forecasted_spots(spots, explain, next_cursor=next_cursor),
+                            media_type=COLUMNAR_MEDIA_TYPE, headers=headers)
+        response.headers.update(headers)
+        return spots
+
+    snapshot = current_snapshot()
+    if snapshot:
+        spots = group_daily_best(snapshot.forecasted_rows(lat, lon, max_distance_km, datetime.now(pytz.utc)))
+        return respond(*paginate(spots, cursor, limit))
+
+    async def fetch():
+        async with db.read() as conn:
+            # One extra id tells us whether there is a next page
+            page_ids = [r["id"] for r in await conn.fetch(
+                FORECASTED_PAGE_SQL, lon, lat, max_distance_km, after_ts, after_id,
+                None if limit is None else limit + 1,
+            )]
+            rows = await conn.fetch(f"""
+                SELECT {', '.join(columns)}
+                FROM surf_spots s
+                JOIN {forecast_source()} f ON f.spot_id = s.id
+                WHERE s.id = ANY($1::uuid[])
+                AND f.timestamp_utc >= NOW()
+                AND f.surf_rating IN ('Firing', 'Solid', 'Playable')
+                ORDER BY s.id, f.timestamp_utc
+            """, page_ids[:limit])
+        spots = group_daily_best(rows)
+        next_cursor = None
+        if limit is not None and len(page_ids) > limit and spots:
+            next_cursor = encode_cursor(spots[-1])
+        return spots, next_cursor
 
     try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        rows = await conn.fetch(query, lon, lat, max_distance_km)
-        await conn.close()
+        key = (*bucket, max_distance_km, cursor, limit, tuple(columns))
+        return respond(*await forecasted_flight.do(key, fetch))
     except Exception as e:
         print(f"[ERROR] Forecast query failed: {e}")
         return {"error": str(e)}
 
-    # Group rows by spot ID
-    grouped = defaultdict(list)
-    spot_info = {}
-    for row in rows:
-        spot_id = row["id"]
-        grouped[spot_id].append(row)
-        if spot_id not in spot_info:
-            spot_info[spot_id] = {
-                "id": spot_id,
-                "name": row["name"],
-                "lat": row["lat"],
-                "lon": row["lon"],
-                "region": row["region"],
-                "town": row["town"],
-                "surf_benchmark_url": row["surf_benchmark_url"],
-                "timezone": row["timezone"]
-            }
-
-    # Find best forecast per day per spot (local time)
-    output = []
-    for spot_id, forecasts in grouped.items():
-        tz_str = spot_info[spot_id]["timezone"] or "UTC"
-        tz = pytz.timezone(tz_str)
-
-        daily_best = {}
-        for f in forecasts:
-            dt_utc = f["timestamp_utc"]
-            dt_local = dt_utc.replace(tzinfo=pytz.utc).astimezone(tz)
-            day_str = dt_local.date().isoformat()
-            current_best = daily_best.get(day_str)
-
-            if not current_best or rating_priority[f["surf_rating"]] > rating_priority[current_best["rating"]]:
-                daily_best[day_str] = {
-                    "date": day_str,
-                    "time": dt_local.strftime("%H:%M"),
-                    "rating": f["surf_rating"],
-                    "explanation": f["explanation"],
-                    "swell_wave_height": f["swell_wave_height"],
-                    "swell_wave_peak_period": f["swell_wave_peak_period"],
-                    "wind_speed_kmh": f["wind_speed_kmh"],
-                    "wind_type": f["wind_type"],
-                    "wind_severity": f["wind_severity"],
-                    "swell_wave_direction": f["swell_wave_direction"],
-                    "timestamp_sort": dt_local,
-                    "timezone": tz_str
-                }
-
-        if daily_best:
-            sorted_daily = sorted(daily_best.values(), key=lambda d: d["timestamp_sort"])
-            spot_entry = spot_info[spot_id]
-            spot_entry["forecasts"] = [
-                {k: v for k, v in d.items() if k != "timestamp_sort"} for d in sorted_daily
-            ]
-            # Ensure timezone is included in the spot entry
-            spot_entry["timezone"] = tz_str
-            output.append(spot_entry)
-
-    # Sort all spots by their soonest forecast timestamp
-    output.sort(key=lambda s: s["forecasts"][0]["date"] + s["forecasts"][0]["time"])
-
-    return output
 
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_map_tile(request: Request, z: int, x: int, y: int):
+    """Pre-rendered best-rating tile; served from memory, never hits the database."""
+    generation, body = await get_tile(z, x, y)
+    if generation is None:
+        raise HTTPException(status_code=503, detail="Map tiles not rendered yet")
 
-@router.get(
-    "/api/spots/{spot_id}/forecasts",
-    response_model=list[SurfForecast],
-    summary="Get detailed hourly forecasts for a specific spot (future only)"
-)
-async def get_spot_forecasts(
-    spot_id: UUID = Path(..., description="UUID of the surf spot"),
-    days: int = Query(10, ge=1, le=30, description="Number of days ahead to fetch")
-):
-    # 1) Load spot info, including its IANA time zone and coords
-    lookup_sql = """
-        SELECT lat, lon, timezone
-        FROM surf_spots
-        WHERE id = $1
-    """
-    conn = await asyncpg.connect(DATABASE_URL)
-    spot = await conn.fetchrow(lookup_sql, spot_id)
-    if not spot:
-        await conn.close()
-        raise HTTPException(status_code=404, detail="Spot not found")
+    headers = {
+        "Cache-Control": f"public, max-age={TILE_MAX_AGE_SEC}",
+        "ETag": f'"{generation}"',
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/geo+json", headers=headers)
 
-    lat, lon, tz_name = spot["lat"], spot["lon"], spot["timezone"] or "UTC"
-    tz = pytz.timezone(tz_name)
 
-    # 2) Determine "now" in local time zone
-    now_local = datetime.now(tz)
+async def fetch_spot_forecast_rows(spot_id: UUID, tz, start_date: date, end_date: date, hours: Optional[List[int]]):
+    """Forecast rows for one spot and local date window, from whichever table we read."""
+    async with db.read() as conn:
+        if reads_packed():
+            packed = await conn.fetch(PACKED_READ_SQL, spot_id, start_date, end_date, hours)
+            return [unpack_hour(r, tz) for r in packed]
 
-    # 3) Define date window
-    start_date = now_local.date()
-    end_date = start_date + timedelta(days=days)
+        sql = """
+            SELECT timestamp_utc, timestamp_local, date_local,
+                   swell_wave_height, swell_wave_peak_period, swell_wave_direction,
+                   wind_speed_kmh, wind_direction_deg, wind_type,
+                   surf_rating, reason_code, explanation, wind_wave_height_m, wind_severity
+            FROM surf_forecast_hourly
+            WHERE spot_id = $1
+              AND timestamp_local::date BETWEEN $2 AND $3
+            ORDER BY timestamp_utc
+        """
+        return await conn.fetch(sql, spot_id, start_date, end_date)
+
+
+STORED_IN_HORIZON_SQL = f"""
+    SELECT EXISTS (
+        SELECT 1 FROM {forecast_source()} f
+        WHERE spot_id = $1 AND timestamp_utc >= NOW() AND date_local <= $2
+    )
+"""
 
-    # 4) Fetch rows in date window (using timestamp_local for filtering by date)
-    sql = """
-        SELECT timestamp_utc, timestamp_local, date_local,
-               swell_wave_height, swell_wave_peak_period, swell_wave_direction,
-               wind_speed_kmh, wind_direction_deg, wind_type,
-               surf_rating, explanation, wind_wave_height_m, wind_severity
-        FROM surf_forecast_hourly
-        WHERE spot_id = $1
-          AND timestamp_local::date BETWEEN $2 AND $3
-        ORDER BY timestamp_utc
+
+async def needs_live_forecast(spot_id: UUID, end_date: date) -> bool:
     """
-    try:
-        rows = await conn.fetch(sql, spot_id, start_date, end_date)
-    finally:
-        await conn.close()
+    Live fetches are for spots with nothing stored up to end_date at any hour
+    (not for an ?hours= filter that matched nothing), and never for spots the
+    coverage plan skips because Open-Meteo has no usable data for them.
+    """
+    async with db.read() as conn:
+        try:
+            skipped = await conn.fetchval(SKIPPED_SPOT_SQL, spot_id)
+        except asyncpg.PostgresError as e:
+            # e.g. spot_coverage not migrated yet: nothing is skipped then
+            print(f"[WARNING] Coverage lookup failed for {spot_id}: {e}")
+            skipped = False
+        if skipped:
+            return False
+        return not await conn.fetchval(STORED_IN_HORIZON_SQL, spot_id, end_date)
 
-    # 5) Filter future entries and map to SurfForecast
+
+def explain_row(r, spot) -> Optional[str]:
+    # Rows written before reason codes still carry their text
+    if r.get("reason_code") is None:
+        return r.get("explanation")
+    return explain_reason(r["reason_code"], r, spot)
+
+
+def to_surf_forecasts(rows, tz, now_local: datetime, end_date: date, wanted_hours: Optional[List[int]],
+                      spot=None, explain: bool = False) -> List[SurfForecast]:
     forecasts = []
+    tz_name = tz.zone
     for r in rows:
         # convert UTC timestamp to aware local time
         dt_utc = r["timestamp_utc"].replace(tzinfo=pytz.utc)
         dt_local = dt_utc.astimezone(tz)
-        if dt_local < now_local:
+        if dt_local < now_local or dt_local.date() > end_date:
+            continue
+        if wanted_hours and dt_local.hour not in wanted_hours:
             continue
         forecasts.append(
             SurfForecast(
@@ -191,47 +254,218 @@ async def get_spot_forecasts(
                 wind_direction_deg=r.get("wind_direction_deg"),
                 wind_type=r.get("wind_type"),
                 wind_severity=r.get("wind_severity"),
-                explanation=r.get("explanation"),
+                explanation=explain_row(r, spot) if explain else None,
+                reason_code=r.get("reason_code"),
                 rating=r.get("surf_rating"),
             )
         )
+    return forecasts
+
+
+@router.get(
+    "/api/spots/{spot_id}/forecasts",
+    response_model=list[SurfForecast],
+    summary="Get detailed hourly forecasts for a specific spot (future only)",
+    description="Send `Accept: application/x-msgpack` for the columnar MessagePack encoding (app/columnar.py).",
+)
+async def get_spot_forecasts(
+    request: Request,
+    spot_id: UUID = Path(..., description="UUID of the surf spot"),
+    days: int = Query(10, ge=1, le=30, description="Number of days ahead to fetch"),
+    hours: Optional[List[int]] = Query(None, description="Local hours to return (defaults to the relevant hours 6, 9, 12, 18, 21)"),
+    explain: bool = Query(False, description="Render explanation text for each forecast")
+):
+    if hours and any(h < 0 or h > 23 for h in hours):
+        raise HTTPException(status_code=400, detail="hours must be between 0 and 23")
+
+    # 1) Load spot info, including its IANA time zone and coords
+    spot = await spot_registry.lookup(spot_id)
+    if not spot:
+        raise HTTPException(status_code=404, detail="Spot not found")
+
+    lat, lon, tz_name = spot.lat, spot.lon, spot.timezone or "UTC"
+    tz = pytz.timezone(tz_name)
+
+    # 2) Determine "now" in local time zone
+    now_local = datetime.now(tz)
+
+    # 3) Define date window
+    start_date = now_local.date()
+    end_date = start_date + timedelta(days=days)
+
+    wanted_hours = hours or (RELEVANT_HOURS if reads_packed() else None)
+
+    # 4) Fetch rows in date window: from the shared snapshot when one is mapped,
+    #    otherwise from the database (using timestamp_local for filtering by date)
+    rows = None
+    snapshot = current_snapshot()
+    if snapshot:
+        window_end = tz.localize(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        rows = snapshot.spot_rows(spot_id, now_local, window_end)
+    if not rows:
+        key = (spot_id, start_date, end_date, tuple(wanted_hours) if wanted_hours else None)
+        rows = await spot_forecasts_flight.do(
+            key, lambda: fetch_spot_forecast_rows(spot_id, tz, start_date, end_date, wanted_hours)
+        )
+
+    # 5) Filter future entries and map to SurfForecast
+    forecasts = to_surf_forecasts(rows, tz, now_local, end_date, wanted_hours, spot, explain)
+
+    # 6) Nothing stored (new spot, failed cron run): evaluate it live from Open-Meteo
+    if not forecasts and await needs_live_forecast(spot_id, end_date):
+        try:
+            rows = await live_forecast_rows(spot)
+        except LiveForecastTimeout as e:
+            print(f"[WARNING] {e}")
+            raise HTTPException(status_code=503, detail="Forecast is being generated, retry shortly",
+                                headers={"Retry-After": "5"})
+        except Exception as e:
+            print(f"[ERROR] Live forecast failed for {spot.name}: {e}")
+            rows = []
+        forecasts = to_surf_forecasts(rows, tz, now_local, end_date, wanted_hours or RELEVANT_HOURS, spot, explain)
 
     if not forecasts:
         raise HTTPException(status_code=404, detail="No future forecasts available")
 
+    if wants_columnar(request.headers.get("accept")):
+        return Response(encode_spot_forecasts(spot_id, tz_name, forecasts, explain),
+                        media_type=COLUMNAR_MEDIA_TYPE, headers={"Vary": "Accept"})
     return forecasts
 
 
-@router.get("/api/spots/{spot_id}")
-async def get_spot_details(spot_id: UUID):
-    query = """
-        SELECT id, name, lat, lon, facing_direction, swell_min_m,
-               swell_dir_min, swell_dir_max, preferred_wind_wave_max_m,
-               best_swell_dir_label, best_wind_dir_label, post_code, town,
-               region, surf_benchmark_url, image_url, image_credit, image_credit_url,
-               image_source_url, timezone
-        FROM surf_spots
-        WHERE id = $1
-    """
+@router.get("/api/spots/{spot_id}/windows")
+async def get_spot_windows(
+    spot_id: UUID = Path(..., description="UUID of the surf spot"),
+    days: int = Query(10, ge=1, le=30, description="Number of local days ahead"),
+    min_rating: str = Query("Playable", description="Only windows peaking at this rating or better"),
+    explain: bool = Query(False, description="Render explanation text for each window's peak hour"),
+):
+    """Upcoming runs of consecutive surfable hours, from the cron's surf_session_windows table."""
+    if rating_rank(min_rating) < 0:
+        raise HTTPException(status_code=400, detail=f"Unknown rating '{min_rating}'")
+    spot = await spot_registry.lookup(spot_id)
+    if not spot:
+        raise HTTPException(status_code=404, detail="Spot not found")
 
+    now_local = datetime.now(pytz.timezone(spot.timezone or "UTC")).replace(tzinfo=None)
+    end_date = now_local.date() + timedelta(days=days)
+    try:
+        async with db.read() as conn:
+            rows = await conn.fetch(SPOT_WINDOWS_SQL, spot_id, now_local, end_date)
+    except Exception as e:
+        print(f"[ERROR] Session windows query failed: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
 
-    conn = None
+    windows = []
+    for r in rows:
+        if rating_rank(r["peak_rating"]) < rating_rank(min_rating):
+            continue
+        peak = {f: r[f"peak_{f}"] for f in PEAK_FIELDS}
+        window = {
+            "date": r["date_local"].isoformat(),
+            "start": r["start_local"].strftime("%H:%M"),
+            "end": r["end_local"].strftime("%H:%M"),
+            "hours": r["hours"],
+            "peak_rating": r["peak_rating"],
+            "peak_time": r["peak_time"].strftime("%H:%M"),
+            "peak": peak,
+        }
+        if explain and peak["reason_code"] is not None:
+            window["explanation"] = explain_reason(peak["reason_code"], peak, spot)
+        windows.append(window)
+    return windows
+
+
+@router.get("/api/spots/{spot_id}")
+async def get_spot_details(spot_id: UUID):
     try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        row = await conn.fetchrow(query, spot_id)
+        spot = await spot_registry.lookup(spot_id)
     except Exception as e:
         print(f"[ERROR] Spot details query failed: {e}")
         raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        if conn:
-            await conn.close()
 
-    if not row:
+    if not spot:
         raise HTTPException(status_code=404, detail="Spot not found")
 
-    return dict(row)
+    return spot.to_dict()
 
     
+# Rollup rows for one region over a local-date window (each row's own timezone decides "today")
+REGION_BEST_SQL = f"""
+    WITH params AS (SELECT $2::date AS start_date, $3::int AS days)
+    SELECT region, date_local, rank, spot_id, spot_name, town, lat, lon, timezone, best_time,
+           {", ".join(BEST_FIELDS)}
+    FROM surf_region_daily_best, params
+    WHERE region_key = $1
+      AND rank <= $4
+      AND date_local >= COALESCE(start_date, (now() AT TIME ZONE COALESCE(timezone, 'UTC'))::date)
+      AND date_local < COALESCE(start_date, (now() AT TIME ZONE COALESCE(timezone, 'UTC'))::date) + days
+      AND (NOT $5::bool OR EXTRACT(ISODOW FROM date_local) >= 6)
+    ORDER BY date_local, rank
+"""
+
+
+@router.get("/api/regions/{region}/best")
+async def get_region_best(
+    region: str = Path(..., description="surf_spots.region, case-insensitive"),
+    start: Optional[date] = Query(None, description="First local date (defaults to today)"),
+    days: int = Query(3, ge=1, le=10, description="Number of local days"),
+    weekend: bool = Query(False, description="Only Saturdays and Sundays in the window (use days=7)"),
+    limit: int = Query(REGION_TOP_N, ge=1, le=REGION_TOP_N, description="Spots per day"),
+    explain: bool = Query(False, description="Render explanation text for each spot"),
+):
+    """Top spots per local day in a region, from the cron's surf_region_daily_best rollup."""
+    key = region_key(region)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Region not found")
+
+    try:
+        async with db.read() as conn:
+            rows = await conn.fetch(REGION_BEST_SQL, key, start, days, limit, weekend)
+        # The 404 check and explanations below read the registry
+        await spot_registry.ensure_loaded()
+    except Exception as e:
+        print(f"[ERROR] Region rollup query failed: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+    if not rows and not any(region_key(s.region) == key for s in spot_registry.all()):
+        raise HTTPException(status_code=404, detail="Region not found")
+
+    by_day = defaultdict(list)
+    for r in rows:
+        entry = {
+            "rank": r["rank"],
+            "id": r["spot_id"],
+            "name": r["spot_name"],
+            "town": r["town"],
+            "lat": r["lat"],
+            "lon": r["lon"],
+            "timezone": r["timezone"],
+            "time": r["best_time"].strftime("%H:%M"),
+            **{f: r[f] for f in BEST_FIELDS},
+        }
+        if explain and r["reason_code"] is not None:
+            entry["explanation"] = explain_reason(r["reason_code"], entry, spot_registry.get(r["spot_id"]))
+        by_day[r["date_local"].isoformat()].append(entry)
+
+    return {
+        "region": rows[0]["region"] if rows else region,
+        "days": [{"date": day, "spots": spots} for day, spots in by_day.items()],
+    }
+
+
+@router.get("/api/stats/coalescing")
+async def get_coalescing_stats():
+    """Per-endpoint single-flight counters: `fetches` is the number of DB queries actually run."""
+    return coalescing_stats()
+
+
+@router.get("/api/stats/db")
+async def get_db_stats():
+    """Per-pool query counts, errors, latency percentiles and replica lag, plus reads that fell back to the primary."""
+    return db.stats()
+
+
 @router.get("/api/alerts/{alert_uuid}")
 async def get_surf_alert(alert_uuid: UUID):
         """Get a specific surf alert by alert_uuid from the database"""
@@ -242,16 +476,16 @@ async def get_surf_alert(alert_uuid: UUID):
             WHERE alert_uuid = $1
         """
         
-        conn = None
         try:
-            conn = await asyncpg.connect(DATABASE_URL)
-            row = await conn.fetchrow(query, alert_uuid)
+            async with db.read() as conn:
+                row = await conn.fetchrow(query, alert_uuid)
+            if not row and db.replicas:
+                # Just created and not replicated yet? The primary has it.
+                async with db.read(max_staleness=0) as conn:
+                    row = await conn.fetchrow(query, alert_uuid)
         except Exception as e:
             print(f"[ERROR] Surf alert query failed: {e}")
             raise HTTPException(status_code=500, detail="Database error")
-        finally:
-            if conn:
-                await conn.close()
         
         if not row:
             raise HTTPException(status_code=404, detail="Alert not found")
@@ -270,25 +504,21 @@ async def create_surf_alert(alert: SurfAlertCreate):
                     quality_levels, region, country
         """
         
-        conn = None
         try:
-            conn = await asyncpg.connect(DATABASE_URL)
-            row = await conn.fetchrow(
-                query,
-                alert.email,
-                alert.location_name,
-                alert.lat,
-                alert.lon,
-                alert.radius_km,
-                alert.quality_levels,
-                alert.region,
-                alert.country
-            )
+            async with db.write() as conn:
+                row = await conn.fetchrow(
+                    query,
+                    alert.email,
+                    alert.town,
+                    alert.lat,
+                    alert.lon,
+                    alert.radius_km,
+                    alert.quality_levels,
+                    alert.region,
+                    alert.country
+                )
         except Exception as e:
             print(f"[ERROR] Surf alert creation failed: {e}")
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        finally:
-            if conn:
-                await conn.close()
         
         return dict(row)
\ No newline at end of file
@@ -0,0 +1,99 @@
+# sessions.py
+"""
+Surf session windows: runs of consecutive surfable hours (Playable or better,
+within SURF_HOURS) per spot, e.g. "Solid from 06:00 to 12:00".
+
+Windows are computed from the full hourly evaluation (the hourly table only
+keeps RELEVANT_HOURS, which can't show contiguity) and returned in each spot's
+evaluation summary. After the run the cron replaces every processed spot's windows
+from the start of its new forecast horizon onward, leaving other spots and
+past windows as they were (sql/surf_session_windows.sql).
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from app.rollups import best_key, hour_entry, is_surfable
+
+PEAK_FIELDS = (
+    "swell_wave_height", "swell_wave_peak_period", "swell_wave_direction",
+    "wind_wave_height_m", "wind_speed_kmh", "wind_type", "wind_severity", "reason_code",
+)
+WINDOW_COLUMNS = (
+    "spot_id", "date_local", "start_local", "end_local", "hours", "peak_rating", "peak_time",
+    *(f"peak_{f}" for f in PEAK_FIELDS),
+)
+HOUR = timedelta(hours=1)
+
+DELETE_WINDOWS_SQL = """
+    DELETE FROM surf_session_windows AS w
+    USING unnest($1::uuid[], $2::timestamp[]) AS u(spot_id, since)
+    WHERE w.spot_id = u.spot_id AND w.end_local > u.since
+"""
+SPOT_WINDOWS_SQL = f"""
+    SELECT {", ".join(WINDOW_COLUMNS[1:])}
+    FROM surf_session_windows
+    WHERE spot_id = $1 AND end_local > $2 AND date_local < $3
+    ORDER BY start_local
+"""
+
+
+def _window(spot_id: str, run: List) -> dict:
+    peak = max((hour_entry(f, s) for f, s in run), key=best_key)
+    start = datetime.fromisoformat(run[0][0].time)
+    return {
+        "spot_id": spot_id,
+        "start_local": start.isoformat(timespec="minutes"),
+        "end_local": (datetime.fromisoformat(run[-1][0].time) + HOUR).isoformat(timespec="minutes"),
+        "hours": len(run),
+        "peak_rating": peak["rating"],
+        "peak_time": f"{peak['date_local']}T{peak['time']}",
+        **{f"peak_{f}": peak[f] for f in PEAK_FIELDS},
+    }
+
+
+def session_windows(spot_id: str, evaluated: List) -> List[dict]:
+    """Windows from time-ordered (MarineForecast, SurfForecast) pairs; end_local is exclusive."""
+    windows, run, previous = [], [], None
+    for forecast, surf in evaluated:
+        ts = datetime.fromisoformat(forecast.time)
+        if run and (not is_surfable(forecast, surf) or ts - previous != HOUR):
+            windows.append(_window(spot_id, run))
+            run = []
+        if is_surfable(forecast, surf):
+            run.append((forecast, surf))
+        previous = ts
+    if run:
+        windows.append(_window(spot_id, run))
+    return windows
+
+
+def horizon_start(evaluated: List) -> Optional[str]:
+    """First evaluated local hour: windows ending after it are recomputed by this run."""
+    return evaluated[0][0].time if evaluated else None
+
+
+def window_records(windows: List[dict]) -> List[tuple]:
+    """WINDOW_COLUMNS tuples for COPY (timestamps parsed, date taken from the start)."""
+    records = []
+    for w in windows:
+        start = datetime.fromisoformat(w["start_local"])
+        records.append((
+            w["spot_id"], start.date(), start, datetime.fromisoformat(w["end_local"]), w["hours"],
+            w["peak_rating"], datetime.fromisoformat(w["peak_time"]),
+            *(w[f"peak_{f}"] for f in PEAK_FIELDS),
+        ))
+    return records
+
+
+async def replace_session_windows(conn, since_by_spot: dict, windows: List[dict]) -> int:
+    """For each spot in since_by_spot (spot_id → first local hour), swaps in its new windows."""
+    if not since_by_spot:
+        return 0
+    spot_ids = list(since_by_spot)
+    since = [datetime.fromisoformat(since_by_spot[s]) for s in spot_ids]
+    async with conn.transaction():
+        await conn.execute(DELETE_WINDOWS_SQL, spot_ids, since)
+        records = window_records(windows)
+        if records:
+            await conn.copy_records_to_table("surf_session_windows", records=records, columns=list(WINDOW_COLUMNS))
+    return len(windows)
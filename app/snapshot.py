@@ -0,0 +1,294 @@
+# snapshot.py
+"""
+Immutable binary snapshot of one forecast generation, shared by all API workers.
+
+After each run the cron writes SNAPSHOT_DIR/snapshot-<generation>.bin and swaps
+SNAPSHOT_DIR/CURRENT to it. Workers mmap the file and read the column arrays in
+place (numpy views over the mapping), so N workers share one copy in the page
+cache and forecast reads need no database round-trip.
+
+Layout: MAGIC | uint32 header length | JSON header | 8-byte aligned columns.
+Rows are grouped by spot and ordered by time; the header lists each spot's
+metadata plus the [start, start + count) slice of rows it owns.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import asyncpg
+import numpy as np
+import pytz
+
+from app.storage import (
+    NULL_CODE, PACKED_READ_ALL_SQL, RATINGS, WIND_SEVERITIES, WIND_TYPES,
+    decode, encode, reads_packed, unpack_hour,
+)
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SERVE_FROM_SNAPSHOT = os.getenv("SERVE_FROM_SNAPSHOT", "1") != "0"
+KEEP_SNAPSHOTS = 2
+# How often a worker re-reads SNAPSHOT_DIR/CURRENT even without a bus event
+SNAPSHOT_RELOAD_INTERVAL_SEC = 30
+# Older generations mean the cron has stopped publishing: serve from the database
+SNAPSHOT_MAX_AGE_SEC = int(os.getenv("SNAPSHOT_MAX_AGE_SEC", str(6 * 3600)))
+GENERATION_FORMAT = "%Y%m%dT%H%M%S"
+MAGIC = b"SURFSNP1"
+EARTH_RADIUS_KM = 6371.0
+
+FLOAT_COLUMNS = (
+    "swell_wave_height", "swell_wave_direction", "swell_wave_peak_period",
+    "wind_speed_kmh", "wind_direction_deg", "wind_wave_height_m",
+)
+CODE_COLUMNS = (("surf_rating", RATINGS), ("wind_type", WIND_TYPES), ("wind_severity", WIND_SEVERITIES))
+SPOT_FIELDS = ("name", "region", "town", "surf_benchmark_url", "timezone")
+
+SPOT_SQL = "SELECT id, name, lat, lon, region, town, surf_benchmark_url, timezone FROM surf_spots ORDER BY id"
+HOURLY_SQL = """
+    SELECT spot_id, timestamp_utc, swell_wave_height, swell_wave_direction, swell_wave_peak_period,
+           wind_speed_kmh, wind_direction_deg, wind_wave_height_m,
+           surf_rating, wind_type, wind_severity, reason_code, explanation
+    FROM surf_forecast_hourly
+    WHERE timestamp_utc >= NOW()::date
+    ORDER BY spot_id, timestamp_utc
+"""
+
+
+def _float(value) -> float:
+    return math.nan if value is None else value
+
+
+def _none_if_nan(value) -> Optional[float]:
+    value = float(value)
+    # Round away float32 noise (1.2 -> 1.2000000476837158)
+    return None if math.isnan(value) else round(value, 3)
+
+
+async def _fetch_rows(conn) -> Dict:
+    """{spot_id: [rows in the surf_forecast_hourly layout]} from whichever table we read."""
+    by_spot = {}
+    if reads_packed():
+        yesterday = datetime.utcnow().date() - timedelta(days=1)
+        for r in await conn.fetch(PACKED_READ_ALL_SQL, yesterday):
+            tz = pytz.timezone(r["timezone"] or "UTC")
+            by_spot.setdefault(r["spot_id"], []).append(unpack_hour(r, tz))
+    else:
+        for r in await conn.fetch(HOURLY_SQL):
+            by_spot.setdefault(r["spot_id"], []).append(r)
+    return by_spot
+
+
+async def write_snapshot(generation: Optional[str] = None) -> str:
+    generation = generation or datetime.utcnow().strftime(GENERATION_FORMAT)
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        spots = await conn.fetch(SPOT_SQL)
+        by_spot = await _fetch_rows(conn)
+    finally:
+        await conn.close()
+
+    rows, spot_entries = [], []
+    for spot in spots:
+        spot_rows = by_spot.get(spot["id"], [])
+        spot_entries.append({
+            "id": str(spot["id"]), "lat": spot["lat"], "lon": spot["lon"],
+            **{field: spot[field] for field in SPOT_FIELDS},
+            "start": len(rows), "count": len(spot_rows),
+        })
+        rows.extend(spot_rows)
+
+    explanations = [(r["explanation"] or "").encode() for r in rows]
+    offsets = np.zeros(len(rows) + 1, dtype=np.uint32)
+    np.cumsum([len(e) for e in explanations], out=offsets[1:])
+
+    columns = {
+        "timestamp_utc": np.array(
+            [int(r["timestamp_utc"].replace(tzinfo=pytz.utc).timestamp()) for r in rows], dtype=np.int64),
+        "spot_lat": np.array([s["lat"] for s in spot_entries], dtype=np.float64),
+        "spot_lon": np.array([s["lon"] for s in spot_entries], dtype=np.float64),
+        **{name: np.array([_float(r[name]) for r in rows], dtype=np.float32) for name in FLOAT_COLUMNS},
+        **{name: np.array([encode(r[name], dictionary) for r in rows], dtype=np.int8)
+           for name, dictionary in CODE_COLUMNS},
+        "reason_code": np.array([NULL_CODE if r["reason_code"] is None else r["reason_code"] for r in rows],
+                                dtype=np.int16),
+        "explanation_offsets": offsets,
+        "explanation_blob": np.frombuffer(b"".join(explanations), dtype=np.uint8),
+    }
+
+    layout, position = [], 0
+    for name, array in columns.items():
+        layout.append({"name": name, "dtype": array.dtype.str, "offset": position, "length": len(array)})
+        position += (array.nbytes + 7) // 8 * 8
+    header = json.dumps({
+        "generation": generation, "n_rows": len(rows), "spots": spot_entries, "columns": layout,
+    }).encode()
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = os.path.join(SNAPSHOT_DIR, f"snapshot-{generation}.bin")
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for array in columns.values():
+            data = array.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(path + ".tmp", path)
+
+    pointer_tmp = os.path.join(SNAPSHOT_DIR, "CURRENT.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(generation)
+    os.replace(pointer_tmp, os.path.join(SNAPSHOT_DIR, "CURRENT"))
+
+    old = sorted(f for f in os.listdir(SNAPSHOT_DIR) if f.startswith("snapshot-") and f.endswith(".bin"))
+    for stale in old[:-KEEP_SNAPSHOTS]:
+        os.remove(os.path.join(SNAPSHOT_DIR, stale))
+
+    print(f"[SNAPSHOT] Wrote {len(rows)} rows for {len(spot_entries)} spots ({position} bytes, generation {generation})")
+    return generation
+
+
+class ForecastSnapshot:
+    """Read-only view over a mapped snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a forecast snapshot")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        data_start = len(MAGIC) + 4 + header_len
+        header = json.loads(self._mm[len(MAGIC) + 4:data_start])
+
+        self.generation = header["generation"]
+        try:
+            self.generated_at: Optional[datetime] = datetime.strptime(self.generation, GENERATION_FORMAT)
+        except ValueError:
+            self.generated_at = None
+        self.spots = header["spots"]
+        self.spot_index = {spot["id"]: i for i, spot in enumerate(self.spots)}
+        self.columns = {
+            c["name"]: np.frombuffer(self._mm, dtype=np.dtype(c["dtype"]), count=c["length"],
+                                     offset=data_start + c["offset"])
+            for c in header["columns"]
+        }
+
+    def explanation(self, i: int) -> Optional[str]:
+        offsets = self.columns["explanation_offsets"]
+        text = self.columns["explanation_blob"][offsets[i]:offsets[i + 1]].tobytes().decode()
+        return text or None
+
+    def reason_code(self, i: int) -> Optional[int]:
+        codes = self.columns.get("reason_code")  # absent from snapshots written before reason codes
+        if codes is None or codes[i] == NULL_CODE:
+            return None
+        return int(codes[i])
+
+    def row(self, i: int) -> dict:
+        """One row in the surf_forecast_hourly layout (timestamp_utc naive UTC)."""
+        c = self.columns
+        return {
+            "timestamp_utc": datetime.utcfromtimestamp(int(c["timestamp_utc"][i])),
+            **{name: _none_if_nan(c[name][i]) for name in FLOAT_COLUMNS},
+            **{name: decode(int(c[name][i]), dictionary) for name, dictionary in CODE_COLUMNS},
+            "reason_code": self.reason_code(i),
+            "explanation": self.explanation(i),
+        }
+
+    def spot_rows(self, spot_id, since_utc: datetime, until_utc: Optional[datetime] = None) -> Optional[List[dict]]:
+        """
+        Rows for one spot in [since_utc, until_utc) (aware datetimes);
+        None if the spot is not in the snapshot.
+        """
+        i = self.spot_index.get(str(spot_id))
+        if i is None:
+            return None
+        spot = self.spots[i]
+        start, end = spot["start"], spot["start"] + spot["count"]
+        ts = self.columns["timestamp_utc"][start:end]
+        lo = start + int(np.searchsorted(ts, int(since_utc.timestamp())))
+        hi = end if until_utc is None else start + int(np.searchsorted(ts, int(until_utc.timestamp())))
+        return [self.row(j) for j in range(lo, hi)]
+
+    def spots_within(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Indexes of spots within radius_km (haversine), vectorised over all spots."""
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        lat2, lon2 = np.radians(self.columns["spot_lat"]), np.radians(self.columns["spot_lon"])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return np.nonzero(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a)) <= radius_km)[0]
+
+    def forecasted_rows(self, lat: float, lon: float, radius_km: float, since_utc: datetime,
+                        min_rating: str = "Playable") -> List[dict]:
+        """Same rows the /api/spots/forecasted SQL returns, ready for group_daily_best."""
+        rating = self.columns["surf_rating"]
+        ts = self.columns["timestamp_utc"]
+        since = int(since_utc.timestamp())
+        min_code = RATINGS.index(min_rating)
+
+        rows = []
+        for i in self.spots_within(lat, lon, radius_km):
+            spot = self.spots[i]
+            start, end = spot["start"], spot["start"] + spot["count"]
+            hits = np.nonzero((ts[start:end] >= since) & (rating[start:end] >= min_code))[0]
+            info = {"id": spot["id"], "lat": spot["lat"], "lon": spot["lon"],
+                    **{field: spot[field] for field in SPOT_FIELDS}}
+            for j in hits:
+                rows.append({**info, **self.row(start + int(j))})
+        return rows
+
+
+_snapshot: Optional[ForecastSnapshot] = None
+_last_check = float("-inf")
+
+
+def invalidate_snapshot(event: dict):
+    """Forces the next current_snapshot() to re-check SNAPSHOT_DIR/CURRENT."""
+    global _last_check
+    _last_check = float("-inf")
+
+
+def snapshot_too_old(snapshot: ForecastSnapshot) -> bool:
+    if snapshot.generated_at is None:
+        return False
+    return (datetime.utcnow() - snapshot.generated_at).total_seconds() > SNAPSHOT_MAX_AGE_SEC
+
+
+def current_snapshot() -> Optional[ForecastSnapshot]:
+    """
+    The latest published snapshot. CURRENT is re-read after a forecast_generation
+    event and every SNAPSHOT_RELOAD_INTERVAL_SEC (in case the bus is down); None
+    when there is none or it is older than SNAPSHOT_MAX_AGE_SEC.
+    """
+    global _snapshot, _last_check
+    if not SERVE_FROM_SNAPSHOT:
+        return None
+    now = time.monotonic()
+    if now - _last_check >= SNAPSHOT_RELOAD_INTERVAL_SEC:
+        _last_check = now
+        try:
+            with open(os.path.join(SNAPSHOT_DIR, "CURRENT")) as f:
+                generation = f.read().strip()
+            if _snapshot is None or _snapshot.generation != generation:
+                _snapshot = ForecastSnapshot(os.path.join(SNAPSHOT_DIR, f"snapshot-{generation}.bin"))
+                print(f"[SNAPSHOT] Mapped generation {generation} ({len(_snapshot.spots)} spots)")
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Forecast snapshot unavailable, serving from the database: {e}")
+        if _snapshot is not None and snapshot_too_old(_snapshot):
+            print(f"[WARNING] Forecast snapshot {_snapshot.generation} is older than "
+                  f"{SNAPSHOT_MAX_AGE_SEC}s, serving from the database")
+    if _snapshot is not None and snapshot_too_old(_snapshot):
+        return None
+    return _snapshot
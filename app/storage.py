@@ -0,0 +1,262 @@
+# storage.py
+import os
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pytz
+
+from app.models import MarineForecast, SurfForecast
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+# "hourly": one surf_forecast_hourly row per relevant hour (default)
+# "packed": one surf_forecast_daily row per spot-day holding all 24 hours, and
+#           every reader served from it instead
+STORAGE_MODES = ("hourly", "packed")
+FORECAST_STORAGE_MODE = os.getenv("FORECAST_STORAGE_MODE", "hourly")
+if FORECAST_STORAGE_MODE not in STORAGE_MODES:
+    raise ValueError(f"FORECAST_STORAGE_MODE must be one of {', '.join(STORAGE_MODES)}, got '{FORECAST_STORAGE_MODE}'")
+
+# Hours kept by the hourly table, and served by default from the packed one
+RELEVANT_HOURS = [6, 9, 12, 18, 21]
+
+# Code dictionaries for packed enum columns; the code is the list index
+RATINGS = ["Lake Mode", "Sketchy", "Playable", "Solid", "Firing"]
+WIND_TYPES = ["unknown", "glassy", "offshore", "cross-shore", "onshore"]
+WIND_SEVERITIES = ["unknown", "none", "light", "breezy", "strong"]
+NULL_CODE = -1
+
+
+def writes_packed() -> bool:
+    return FORECAST_STORAGE_MODE == "packed"
+
+
+def reads_packed() -> bool:
+    return FORECAST_STORAGE_MODE == "packed"
+
+
+def encode(value: Optional[str], dictionary: Sequence[str]) -> int:
+    try:
+        return dictionary.index(value)
+    except ValueError:
+        return NULL_CODE
+
+
+def decode(code: Optional[int], dictionary: Sequence[str]) -> Optional[str]:
+    if code is None or code < 0 or code >= len(dictionary):
+        return None
+    return dictionary[code]
+
+
+def build_hourly_records(
+    spot_id,
+    local_tz,
+    evaluated: List[Tuple[MarineForecast, SurfForecast]],
+    hours: Sequence[int] = RELEVANT_HOURS,
+) -> List[dict]:
+    """
+    surf_forecast_hourly rows for the evaluated forecasts falling on `hours`,
+    with native date/datetime values (timestamp_utc naive UTC, as asyncpg reads it).
+    """
+    rows = []
+    for f, surf_forecast in evaluated:
+        local_dt = datetime.strptime(f.time, "%Y-%m-%dT%H:%M")
+        if local_dt.hour not in hours:
+            continue
+        utc_dt = local_tz.localize(local_dt).astimezone(pytz.utc)
+        rows.append({
+            "spot_id": spot_id,
+            "timestamp_local": local_dt,
+            "timestamp_utc": utc_dt.replace(tzinfo=None),
+            "date_local": local_dt.date(),
+            "swell_wave_height": f.swell_wave_height,
+            "swell_wave_direction": f.swell_wave_direction,
+            "swell_wave_peak_period": f.swell_wave_peak_period,
+            "wind_speed_kmh": f.wind_speed_kmh,
+            "wind_direction_deg": f.wind_direction_deg,
+            "wind_wave_height_m": f.wind_wave_height_m,
+            "wind_type": surf_forecast.wind_type,
+            "wind_severity": surf_forecast.wind_severity,
+            "surf_rating": surf_forecast.rating,
+            "reason_code": surf_forecast.reason_code,
+            "explanation": surf_forecast.explanation,
+        })
+    return rows
+
+
+def build_hourly_rows(
+    spot_id: str,
+    local_tz,
+    evaluated: List[Tuple[MarineForecast, SurfForecast]],
+    hours: Sequence[int] = RELEVANT_HOURS,
+) -> List[dict]:
+    """build_hourly_records serialised for the supabase client (ISO strings, aware UTC)."""
+    rows = build_hourly_records(spot_id, local_tz, evaluated, hours)
+    for row in rows:
+        row["timestamp_local"] = row["timestamp_local"].isoformat()
+        row["timestamp_utc"] = row["timestamp_utc"].replace(tzinfo=pytz.utc).isoformat()
+        row["date_local"] = row["date_local"].isoformat()
+    return rows
+
+
+def build_packed_rows(
+    spot_id: str,
+    evaluated: List[Tuple[MarineForecast, SurfForecast]],
+) -> List[dict]:
+    """One surf_forecast_daily row per local date, keeping every hour."""
+    days: Dict[str, dict] = defaultdict(lambda: defaultdict(list))
+    for f, surf_forecast in evaluated:
+        local_dt = datetime.strptime(f.time, "%Y-%m-%dT%H:%M")
+        day = days[local_dt.date().isoformat()]
+        day["hours"].append(local_dt.hour)
+        day["swell_wave_height"].append(f.swell_wave_height)
+        day["swell_wave_direction"].append(f.swell_wave_direction)
+        day["swell_wave_peak_period"].append(f.swell_wave_peak_period)
+        day["wind_speed_kmh"].append(f.wind_speed_kmh)
+        day["wind_direction_deg"].append(f.wind_direction_deg)
+        day["wind_wave_height_m"].append(f.wind_wave_height_m)
+        day["surf_rating"].append(encode(surf_forecast.rating, RATINGS))
+        day["wind_type"].append(encode(surf_forecast.wind_type, WIND_TYPES))
+        day["wind_severity"].append(encode(surf_forecast.wind_severity, WIND_SEVERITIES))
+        day["reason_code"].append(surf_forecast.reason_code)
+
+    return [
+        {"spot_id": spot_id, "date_local": date_local, **arrays}
+        for date_local, arrays in days.items()
+    ]
+
+
+PACKED_UNNEST = """
+    unnest(d.hours, d.swell_wave_height, d.swell_wave_peak_period, d.swell_wave_direction,
+           d.wind_speed_kmh, d.wind_direction_deg, d.wind_type, d.surf_rating,
+           d.wind_wave_height_m, d.wind_severity, d.reason_code)
+    AS u(hour, swell_wave_height, swell_wave_peak_period, swell_wave_direction,
+         wind_speed_kmh, wind_direction_deg, wind_type, surf_rating,
+         wind_wave_height_m, wind_severity, reason_code)
+"""
+
+# Unpacks only the requested hours server-side, one output row per hour
+PACKED_READ_SQL = f"""
+    SELECT d.date_local, u.*
+    FROM surf_forecast_daily d, {PACKED_UNNEST}
+    WHERE d.spot_id = $1
+      AND d.date_local BETWEEN $2 AND $3
+      AND u.hour = ANY($4::smallint[])
+    ORDER BY d.date_local, u.hour
+"""
+
+# Every hour of every spot from date $1 on, with the spot's timezone for unpack_hour
+PACKED_READ_ALL_SQL = f"""
+    SELECT d.spot_id, s.timezone, d.date_local, u.*
+    FROM surf_forecast_daily d
+    JOIN surf_spots s ON s.id = d.spot_id,
+    {PACKED_UNNEST}
+    WHERE d.date_local >= $1
+    ORDER BY d.spot_id, d.date_local, u.hour
+"""
+
+
+def _text_array(values: Sequence[str]) -> str:
+    return "ARRAY[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+# surf_forecast_daily from yesterday on in the column layout of surf_forecast_hourly:
+# RELEVANT_HOURS only, codes decoded (SQL arrays are 1-based, so NULL_CODE maps to NULL)
+# and timestamp_utc naive UTC, so queries written against the hourly table run on it
+PACKED_AS_HOURLY = f"""(
+    SELECT d.spot_id, d.date_local,
+           d.date_local + make_time(u.hour, 0, 0) AS timestamp_local,
+           (d.date_local + make_time(u.hour, 0, 0)) AT TIME ZONE COALESCE(s.timezone, 'UTC') AT TIME ZONE 'UTC'
+               AS timestamp_utc,
+           u.swell_wave_height, u.swell_wave_peak_period, u.swell_wave_direction,
+           u.wind_speed_kmh, u.wind_direction_deg, u.wind_wave_height_m, u.reason_code,
+           ({_text_array(RATINGS)})[u.surf_rating + 1] AS surf_rating,
+           ({_text_array(WIND_TYPES)})[u.wind_type + 1] AS wind_type,
+           ({_text_array(WIND_SEVERITIES)})[u.wind_severity + 1] AS wind_severity,
+           NULL::text AS explanation
+    FROM surf_forecast_daily d
+    JOIN surf_spots s ON s.id = d.spot_id,
+    {PACKED_UNNEST}
+    WHERE d.date_local >= CURRENT_DATE - 1
+      AND u.hour = ANY(ARRAY[{", ".join(map(str, RELEVANT_HOURS))}])
+)"""
+
+
+def forecast_source() -> str:
+    """Table (or packed equivalent) for FROM/JOIN clauses reading upcoming hourly forecasts."""
+    return PACKED_AS_HOURLY if reads_packed() else "surf_forecast_hourly"
+
+
+HOURLY_COLUMNS = (
+    "spot_id", "timestamp_local", "timestamp_utc", "date_local",
+    "swell_wave_height", "swell_wave_direction", "swell_wave_peak_period",
+    "wind_speed_kmh", "wind_direction_deg", "wind_wave_height_m",
+    "wind_type", "wind_severity", "surf_rating", "reason_code", "explanation",
+)
+PACKED_COLUMNS = (
+    "spot_id", "date_local", "hours",
+    "swell_wave_height", "swell_wave_direction", "swell_wave_peak_period",
+    "wind_speed_kmh", "wind_direction_deg", "wind_wave_height_m",
+    "surf_rating", "wind_type", "wind_severity", "reason_code",
+)
+
+
+def _upsert_sql(table: str, columns: Sequence[str], conflict: Sequence[str], touch: str = "") -> str:
+    updates = [f"{c} = EXCLUDED.{c}" for c in columns if c not in conflict]
+    if touch:
+        updates.append(f"{touch} = now()")
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(f'${i}' for i in range(1, len(columns) + 1))}) "
+        f"ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET {', '.join(updates)}"
+    )
+
+
+HOURLY_UPSERT_SQL = _upsert_sql("surf_forecast_hourly", HOURLY_COLUMNS, ("spot_id", "timestamp_local"))
+PACKED_UPSERT_SQL = _upsert_sql("surf_forecast_daily", PACKED_COLUMNS, ("spot_id", "date_local"), touch="updated_at")
+
+
+async def upsert_forecasts(conn, spot_id, local_tz, evaluated: List[Tuple[MarineForecast, SurfForecast]]) -> int:
+    """
+    asyncpg counterpart of the cron's supabase upserts: writes the evaluated
+    forecasts to the table FORECAST_STORAGE_MODE selects, in one transaction.
+    Returns the number of rows written.
+    """
+    async with conn.transaction():
+        if writes_packed():
+            packed = build_packed_rows(spot_id, evaluated)
+            for row in packed:
+                row["date_local"] = date.fromisoformat(row["date_local"])
+            await conn.executemany(PACKED_UPSERT_SQL, [tuple(r[c] for c in PACKED_COLUMNS) for r in packed])
+            return len(packed)
+        hourly = build_hourly_records(spot_id, local_tz, evaluated)
+        await conn.executemany(HOURLY_UPSERT_SQL, [tuple(r[c] for c in HOURLY_COLUMNS) for r in hourly])
+        return len(hourly)
+
+
+def unpack_hour(r, tz) -> dict:
+    """Maps a PACKED_READ_SQL row to the column layout of surf_forecast_hourly."""
+    local_dt = datetime.combine(r["date_local"], time(r["hour"]))
+    return {
+        "timestamp_utc": tz.localize(local_dt).astimezone(pytz.utc).replace(tzinfo=None),
+        "timestamp_local": local_dt,
+        "date_local": r["date_local"],
+        "swell_wave_height": r["swell_wave_height"],
+        "swell_wave_peak_period": r["swell_wave_peak_period"],
+        "swell_wave_direction": r["swell_wave_direction"],
+        "wind_speed_kmh": r["wind_speed_kmh"],
+        "wind_direction_deg": r["wind_direction_deg"],
+        "wind_type": decode(r["wind_type"], WIND_TYPES),
+        "surf_rating": decode(r["surf_rating"], RATINGS),
+        "reason_code": r["reason_code"],
+        # Packed rows keep only the code; the API renders the text on read
+        "explanation": None,
+        "wind_wave_height_m": r["wind_wave_height_m"],
+        "wind_severity": decode(r["wind_severity"], WIND_SEVERITIES),
+    }
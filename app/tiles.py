@@ -0,0 +1,169 @@
+# tiles.py
+"""
+Pre-rendered GeoJSON map tiles holding each spot's best daily rating.
+
+The cron calls `render_tiles()` after each run; it writes one file per
+non-empty tile under TILES_DIR/<generation>/<z>/<x>/<y>.json and then swaps
+TILES_DIR/CURRENT to the new generation. The API serves tiles from memory via
+`get_tile()`, so panning the map never touches the database.
+"""
+import asyncio
+import json
+import math
+import os
+import shutil
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import asyncpg
+
+from app.heuristics import group_daily_best
+from app.storage import forecast_source
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+TILES_DIR = os.getenv("TILES_DIR", "tiles")
+TILE_ZOOMS = range(3, 11)
+TILE_DAYS = 10
+KEEP_GENERATIONS = 2
+# How often the API checks TILES_DIR/CURRENT for a new generation
+TILE_RELOAD_INTERVAL_SEC = 30
+# The URL doesn't carry the generation, so keep this short: after it expires
+# clients revalidate with the generation ETag and usually get a 304
+TILE_MAX_AGE_SEC = int(os.getenv("TILE_MAX_AGE_SEC", "60"))
+
+EMPTY_TILE = json.dumps({"type": "FeatureCollection", "features": []}).encode()
+
+_tiles: Dict[Tuple[int, int, int], bytes] = {}
+_generation: Optional[str] = None
+_last_check = float("-inf")
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    """Web-mercator (slippy map) tile coordinates."""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+async def render_tiles() -> str:
+    query = f"""
+    SELECT
+        s.id, s.name, s.lat, s.lon, s.region, s.town, s.surf_benchmark_url, s.timezone,
+        f.timestamp_utc, f.surf_rating, f.explanation, f.swell_wave_height, f.swell_wave_peak_period, f.wind_speed_kmh, f.wind_type, f.wind_severity, f.swell_wave_direction
+    FROM surf_spots s
+    JOIN {forecast_source()} f ON f.spot_id = s.id
+    WHERE f.timestamp_utc >= NOW()
+    AND f.timestamp_utc < NOW() + make_interval(days => $1)
+    AND f.surf_rating IN ('Firing', 'Solid', 'Playable')
+    ORDER BY s.id, f.timestamp_utc
+    """
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        rows = await conn.fetch(query, TILE_DAYS)
+    finally:
+        await conn.close()
+
+    features = []
+    for spot in group_daily_best(rows):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [spot["lon"], spot["lat"]]},
+            "properties": {
+                "id": str(spot["id"]),
+                "name": spot["name"],
+                "region": spot["region"],
+                "town": spot["town"],
+                "days": [
+                    {"date": f["date"], "time": f["time"], "rating": f["rating"]}
+                    for f in spot["forecasts"]
+                ],
+            },
+        })
+
+    generation = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    out_dir = os.path.join(TILES_DIR, generation)
+
+    tile_count = 0
+    for z in TILE_ZOOMS:
+        buckets = defaultdict(list)
+        for feature in features:
+            lon, lat = feature["geometry"]["coordinates"]
+            buckets[lonlat_to_tile(lon, lat, z)].append(feature)
+
+        for (x, y), tile_features in buckets.items():
+            tile_dir = os.path.join(out_dir, str(z), str(x))
+            os.makedirs(tile_dir, exist_ok=True)
+            with open(os.path.join(tile_dir, f"{y}.json"), "w") as f:
+                json.dump({"type": "FeatureCollection", "features": tile_features}, f, separators=(",", ":"))
+            tile_count += 1
+
+    # Swap the pointer atomically so readers never see a half-written generation
+    os.makedirs(TILES_DIR, exist_ok=True)
+    pointer_tmp = os.path.join(TILES_DIR, "CURRENT.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(generation)
+    os.replace(pointer_tmp, os.path.join(TILES_DIR, "CURRENT"))
+
+    old = sorted(d for d in os.listdir(TILES_DIR) if os.path.isdir(os.path.join(TILES_DIR, d)))
+    for stale in old[:-KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(TILES_DIR, stale), ignore_errors=True)
+
+    print(f"[TILES] Rendered {tile_count} tiles for {len(features)} spots (generation {generation})")
+    return generation
+
+
+def load_tiles(generation: str):
+    global _tiles, _generation
+    tiles = {}
+    root = os.path.join(TILES_DIR, generation)
+    for z in os.listdir(root):
+        for x in os.listdir(os.path.join(root, z)):
+            for name in os.listdir(os.path.join(root, z, x)):
+                with open(os.path.join(root, z, x, name), "rb") as f:
+                    tiles[(int(z), int(x), int(name.split(".")[0]))] = f.read()
+    _tiles, _generation = tiles, generation
+    print(f"[TILES] Loaded {len(tiles)} tiles (generation {generation})")
+
+
+def read_current_pointer() -> str:
+    with open(os.path.join(TILES_DIR, "CURRENT")) as f:
+        return f.read().strip()
+
+
+async def current_generation() -> Optional[str]:
+    """Re-checks CURRENT every TILE_RELOAD_INTERVAL_SEC; file reads run in a worker thread."""
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check >= TILE_RELOAD_INTERVAL_SEC:
+        _last_check = now
+        try:
+            generation = await asyncio.to_thread(read_current_pointer)
+            if generation != _generation:
+                await asyncio.to_thread(load_tiles, generation)
+        except OSError as e:
+            print(f"[WARNING] Could not load map tiles: {e}")
+    return _generation
+
+
+async def invalidate_tiles(event: dict):
+    """Loads the generation the cron just published, so requests don't wait for it."""
+    global _last_check
+    _last_check = float("-inf")
+    await current_generation()
+
+
+async def get_tile(z: int, x: int, y: int) -> Tuple[Optional[str], bytes]:
+    """Returns (generation, GeoJSON bytes); empty tiles are a shared constant."""
+    generation = await current_generation()
+    return generation, _tiles.get((z, x, y), EMPTY_TILE)
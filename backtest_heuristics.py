@@ -0,0 +1,154 @@
+# backtest_heuristics.py
+"""
+Grid-searches evaluate_surf_quality thresholds against benchmark ratings.
+
+Archived forecast inputs come from the Parquet history (app/history.py); benchmark
+ratings from CSVs in the forecast_comparison.csv format. Each rule set is replayed
+over every aligned hour in a process pool and ranked by match rate.
+
+    python backtest_heuristics.py --benchmark forecast_comparison.csv --start 2025-06-01
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from app.heuristics import evaluate_surf_quality
+from app.history import read_history
+from app.models import HeuristicParams, MarineForecast
+from app.spots import fetch_all_spots
+from compare_forecasts import BENCHMARK_CATEGORIES, OUR_RATING_TO_CATEGORY, benchmark_score_lookup
+
+# Candidate values per HeuristicParams field; every combination is scored
+PARAM_GRID = {
+    "min_period_s": [6, 7, 8],
+    "clean_wind_kmh": [10, 12, 14],
+    "cross_wind_kmh": [12, 15, 18],
+    "offshore_wind_kmh": [15, 18, 21],
+    "swell_min_scale": [0.8, 1.0, 1.2],
+}
+# Benchmark hours (surf-forecast.com is 3-hourly) are matched to the nearest archived hour
+ALIGN_TOLERANCE = pd.Timedelta(hours=1)
+INPUT_COLUMNS = [
+    "spot_id", "timestamp_local", "swell_wave_height", "swell_wave_direction",
+    "swell_wave_peak_period", "wind_speed_kmh", "wind_direction_deg", "wind_wave_height_m",
+]
+CATEGORY_CODE = {rating: BENCHMARK_CATEGORIES.index(c) for rating, c in OUR_RATING_TO_CATEGORY.items()}
+
+# Per-worker state, set once by _init_worker
+_cases = None
+_expected = None
+
+
+def load_cases(benchmark_paths, spots, start, end) -> pd.DataFrame:
+    """Archived inputs joined to the nearest benchmark rating for the same spot."""
+    inputs = read_history(start, end, columns=INPUT_COLUMNS).to_pandas()
+    inputs["timestamp_local"] = pd.to_datetime(inputs["timestamp_local"])
+
+    benchmark = pd.concat(pd.read_csv(p, usecols=["spot", "datetime", "surf_forecast_rating"]) for p in benchmark_paths)
+    spot_ids = {spot.name: str(spot.id) for spot in spots}
+    benchmark = benchmark.assign(
+        spot_id=benchmark["spot"].map(spot_ids),
+        timestamp_local=pd.to_datetime(benchmark["datetime"]),
+        surf_forecast_rating=pd.to_numeric(benchmark["surf_forecast_rating"], errors="coerce"),
+    ).dropna(subset=["spot_id", "surf_forecast_rating"])
+    scores = benchmark["surf_forecast_rating"].to_numpy().astype(np.int16).clip(0, 10)
+    benchmark["expected"] = benchmark_score_lookup()[scores]
+
+    cases = pd.merge_asof(
+        benchmark.sort_values("timestamp_local"),
+        inputs.sort_values("timestamp_local"),
+        on="timestamp_local", by="spot_id",
+        direction="nearest", tolerance=ALIGN_TOLERANCE,
+    )
+    return cases.dropna(subset=["swell_wave_height"]).query("expected >= 0")
+
+
+def _init_worker(cases, spots_by_id):
+    global _cases, _expected
+    _cases = [
+        (spots_by_id[row.spot_id], MarineForecast(
+            time=row.timestamp_local.strftime("%Y-%m-%dT%H:%M"),
+            swell_wave_height=row.swell_wave_height,
+            swell_wave_direction=row.swell_wave_direction,
+            swell_wave_peak_period=row.swell_wave_peak_period,
+            wind_speed_kmh=row.wind_speed_kmh,
+            wind_direction_deg=row.wind_direction_deg,
+            wind_wave_height_m=row.wind_wave_height_m,
+        ))
+        for row in cases.itertuples(index=False)
+    ]
+    _expected = cases["expected"].to_numpy()
+
+
+def score_params(overrides: dict) -> dict:
+    params = HeuristicParams(**overrides)
+    predicted = np.fromiter(
+        (CATEGORY_CODE[evaluate_surf_quality(spot, f, params).rating] for spot, f in _cases),
+        dtype=np.int16, count=len(_cases),
+    )
+    return {
+        **overrides,
+        "match_rate": float((predicted == _expected).mean()),
+        "mean_abs_error": float(np.abs(predicted - _expected).mean()),
+        "over_rated": float((predicted > _expected).mean()),
+    }
+
+
+def grid():
+    keys = list(PARAM_GRID)
+    for values in itertools.product(*(PARAM_GRID[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def run(cases: pd.DataFrame, spots, workers: int) -> pd.DataFrame:
+    spots_by_id = {str(spot.id): spot for spot in spots}
+    candidates = list(grid())
+    print(f"[INFO] Scoring {len(candidates)} rule sets over {len(cases)} aligned hours with {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cases, spots_by_id)) as pool:
+        results = list(pool.map(score_params, candidates, chunksize=max(1, len(candidates) // (workers * 4))))
+
+    return pd.DataFrame(results).sort_values(["match_rate", "mean_abs_error"], ascending=[False, True])
+
+
+def score_baseline(cases: pd.DataFrame, spots) -> float:
+    _init_worker(cases, {str(spot.id): spot for spot in spots})
+    return score_params({})["match_rate"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmark", nargs="+", default=["forecast_comparison.csv"])
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="reports/backtest_leaderboard.csv")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    spots = asyncio.run(fetch_all_spots())
+    cases = load_cases(args.benchmark, spots, args.start, args.end)
+    if cases.empty:
+        print("[WARN] No archived forecast hours line up with the benchmark ratings")
+        return
+
+    leaderboard = run(cases, spots, args.workers)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    leaderboard.to_csv(args.out, index=False)
+
+    baseline = score_baseline(cases, spots)
+    print(f"\n[SUMMARY] production rules: match rate {baseline:.1%}")
+    print(leaderboard.head(args.top).to_string(index=False))
+    print(f"Took {time.time() - start_time:.2f} seconds total")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,98 @@
+# check_forecast_availability.py
+"""
+Probes Open-Meteo coverage for every spot and records it in spot_upstream_coverage
+(app/coverage.py), which the forecast cron uses to skip spots that never return
+usable data and to defer degraded ones.
 
+Probes go through the cron's fetch path (fetch_forecast_payloads: shared client,
+retries, circuit breaker) with PROBE_CONCURRENCY in flight. Spots in the same
+~1 km cell share one probe, since Open-Meteo serves them the same grid point.
+
+    python check_forecast_availability.py [--limit N] [--dry-run]
+"""
+import argparse
 import asyncio
-import csv
-from datetime import datetime
-from typing import List
-from app.forecast import get_forecast
-from app.spots import SurfSpot, fetch_all_spots  
+import os
+from collections import Counter
+from typing import Dict, Tuple
+
+import asyncpg
+
+from app.coverage import COVERAGE_UPSERT_SQL, assess_coverage, coverage_record
+from app.forecast import close_http_client, fetch_forecast_payloads
+from app.pipeline import Pipeline, Stage
+from app.registry import spot_registry
+from app.resilience import resilience_stats
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "16"))
+WRITE_BATCH_SPOTS = 100
+CELL_DECIMALS = 2
+
+# One probe per cell for the whole run; only the assessed coverage is kept, not the payloads
+_cell_probes: Dict[Tuple[float, float], asyncio.Task] = {}
+
+
+async def probe_cell(spot) -> dict:
+    # Coverage doesn't depend on the local timezone
+    marine, weather = await fetch_forecast_payloads(spot, "UTC")
+    return assess_coverage(spot.name, marine, weather)
 
-output_file = "forecast_availability_check.csv"
 
-async def check_forecast(spot: SurfSpot):
+async def probe_spot(spot):
+    key = (round(spot.lat, CELL_DECIMALS), round(spot.lon, CELL_DECIMALS))
+    if key not in _cell_probes:
+        _cell_probes[key] = asyncio.create_task(probe_cell(spot))
+    return spot, await asyncio.shield(_cell_probes[key])
+
+
+def write_coverage(conn, counts: Counter, dry_run: bool):
+    async def write(batch):
+        for spot, coverage in batch:
+            counts[coverage["status"]] += 1
+            if coverage["status"] != "ok":
+                print(f"[INFO] {spot.name}: {coverage['status']} (usable {coverage['usable_ratio']}, "
+                      f"missing {coverage['missing_vars'] or '-'}, nulls {coverage['null_ratios']})")
+        if not dry_run:
+            await conn.executemany(COVERAGE_UPSERT_SQL, [coverage_record(s.id, c) for s, c in batch])
+        return len(batch)
+    return write
+
+
+async def main(args):
+    await spot_registry.load()
+    spots = [s for s in spot_registry.all() if s.lat is not None and s.lon is not None]
+    if args.limit:
+        spots = spots[:args.limit]
+    print(f"[INFO] Probing upstream coverage for {len(spots)} spots")
+
+    counts = Counter()
+    conn = None if args.dry_run else await asyncpg.connect(DATABASE_URL)
     try:
-        forecast = await get_forecast(spot)
-        success = len(forecast) > 0
-        return {
-            "spot_name": spot.name,
-            "lat": spot.lat,
-            "lon": spot.lon,
-            "success": success,
-            "error_message": "" if success else "No forecast returned",
-            "wave_height": forecast[0].swell_wave_height if success and forecast else None
-        }
-    except Exception as e:
-        return {
-            "spot_name": spot.name,
-            "lat": spot.lat,
-            "lon": spot.lon,
-            "success": False,
-            "error_message": str(e)
-        }
-
-async def main():
-    results = []
-
-    spots = await fetch_all_spots()
-
-    for spot in spots:
-        result = await check_forecast(spot)
-        results.append(result)
-        await asyncio.sleep(1.2)  # Wait 2 seconds between each request
-
-    with open(output_file, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["spot_name", "lat", "lon", "success", "error_message","wave_height"])
-        writer.writeheader()
-        writer.writerows(results)
+        pipeline = Pipeline(
+            Stage("probe", probe_spot, workers=PROBE_CONCURRENCY, queue_size=PROBE_CONCURRENCY * 2),
+            Stage("write", write_coverage(conn, counts, args.dry_run), workers=1, batch_size=WRITE_BATCH_SPOTS),
+        )
+        for stats in await pipeline.run(spots):
+            print(f"[STATS] {stats}")
+    finally:
+        if conn is not None:
+            await conn.close()
+        await close_http_client()
+
+    print(f"[STATS] {len(_cell_probes)} upstream probes for {len(spots)} spots")
+    print(f"[STATS] upstream: {resilience_stats()}")
+    print(f"[DONE] Coverage: {dict(counts)}")
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, help="Only probe the first N spots")
+    parser.add_argument("--dry-run", action="store_true", help="Print coverage without writing it")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+# compare_forecasts.py
+"""
+Compares our ratings with surf-forecast.com for every spot that has a
+surf_benchmark_url, aligned by local hour.
+
+    python compare_forecasts.py --out reports/comparison
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.forecast import get_forecast, scrape_surf_forecasts, close_http_client, map_our_rating_to_range
+from app.heuristics import evaluate_surf_quality, explain_reason
+from app.spots import fetch_all_spots
+
+# surf-forecast.com buckets, in increasing order (index == our_score)
+BENCHMARK_CATEGORIES = ["Poor", "Fair", "Good", "Excellent"]
+OUR_RATING_TO_CATEGORY = {
+    "Lake Mode": "Poor",
+    "Sketchy": "Fair",
+    "Playable": "Fair",
+    "Solid": "Good",
+    "Firing": "Excellent",
+}
+forecast_concurrency = 10
+
+
+def benchmark_score_lookup() -> np.ndarray:
+    """Array indexed by surf-forecast score (0-10) giving the category index."""
+    lookup = np.full(11, -1, dtype=np.int8)
+    for idx, category in enumerate(BENCHMARK_CATEGORIES):
+        for score in map_our_rating_to_range(category):
+            lookup[score] = idx
+    return lookup
+
+
+async def fetch_our_ratings(spots) -> pd.DataFrame:
+    semaphore = asyncio.Semaphore(forecast_concurrency)
+
+    async def rate(spot):
+        async with semaphore:
+            forecasts = await get_forecast(spot, spot.timezone or "UTC")
+        rows = []
+        for f in forecasts:
+            surf_forecast = evaluate_surf_quality(spot, f)
+            explanation = explain_reason(surf_forecast.reason_code, surf_forecast.model_dump(), spot)
+            rows.append((str(spot.id), spot.name, f.time, surf_forecast.rating, surf_forecast.reason_code,
+                         f"{explanation} | wind_type={surf_forecast.wind_type}"))
+        return rows
+
+    results = await asyncio.gather(*(rate(spot) for spot in spots))
+    rows = [row for spot_rows in results for row in spot_rows]
+    return pd.DataFrame(rows, columns=["spot_id", "spot", "datetime", "our_rating", "reason_code", "explanation"])
+
+
+async def fetch_benchmark_ratings(spots) -> pd.DataFrame:
+    scraped = await scrape_surf_forecasts(spot.surf_benchmark_url for spot in spots)
+    rows = [
+        (str(spot.id), entry["datetime"], entry["rating"])
+        for spot in spots
+        for entry in scraped.get(spot.surf_benchmark_url, [])
+    ]
+    return pd.DataFrame(rows, columns=["spot_id", "datetime", "surf_forecast_rating"])
+
+
+def compare(ours: pd.DataFrame, benchmark: pd.DataFrame) -> pd.DataFrame:
+    ours = ours.assign(datetime=pd.to_datetime(ours["datetime"]))
+    benchmark = benchmark.assign(
+        datetime=pd.to_datetime(benchmark["datetime"]),
+        surf_forecast_rating=pd.to_numeric(benchmark["surf_forecast_rating"], errors="coerce"),
+    ).dropna(subset=["surf_forecast_rating"])
+
+    # Spot names aren't unique, so align on the id
+    df = ours.merge(benchmark, on=["spot_id", "datetime"], how="inner")
+    scores = df["surf_forecast_rating"].to_numpy().astype(np.int16).clip(0, 10)
+
+    benchmark_codes = benchmark_score_lookup()[scores]
+
+    df["surf_forecast_rating"] = scores
+    df["our_rating"] = df["our_rating"].map(OUR_RATING_TO_CATEGORY)
+    df["our_score"] = pd.Categorical(df["our_rating"], categories=BENCHMARK_CATEGORIES).codes
+    df["benchmark_rating"] = pd.Categorical.from_codes(benchmark_codes, BENCHMARK_CATEGORIES)
+    df["match"] = df["our_score"].to_numpy() == benchmark_codes
+    return df[["spot_id", "spot", "datetime", "our_score", "our_rating", "surf_forecast_rating",
+               "benchmark_rating", "match", "reason_code", "explanation"]]
+
+
+def write_reports(df: pd.DataFrame, out_dir: str):
+    os.makedirs(out_dir, exist_ok=True)
+
+    df.drop(columns="benchmark_rating").to_csv(os.path.join(out_dir, "forecast_comparison.csv"), index=False)
+
+    per_spot = df.groupby(["spot_id", "spot"]).agg(rows=("match", "size"), matches=("match", "sum"))
+    per_spot["match_rate"] = per_spot["matches"] / per_spot["rows"]
+    per_spot.sort_values("match_rate").to_csv(os.path.join(out_dir, "per_spot.csv"))
+
+    df.groupby(["spot_id", "spot", "our_rating", "benchmark_rating"], observed=True).size() \
+        .rename("count").reset_index() \
+        .to_csv(os.path.join(out_dir, "per_spot_confusion.csv"), index=False)
+
+    confusion = pd.crosstab(df["our_rating"], df["benchmark_rating"]) \
+        .reindex(index=BENCHMARK_CATEGORIES, columns=BENCHMARK_CATEGORIES, fill_value=0)
+    confusion.to_csv(os.path.join(out_dir, "confusion_matrix.csv"))
+
+    print(f"\n[SUMMARY]")
+    print(f"{len(df)} aligned hours across {len(per_spot)} spots, match rate {df['match'].mean():.1%}")
+    print(confusion.to_string())
+
+
+async def main(out_dir: str):
+    start_time = time.time()
+    spots = [spot for spot in await fetch_all_spots() if spot.surf_benchmark_url]
+    print(f"[INFO] Comparing {len(spots)} spots with a surf_benchmark_url")
+
+    try:
+        ours, benchmark = await asyncio.gather(fetch_our_ratings(spots), fetch_benchmark_ratings(spots))
+    finally:
+        await close_http_client()
+
+    write_reports(compare(ours, benchmark), out_dir)
+    print(f"Took {time.time() - start_time:.2f} seconds total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", default="reports/comparison")
+    args = parser.parse_args()
+    asyncio.run(main(args.out))
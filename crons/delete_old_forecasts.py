@@ -1,8 +1,14 @@
 # crons/delete_old_forecasts.py
 import os
+import sys
 import asyncpg
 from datetime import datetime, timedelta
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.history import export_expiring_forecasts
+from app.storage import writes_packed
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -11,16 +17,45 @@ except ImportError:
 
 
 DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+# Set EXPORT_HISTORY=0 to delete without archiving
+EXPORT_HISTORY = os.getenv("EXPORT_HISTORY", "1") != "0"
 
 async def run():
     conn = await asyncpg.connect(DATABASE_URL)
-    deleted = await conn.execute("""
-        DELETE FROM surf_forecast_hourly
-        WHERE timestamp_utc < NOW()::date
-    """)
-    await conn.close()
+    try:
+        cutoff = await conn.fetchval("SELECT NOW()::date")
+
+        if EXPORT_HISTORY:
+            try:
+                exported = await export_expiring_forecasts(conn, cutoff)
+                print(f"[HISTORY] Archived {exported} rows before {cutoff}")
+            except Exception as e:
+                # Keep the rows so the next run can archive them
+                print(f"[ERROR] History export failed, skipping cleanup: {e}")
+                return
+
+        deleted = await conn.execute("""
+            DELETE FROM surf_forecast_hourly
+            WHERE timestamp_utc < $1
+        """, cutoff)
+        # surf_forecast_daily only exists where packed storage was set up
+        deleted_packed = None
+        if writes_packed():
+            deleted_packed = await conn.execute("""
+                DELETE FROM surf_forecast_daily
+                WHERE date_local < $1
+            """, cutoff)
+        deleted_windows = await conn.execute("""
+            DELETE FROM surf_session_windows
+            WHERE end_local < $1
+        """, cutoff)
+    finally:
+        await conn.close()
     print(f"[CLEANUP] {deleted}")
+    if deleted_packed is not None:
+        print(f"[CLEANUP] packed: {deleted_packed}")
+    print(f"[CLEANUP] windows: {deleted_windows}")
 
 if __name__ == "__main__":
     import asyncio
-    asyncio.run(run())
\ No newline at end of file
+    asyncio.run(run())
@@ -4,9 +4,11 @@ import sys
 import asyncio
 from datetime import datetime
 import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
 import json
 
+import asyncpg
 import pytz
 from timezonefinder import TimezoneFinder
 from supabase import create_client, Client
@@ -14,9 +16,19 @@ from supabase import create_client, Client
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.models import MarineForecast, SurfForecast
-from app.spots import SurfSpot, fetch_all_spots
-from app.forecast import get_forecast
-from app.heuristics import evaluate_surf_quality
+from app.spots import SurfSpot
+from app.registry import spot_registry
+from app.forecast import fetch_forecast_payloads, parse_forecast
+from app.pipeline import Pipeline, Stage
+from app.resilience import resilience_stats
+from app.batch_eval import evaluate_batch, evaluate_spot_rows, rows_from_batch, spot_payload
+from app.tiles import render_tiles
+from app.snapshot import write_snapshot
+from app.events import FORECAST_GENERATION, publish_event
+from app.storage import writes_packed
+from app.coverage import load_coverage_plan, plan_spots
+from app.rollups import rebuild_region_rollup
+from app.sessions import replace_session_windows
 
 
 
@@ -28,92 +40,190 @@ except ImportError:
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 tf = TimezoneFinder()
 
-async def process_spot(spot, spot_id: str):
-
-    local_tz = pytz.timezone(spot.timezone)
-    if not local_tz:
+# Pipeline sizing: fetches are network-bound, evaluation is CPU-bound,
+# writes go out in batches of spots (one upsert per table per batch)
+FETCH_CONCURRENCY = int(os.getenv("CRON_FETCH_CONCURRENCY", "8"))
+WRITE_CONCURRENCY = int(os.getenv("CRON_WRITE_CONCURRENCY", "2"))
+WRITE_BATCH_SPOTS = int(os.getenv("CRON_WRITE_BATCH_SPOTS", "20"))
+QUEUE_SIZE = 50
+# Parse/evaluate in worker processes: "0" keeps it on the event loop, "auto" uses every core
+_eval_processes = os.getenv("CRON_EVAL_PROCESSES", "0")
+EVAL_PROCESSES = (os.cpu_count() or 1) if _eval_processes == "auto" else int(_eval_processes)
+EVAL_BATCH_SPOTS = int(os.getenv("CRON_EVAL_BATCH_SPOTS", "16"))
+# Skip spots the coverage probe found unusable, fetch degraded ones last (app/coverage.py)
+USE_COVERAGE_PLAN = os.getenv("CRON_USE_COVERAGE_PLAN", "1") != "0"
+
+# Filled by the write stage, written to surf_session_windows after the run
+window_since = {}
+session_windows = []
+
+
+async def coverage_plan(spots: list) -> list:
+    try:
+        conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            skip, deprioritise = await load_coverage_plan(conn)
+        finally:
+            await conn.close()
+    except Exception as e:
+        print(f"[WARNING] Upstream coverage unavailable ({e}), fetching every spot")
+        return spots
+    planned = plan_spots(spots, skip, deprioritise)
+    print(f"[INFO] Skipping {len(spots) - len(planned)} spots without upstream coverage, "
+          f"{len(deprioritise)} degraded spots fetched last")
+    return planned
+
+
+async def fetch_spot(spot):
+    if not spot.timezone:
         print(f"[WARNING] No local timezone found for {spot.name}, skipping")
-        return
-
-    print (f"[DEBUG] Processing spot: {spot.name} (ID: {spot_id})")
-    print(f"[DEBUG] Local timezone for {spot.name}: {local_tz.zone}")
-    forecasts = await get_forecast(spot,spot.timezone, start_date=None, end_date=None)
- 
-    print(f"[DEBUG] {spot.name} → {len(forecasts)} total valid forecasts from Open-Meteo")
-  
-    relevant_hours = [6, 9, 12, 18, 21]
-    rows = []
-    for f in forecasts:
+        return None
+    print (f"[DEBUG] Processing spot: {spot.name} (ID: {spot.id})")
+    # The process pool decodes the JSON itself
+    marine_data, weather_data = await fetch_forecast_payloads(spot, spot.timezone, raw=EVAL_PROCESSES > 0)
+    return spot, marine_data, weather_data
+
+
+async def evaluate_spot(item):
+    spot, marine_data, weather_data = item
+    return evaluate_spot_rows(spot, marine_data, weather_data)
+
+
+def pool_evaluator(pool: ProcessPoolExecutor):
+    async def evaluate_spots(batch):
+        payload = [(spot_payload(spot), marine, weather) for spot, marine, weather in batch]
+        results = await asyncio.get_running_loop().run_in_executor(pool, evaluate_batch, payload)
+        return rows_from_batch(results)
+    return evaluate_spots
+
+
+def upsert(table: str, rows: list, on_conflict: str):
+    if rows:
+        supabase.table(table).upsert(rows, on_conflict=on_conflict).execute()
+
+
+def write_rows(table: str, rows_by_spot: dict, on_conflict: str) -> int:
+    """One upsert for the whole batch; if that fails, per spot so one bad spot doesn't sink the rest."""
+    try:
+        upsert(table, [row for rows in rows_by_spot.values() for row in rows], on_conflict)
+        return sum(len(rows) for rows in rows_by_spot.values())
+    except Exception as e:
+        print(f"[WARNING] Batch upsert into {table} failed ({e}), retrying per spot")
+
+    written = 0
+    for name, rows in rows_by_spot.items():
         try:
-            local_dt = datetime.strptime(f.time, "%Y-%m-%dT%H:%M")
-            if local_dt.hour not in relevant_hours:
-                continue
-            utc_dt = local_tz.localize(local_dt).astimezone(pytz.utc)
-            print(f"[DEBUG] Processing forecast for {spot.name} at {local_dt.isoformat()} (UTC: {utc_dt.isoformat()})") 
-            surf_forecast = evaluate_surf_quality(spot, f)
-
-            rows.append({
-                "spot_id": spot_id,
-                "timestamp_local": local_dt.isoformat(),
-                "timestamp_utc": utc_dt.isoformat(),
-                "date_local": local_dt.date().isoformat(),
-                "swell_wave_height": f.swell_wave_height,
-                "swell_wave_direction": f.swell_wave_direction,
-                "swell_wave_peak_period": f.swell_wave_peak_period,
-                "wind_speed_kmh": f.wind_speed_kmh,
-                "wind_direction_deg": f.wind_direction_deg,
-                "wind_wave_height_m": f.wind_wave_height_m,
-                "wind_type": surf_forecast.wind_type,
-                "wind_severity": surf_forecast.wind_severity,
-                "surf_rating": surf_forecast.rating,
-                "explanation": surf_forecast.explanation,
-            })
+            upsert(table, rows, on_conflict)
+            written += len(rows)
         except Exception as e:
-            print(f"[ERROR] Parsing forecast for {spot.name}: {e}")
+            print(f"[ERROR] Upsert into {table} failed for {name}: {e}")
+    return written
 
-    
 
-    print(f"[DEBUG] {spot.name} → {len(rows)} rows after filtering by relevant hours")
+async def write_spots(batch):
+    written = 0
+    if writes_packed():
+        packed = {name: rows for name, _, rows, _ in batch}
+        written += await asyncio.to_thread(write_rows, "surf_forecast_daily", packed, "spot_id,date_local")
+    else:
+        hourly = {name: rows for name, rows, _, _ in batch}
+        written += await asyncio.to_thread(write_rows, "surf_forecast_hourly", hourly, "spot_id,timestamp_local")
+
+    for _, _, _, summary in batch:
+        # Spots without forecasts this run keep their stored windows
+        if summary["since"]:
+            window_since[summary["spot_id"]] = summary["since"]
+            session_windows.extend(summary["windows"])
+
+    print(f"[DEBUG] Wrote {written} rows for {len(batch)} spots")
+    return written
 
-    for row in rows:
+
+async def write_summaries():
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        try:
+            written = await replace_session_windows(conn, window_since, session_windows)
+            print(f"[INFO] Session windows: {written} windows for {len(window_since)} spots")
+        except Exception as e:
+            print(f"[ERROR] Session windows failed: {e}")
+        # Ranks every stored spot, including those this run skipped or failed
         try:
-            #print(f"[DEBUG] Attempting upsert for spot: {spot.name}")
-            #print(f"[DEBUG] Row content: {json.dumps(row, default=str, indent=2)}")
-            #print(f"[DEBUG] Conflict keys: ['spot_id', 'timestamp_local']")
-            assert "spot_id" in row and row["spot_id"], f"Missing or null spot_id in row: {row}"
-            assert "timestamp_local" in row and row["timestamp_local"], f"Missing or null timestamp_local in row: {row}"
-            response = supabase.table("surf_forecast_hourly").upsert(
-                row, on_conflict="spot_id,timestamp_local"
-            ).execute()
-
-            #print(f"[SUCCESS] Upsert response: {response}")
+            written = await rebuild_region_rollup(conn)
+            print(f"[INFO] Region rollup: {written} rows")
         except Exception as e:
-            print(f"[ERROR] Upsert failed for {spot.name}: {e}")
+            print(f"[ERROR] Region rollup failed: {e}")
+    finally:
+        await conn.close()
 
 
 async def main():
     # ⏱ Start the timer
     start_time = time.time()
-    total_forecasts_inserted = 0
-    spots_processed = 0
-
-    spots = await fetch_all_spots()
 
-    for spot in spots:
-        await process_spot(spot, str(spot.id))
-        await asyncio.sleep(1)
+    await spot_registry.load()
+    spots = list(spot_registry.all())
+    total_spots = len(spots)
+    if USE_COVERAGE_PLAN:
+        spots = await coverage_plan(spots)
+
+    pool = ProcessPoolExecutor(max_workers=EVAL_PROCESSES) if EVAL_PROCESSES > 0 else None
+    if pool:
+        # One batch in flight per process keeps every core busy
+        evaluate = Stage("evaluate", pool_evaluator(pool), workers=EVAL_PROCESSES, queue_size=QUEUE_SIZE,
+                         batch_size=EVAL_BATCH_SPOTS, fan_out=True)
+    else:
+        evaluate = Stage("evaluate", evaluate_spot, workers=1, queue_size=QUEUE_SIZE)
+    writer = Stage("write", write_spots, workers=WRITE_CONCURRENCY, queue_size=QUEUE_SIZE,
+                   batch_size=WRITE_BATCH_SPOTS)
+    pipeline = Pipeline(
+        Stage("fetch", fetch_spot, workers=FETCH_CONCURRENCY, queue_size=QUEUE_SIZE),
+        evaluate,
+        writer,
+    )
+    try:
+        stage_stats = await pipeline.run(spots)
+    finally:
+        if pool:
+            pool.shutdown()
+    spots_processed = writer.items
+
+    try:
+        await write_summaries()
+    except Exception as e:
+        print(f"[ERROR] Writing rollups failed: {e}")
+
+    generation = None
+    try:
+        generation = await render_tiles()
+    except Exception as e:
+        print(f"[ERROR] Map tile rendering failed: {e}")
+
+    try:
+        generation = await write_snapshot(generation)
+    except Exception as e:
+        print(f"[ERROR] Forecast snapshot failed: {e}")
+
+    try:
+        await publish_event(FORECAST_GENERATION, generation=generation, spots=len(spots))
+    except Exception as e:
+        print(f"[ERROR] Could not publish {FORECAST_GENERATION}: {e}")
     
     # ⏱ End the timer
     end_time = time.time()
     duration_sec = end_time - start_time
 
     print(f"\n[SUMMARY]")
-    #print(f"Processed {spots_processed} spots")
-    #print(f"Inserted {total_forecasts_inserted} forecast rows")
+    print(f"Processed {spots_processed}/{len(spots)} spots ({total_spots - len(spots)} skipped for coverage)")
+    for stats in stage_stats:
+        print(f"stage {stats.pop('stage')}: {stats}")
     print(f"Took {duration_sec:.2f} seconds total (~{duration_sec/60:.2f} minutes)")
+    for host, stats in resilience_stats().items():
+        print(f"{host}: {stats}")
 
 if __name__ == "__main__":
     asyncio.run(main())
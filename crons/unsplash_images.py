@@ -0,0 +1,318 @@
+# unsplash_images.py
+"""
+Finds an Unsplash photo for every surf spot without an image and writes the
+picks back to surf_spots in one bulk UPDATE.
+
+1. Curated picks from CSV_PATH (spot_name, unsplash_page_url) are applied first.
+2. Every photo the API has ever returned is kept in a local metadata cache keyed
+   by photo ID, so curated IDs and nearby photos found for other spots cost no
+   request. Spots with a cached photo within MAX_DISTANCE_KM are matched offline.
+3. The remaining spots are searched concurrently. Unsplash's X-Ratelimit-*
+   headers are tracked and searching stops while RATE_LIMIT_RESERVE requests
+   are still left; unsearched spots are picked up by the next run.
+
+Candidates are scored with numpy in chunks of spots against the geotagged
+photos in their latitude band: photos whose location name contains the spot
+name (from that spot's own search) win, then the closest geotagged photo
+within MAX_DISTANCE_KM.
+
+    python crons/unsplash_images.py [--dry-run] [--limit N]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+import httpx
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.resilience import CircuitOpenError, resilient_get
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+UNSPLASH_ACCESS_KEY = os.getenv("UNSPLASH_ACCESS_KEY")
+UNSPLASH_APP_NAME = os.getenv("UNSPLASH_APP_NAME", "your_app_name")
+CSV_PATH = os.getenv("UNSPLASH_CSV_PATH", "spots_images.csv")
+CACHE_PATH = os.getenv("UNSPLASH_CACHE_PATH", "unsplash_photo_cache.json")
+
+API_URL = "https://api.unsplash.com"
+SEARCH_PER_PAGE = 30
+SEARCH_CONCURRENCY = 4
+# Requests left untouched in the hourly window (also covers requests still in flight)
+RATE_LIMIT_RESERVE = 5
+MAX_DISTANCE_KM = 5.0
+NAME_MATCH_SCORE = 2.0
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.0
+PICK_CHUNK_SPOTS = 256
+
+SPOTS_SQL = """
+    SELECT id, name, lat, lon, town
+    FROM surf_spots
+    WHERE image_url IS NULL
+    ORDER BY name
+"""
+BULK_UPDATE_SQL = """
+    UPDATE surf_spots AS s
+    SET image_url = u.image_url,
+        image_credit = u.image_credit,
+        image_credit_url = u.image_credit_url,
+        image_source_url = u.image_source_url
+    FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[], $5::text[])
+         AS u(id, image_url, image_credit, image_credit_url, image_source_url)
+    WHERE s.id = u.id
+"""
+
+
+class RateLimit:
+    """Latest X-Ratelimit-* values seen; unknown until the first response."""
+
+    def __init__(self, reserve: int = RATE_LIMIT_RESERVE):
+        self.reserve = reserve
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.requests = 0
+
+    def update(self, response: httpx.Response):
+        self.requests += 1
+        try:
+            self.limit = int(response.headers["X-Ratelimit-Limit"])
+            remaining = int(response.headers["X-Ratelimit-Remaining"])
+        except (KeyError, ValueError):
+            return
+        # Concurrent responses can arrive out of order; the lowest count is the current one
+        self.remaining = remaining if self.remaining is None else min(self.remaining, remaining)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining is not None and self.remaining <= self.reserve
+
+
+def photo_metadata(photo: dict) -> dict:
+    """The fields we keep per photo, from a search result or a /photos/{id} response."""
+    location = photo.get("location") or {}
+    position = location.get("position") or {}
+    return {
+        "image_url": photo["urls"]["regular"],
+        "image_credit": f'Photo by {photo["user"]["name"]} on Unsplash',
+        "image_credit_url": f'{photo["user"]["links"]["html"]}?utm_source={UNSPLASH_APP_NAME}&utm_medium=referral',
+        "image_source_url": photo["links"]["html"],
+        "location_name": (location.get("name") or "").lower(),
+        "lat": position.get("latitude"),
+        "lon": position.get("longitude"),
+    }
+
+
+def extract_photo_id(unsplash_url: str) -> str:
+    return unsplash_url.rstrip("/").split("-")[-1]
+
+
+def load_cache() -> Dict[str, dict]:
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Ignoring unreadable photo cache {CACHE_PATH}: {e}")
+        return {}
+
+
+def save_cache(cache: Dict[str, dict]):
+    tmp = f"{CACHE_PATH}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp, CACHE_PATH)
+
+
+def load_curated() -> Dict[str, str]:
+    """spot name → photo ID from CSV_PATH (optional)."""
+    try:
+        with open(CSV_PATH, newline="") as f:
+            return {row["spot_name"]: extract_photo_id(row["unsplash_page_url"]) for row in csv.DictReader(f)}
+    except FileNotFoundError:
+        return {}
+
+
+async def unsplash_get(client: httpx.AsyncClient, rate: RateLimit, path: str, **params) -> Optional[dict]:
+    if rate.exhausted:
+        return None
+    try:
+        response = await resilient_get(client, f"{API_URL}{path}", params=params)
+    except CircuitOpenError as e:
+        print(f"[WARNING] Skipping Unsplash {path}: {e}")
+        return None
+    except httpx.HTTPStatusError as e:
+        rate.update(e.response)
+        if e.response.status_code == 403 and "Rate Limit" in e.response.text:
+            rate.remaining = 0
+        print(f"[ERROR] Unsplash {path} failed: {e.response.status_code}")
+        return None
+    except httpx.HTTPError as e:
+        print(f"[ERROR] Unsplash {path} failed: {e}")
+        return None
+    rate.update(response)
+    return response.json()
+
+
+async def fetch_photo(client, rate, cache: Dict[str, dict], photo_id: str) -> Optional[dict]:
+    if photo_id not in cache:
+        photo = await unsplash_get(client, rate, f"/photos/{photo_id}")
+        if photo is None:
+            return None
+        cache[photo_id] = photo_metadata(photo)
+    return cache[photo_id]
+
+
+async def search_spot(client, rate, cache: Dict[str, dict], spot, semaphore) -> Optional[List[str]]:
+    """Photo IDs returned for the spot (added to the cache), or None if not searched."""
+    async with semaphore:
+        query = f"{spot['name']} surf {spot['town']}" if spot["town"] else f"{spot['name']} surf"
+        data = await unsplash_get(client, rate, "/search/photos", query=query, per_page=SEARCH_PER_PAGE)
+    if data is None:
+        return None
+    ids = []
+    for photo in data.get("results", []):
+        cache[photo["id"]] = photo_metadata(photo)
+        ids.append(photo["id"])
+    return ids
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    """Haversine distance; arguments in radians, broadcast like numpy arrays."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def pick_photos(spots: List, cache: Dict[str, dict], searched: Dict[int, List[str]]) -> Dict[int, str]:
+    """
+    Best photo ID per spot index. Distance scores run 1 at the spot to 0 at
+    MAX_DISTANCE_KM over the geotagged cached photos; spots are scored in
+    latitude order, PICK_CHUNK_SPOTS at a time, against only the photos in the
+    chunk's latitude band, so memory stays at chunk x band whatever the cache size.
+    A location-name match from the spot's own search adds NAME_MATCH_SCORE.
+    """
+    best: Dict[int, Tuple[float, str]] = {}
+    geotagged = sorted((p["lat"], p["lon"], pid) for pid, p in cache.items()
+                       if p["lat"] is not None and p["lon"] is not None)
+    if spots and geotagged:
+        p_lat_deg = np.array([g[0] for g in geotagged], dtype=float)
+        p_lat = np.radians(p_lat_deg)
+        p_lon = np.radians(np.array([g[1] for g in geotagged], dtype=float))
+        s_lat_deg = np.array([s["lat"] for s in spots], dtype=float)
+        s_lat = np.radians(s_lat_deg)
+        s_lon = np.radians(np.array([s["lon"] for s in spots], dtype=float))
+        order = np.argsort(s_lat_deg)
+        order = order[np.isfinite(s_lat_deg[order]) & np.isfinite(s_lon[order])]
+        band = MAX_DISTANCE_KM / KM_PER_DEGREE_LAT
+
+        for start in range(0, len(order), PICK_CHUNK_SPOTS):
+            rows = order[start:start + PICK_CHUNK_SPOTS]
+            lo = np.searchsorted(p_lat_deg, s_lat_deg[rows[0]] - band)
+            hi = np.searchsorted(p_lat_deg, s_lat_deg[rows[-1]] + band, side="right")
+            if lo == hi:
+                continue
+            score = 1 - _distance_km(s_lat[rows, None], s_lon[rows, None], p_lat[lo:hi], p_lon[lo:hi]) / MAX_DISTANCE_KM
+            top = score.argmax(axis=1)
+            for i, j, value in zip(rows, top, score[np.arange(len(rows)), top]):
+                if value >= 0:
+                    best[int(i)] = (float(value), geotagged[lo + j][2])
+
+    for i, ids in searched.items():
+        name = spots[i]["name"].lower()
+        for pid in ids:
+            photo = cache[pid]
+            if name not in photo["location_name"]:
+                continue
+            value = NAME_MATCH_SCORE
+            if photo["lat"] is not None and photo["lon"] is not None:
+                distance = _distance_km(*np.radians([spots[i]["lat"], spots[i]["lon"], photo["lat"], photo["lon"]]))
+                value += max(1 - distance / MAX_DISTANCE_KM, 0.0)
+            if i not in best or value > best[i][0]:
+                best[i] = (value, pid)
+
+    return {i: pid for i, (_, pid) in best.items()}
+
+
+async def write_images(conn, picks: Dict, cache: Dict[str, dict]) -> int:
+    """One UPDATE for every spot id → photo ID pick."""
+    if not picks:
+        return 0
+    ids = list(picks)
+    meta = [cache[picks[i]] for i in ids]
+    result = await conn.execute(
+        BULK_UPDATE_SQL, ids,
+        [m["image_url"] for m in meta], [m["image_credit"] for m in meta],
+        [m["image_credit_url"] for m in meta], [m["image_source_url"] for m in meta],
+    )
+    return int(result.split()[-1])
+
+
+async def run(args):
+    conn = await asyncpg.connect(SUPABASE_DB_URL)
+    cache = load_cache()
+    cached_before = len(cache)
+    rate = RateLimit()
+    headers = {"Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}", "Accept-Version": "v1"}
+    picks: Dict = {}
+
+    try:
+        async with httpx.AsyncClient(headers=headers, timeout=15.0) as client:
+            curated = load_curated()
+            if curated:
+                rows = await conn.fetch("SELECT id, name FROM surf_spots WHERE name = ANY($1::text[])", list(curated))
+                for row in rows:
+                    if await fetch_photo(client, rate, cache, curated[row["name"]]):
+                        picks[row["id"]] = curated[row["name"]]
+                print(f"[INFO] {len(picks)}/{len(curated)} curated images resolved")
+
+            spots = [s for s in await conn.fetch(SPOTS_SQL) if s["id"] not in picks]
+            if args.limit:
+                spots = spots[:args.limit]
+            print(f"[INFO] {len(spots)} spots without an image, {len(cache)} photos cached")
+
+            offline = pick_photos(spots, cache, {})
+            picks.update({spots[i]["id"]: pid for i, pid in offline.items()})
+            print(f"[INFO] {len(offline)} spots matched from the photo cache")
+
+            pending = [i for i in range(len(spots)) if i not in offline]
+            semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+            results = await asyncio.gather(*(search_spot(client, rate, cache, spots[i], semaphore) for i in pending))
+            searched = {i: ids for i, ids in zip(pending, results) if ids is not None}
+            # Photos found for one spot can also suit a neighbour that was never searched
+            found = {i: pid for i, pid in pick_photos(spots, cache, searched).items() if i not in offline}
+            picks.update({spots[i]["id"]: pid for i, pid in found.items()})
+
+            print(f"[INFO] Searched {len(searched)}/{len(pending)} spots, {len(found)} matched")
+            if len(searched) < len(pending):
+                print(f"[WARNING] Rate limit reserve reached ({rate.remaining}/{rate.limit} left), "
+                      f"{len(pending) - len(searched)} spots left for the next run")
+
+        if args.dry_run:
+            for spot_id, pid in picks.items():
+                print(f"[RESULT] {spot_id}: {cache[pid]['image_url']} ({cache[pid]['image_credit']})")
+        else:
+            updated = await write_images(conn, picks, cache)
+            print(f"[INFO] Updated {updated} spots")
+    finally:
+        save_cache(cache)
+        await conn.close()
+    print(f"[DONE] {rate.requests} API requests, {len(cache) - cached_before} photos added to the cache")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Print picks instead of writing them")
+    parser.add_argument("--limit", type=int, help="Only consider the first N spots without an image")
+    asyncio.run(run(parser.parse_args()))
@@ -1,11 +1,33 @@
 #!/usr/bin/env python3
-import os
+"""
+Fills in surf_spots.timezone for spots that have none.
+
+Pending spots are grouped by coordinates rounded to TZ_ROUND_DECIMALS (spots
+in a region share cells), each distinct cell is looked up once (and memoized
+for the life of the process), and all results go out in one UPDATE.
+
+    python crons/update-spots-timezones.py           # one-off backfill
+    python crons/update-spots-timezones.py --listen  # backfill, then follow inserts
+
+--listen subscribes to the surf_spots trigger's spot_changed events
+(sql/surf_spots_notify.sql) and backfills newly inserted spots in batches,
+so a bulk import is covered a moment after it commits.
+"""
+import argparse
 import asyncio
+import os
+import sys
+from typing import Dict, Optional, Tuple
 
 import asyncpg
+import numpy as np
 from timezonefinder import TimezoneFinder
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.events import SPOT_CHANGED, InvalidationBus
+
 # Load DATABASE_URL from .env (optional)
 load_dotenv()
 
@@ -13,45 +35,108 @@ DATABASE_URL = os.getenv("SUPABASE_DB_URL")
 if not DATABASE_URL:
     raise RuntimeError("Please set SUPABASE_DB_URL in environment")
 
+# 2 decimals ≈ 1 km cells; only spots within a cell of a zone border can differ
+TZ_ROUND_DECIMALS = 2
+# Inserts arriving within this window are backfilled together
+DEBOUNCE_SEC = 1.0
+
+PENDING_SQL = "SELECT id, lat, lon FROM surf_spots WHERE timezone IS NULL"
+PENDING_IDS_SQL = PENDING_SQL + " AND id = ANY($1::uuid[])"
+BULK_UPDATE_SQL = """
+    UPDATE surf_spots AS s
+    SET timezone = u.timezone
+    FROM unnest($1::uuid[], $2::text[]) AS u(id, timezone)
+    WHERE s.id = u.id
+"""
+
 tf = TimezoneFinder()
+_tz_cache: Dict[Tuple[float, float], str] = {}
 
 
-async def backfill_timezones():
-    conn = await asyncpg.connect(DATABASE_URL)
+def timezone_for(lat: float, lon: float) -> str:
+    key = (lat, lon)
+    if key not in _tz_cache:
+        try:
+            _tz_cache[key] = tf.timezone_at(lat=lat, lng=lon) or "UTC"
+        except Exception as e:
+            print(f"  [!] Could not find timezone for ({lat}, {lon}): {e}")
+            _tz_cache[key] = "UTC"
+    return _tz_cache[key]
+
+
+def resolve_timezones(rows) -> list:
+    """Timezone per row: one lookup per distinct rounded (lat, lon) cell."""
+    coords = np.round(np.array([(r["lat"], r["lon"]) for r in rows], dtype=float), TZ_ROUND_DECIMALS)
+    cells, inverse = np.unique(coords, axis=0, return_inverse=True)
+    names = np.array([timezone_for(float(lat), float(lon)) for lat, lon in cells], dtype=object)
+    print(f"Resolved {len(rows)} spots from {len(cells)} distinct cells")
+    return names[inverse.reshape(-1)].tolist()
+
+
+async def backfill_timezones(conn: asyncpg.Connection, ids: Optional[list] = None) -> int:
+    """Backfills every spot missing a timezone, or only those among `ids`."""
+    rows = await (conn.fetch(PENDING_IDS_SQL, ids) if ids is not None else conn.fetch(PENDING_SQL))
+    rows = [r for r in rows if r["lat"] is not None and r["lon"] is not None]
+    print(f"Found {len(rows)} spots to update…")
+    if not rows:
+        return 0
+
+    timezones = resolve_timezones(rows)
+    # The surf_spots_notify trigger publishes a spot_changed event per updated row
+    result = await conn.execute(BULK_UPDATE_SQL, [r["id"] for r in rows], timezones)
+    updated = int(result.split()[-1])
+    print(f"  ✓ {updated} spots updated")
+    return updated
+
+
+async def follow_inserts(conn: asyncpg.Connection):
+    """Backfills spots as they are inserted, batching bursts of inserts."""
+    pending = set()
+    sweep = asyncio.Event()
+    wake = asyncio.Event()
+
+    def on_spot_changed(payload: dict):
+        if "id" not in payload:
+            # Bus reconnected and may have missed inserts
+            sweep.set()
+        elif payload.get("op") == "INSERT":
+            pending.add(payload["id"])
+        else:
+            return
+        wake.set()
+
+    bus = InvalidationBus()
+    bus.subscribe(SPOT_CHANGED, on_spot_changed)
+    await bus.start()
     try:
-        # Fetch all spots (or only those without timezone)
-        rows = await conn.fetch("""
-            SELECT id, lat, lon
-            FROM surf_spots
-            WHERE timezone IS NULL
-        """)
-        print(f"Found {len(rows)} spots to update…")
-
-        for record in rows:
-            spot_id = record["id"]
-            lat = record["lat"]
-            lon = record["lon"]
+        while True:
+            await wake.wait()
+            await asyncio.sleep(DEBOUNCE_SEC)
+            wake.clear()
+            ids = None if sweep.is_set() else list(pending)
+            sweep.clear()
+            pending.clear()
             try:
-                tz_name = tf.timezone_at(lat=lat, lng=lon) or "UTC"
+                await backfill_timezones(conn, ids)
             except Exception as e:
-                print(f"  [!] Could not find timezone for spot {spot_id}: {e}")
-                tz_name = "UTC"
-
-            # Update the row
-            await conn.execute(
-                """
-                UPDATE surf_spots
-                SET timezone = $1
-                WHERE id = $2
-                """,
-                tz_name,
-                spot_id,
-            )
-            print(f"  ✓ Spot {spot_id} → {tz_name}")
+                print(f"  [!] Incremental backfill failed: {e}")
+                sweep.set()
+                wake.set()
+    finally:
+        await bus.stop()
+
 
+async def main(args):
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        await backfill_timezones(conn)
+        if args.listen:
+            await follow_inserts(conn)
     finally:
         await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(backfill_timezones())
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listen", action="store_true", help="Keep running and backfill newly inserted spots")
+    asyncio.run(main(parser.parse_args()))
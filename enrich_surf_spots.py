@@ -1,6 +1,34 @@
-import pandas as pd
+# enrich_surf_spots.py
+"""
+Imports a scraped surf-break CSV into surf_spots.
+
+The CSV is read in chunks. Best swell/wind directions are pulled out of the
+"Best surf description" text with vectorised str.extract, then mapped to degrees
+with DIRECTION_TO_DEG. Swell windows and facing angles are computed as array
+maths. Each enriched chunk is COPYed into a temporary staging table. A single
+INSERT ... SELECT then moves the geolocated breaks not already in surf_spots
+(by name) into the table, computing geom from lat/lon.
+
+    SUPABASE_DB_URL=... python enrich_surf_spots.py app/indonesia_surf_spots.csv
+    python enrich_surf_spots.py app/indonesia_surf_spots.csv --csv-out enriched.csv --dry-run
+"""
+import argparse
+import asyncio
+import os
 import re
-from typing import Tuple, Optional
+from typing import Optional
+
+import asyncpg
+import numpy as np
+import pandas as pd
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
 
 # Mapping of cardinal directions to degrees
 DIRECTION_TO_DEG = {
@@ -21,77 +49,135 @@ DIRECTION_TO_DEG = {
     "Northwest": 315,
     "North-Northwest": 337,
 }
+SWELL_PATTERN = re.compile(r"when a\s*([A-Za-z\s-]+?)\s*swell", re.IGNORECASE)
+WIND_PATTERN = re.compile(r"from the\s*([A-Za-z\s-]+?)[\.\,]", re.IGNORECASE)
+SWELL_WINDOW_DEG = 30
+DEFAULT_SWELL_MIN_M = 1.0
+CHUNK_ROWS = 5000
+
+# surf_spots column → accepted CSV headers (first one present wins)
+SOURCE_COLUMNS = {
+    "name": ("Spot Name", "name"),
+    "lat": ("Latitude", "Lat", "lat"),
+    "lon": ("Longitude", "Lon", "Lng", "lon"),
+    "town": ("Town", "town"),
+    "region": ("Region", "region"),
+}
+IMPORT_COLUMNS = (
+    "name", "lat", "lon", "town", "region", "facing_direction", "swell_min_m",
+    "swell_dir_min", "swell_dir_max", "best_swell_dir_label", "best_wind_dir_label", "surf_benchmark_url",
+)
+# Same column types as surf_spots but no NOT NULLs: breaks without coordinates
+# are staged too (and reported), then left out by INSERT_SQL
+STAGING_SQL = f"""
+    CREATE TEMP TABLE surf_spots_import ON COMMIT DROP AS
+    SELECT {", ".join(IMPORT_COLUMNS)} FROM surf_spots WITH NO DATA
+"""
+UNGEOLOCATED_SQL = "SELECT count(*) FROM surf_spots_import WHERE lat IS NULL OR lon IS NULL"
+INSERT_SQL = f"""
+    INSERT INTO surf_spots ({", ".join(IMPORT_COLUMNS)}, geom)
+    SELECT DISTINCT ON (i.name) {", ".join(f"i.{c}" for c in IMPORT_COLUMNS)},
+           ST_SetSRID(ST_MakePoint(i.lon, i.lat), 4326)
+    FROM surf_spots_import i
+    WHERE i.lat IS NOT NULL AND i.lon IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM surf_spots s WHERE s.name = i.name)
+"""
+
+
+def direction_labels(text: pd.Series, pattern: re.Pattern) -> pd.Series:
+    """Title-cased direction label per row, None where the text has none."""
+    return text.str.extract(pattern, expand=False).str.strip().str.title()
+
+
+def generate_forecast_urls(names: pd.Series) -> pd.Series:
+    return "https://www.surf-forecast.com/breaks/" + names.str.strip().str.replace(" ", "-") + "/forecasts/latest"
+
+
+def enrich_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Maps one raw CSV chunk to IMPORT_COLUMNS."""
+    out = pd.DataFrame(index=chunk.index)
+    for column, headers in SOURCE_COLUMNS.items():
+        header = next((h for h in headers if h in chunk.columns), None)
+        out[column] = chunk[header] if header else None
+    out["name"] = out["name"].astype("string").str.strip()
+
+    desc = chunk.get("Best surf description", pd.Series("", index=chunk.index)).fillna("").astype(str)
+    swell = direction_labels(desc, SWELL_PATTERN)
+    wind = direction_labels(desc, WIND_PATTERN)
+    swell_deg = swell.map(DIRECTION_TO_DEG).astype(float).to_numpy()
+    wind_deg = wind.map(DIRECTION_TO_DEG).astype(float).to_numpy()
+
+    out["best_swell_dir_label"] = swell
+    out["best_wind_dir_label"] = wind
+    out["swell_dir_min"] = np.mod(swell_deg - SWELL_WINDOW_DEG, 360)
+    out["swell_dir_max"] = np.mod(swell_deg + SWELL_WINDOW_DEG, 360)
+    # Offshore wind blows from behind the break, so the break faces the opposite way
+    out["facing_direction"] = np.mod(wind_deg + 180, 360)
+    out["swell_min_m"] = DEFAULT_SWELL_MIN_M
+    out["surf_benchmark_url"] = generate_forecast_urls(out["name"])
+    return out.loc[out["name"].fillna("") != "", list(IMPORT_COLUMNS)]
+
+
+def read_chunks(csv_path: str, chunk_rows: int):
+    """Enriched chunks with exact duplicate rows dropped across the whole file."""
+    seen = set()
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        # Hash the text form so a row reads the same whatever dtypes its chunk inferred
+        hashes = pd.util.hash_pandas_object(chunk.astype(str), index=False)
+        fresh = ~hashes.duplicated() & ~hashes.isin(seen)
+        seen.update(hashes[fresh])
+        enriched = enrich_chunk(chunk[fresh.to_numpy()])
+        if len(enriched):
+            yield enriched
+
+
+def to_records(df: pd.DataFrame):
+    """Rows as tuples with NaN/NA turned into None for COPY."""
+    clean = df.astype(object).where(df.notna(), None)
+    return list(clean.itertuples(index=False, name=None))
+
+
+def with_csv_copy(chunks, csv_out: Optional[str]):
+    """Passes chunks through, appending each to csv_out on the way."""
+    for n, df in enumerate(chunks):
+        if csv_out:
+            df.to_csv(csv_out, mode="w" if n == 0 else "a", header=n == 0, index=False)
+        yield df
+
+
+async def import_spots(csv_path: str, chunk_rows: int, csv_out: Optional[str], dry_run: bool):
+    chunks = with_csv_copy(read_chunks(csv_path, chunk_rows), csv_out)
+    if dry_run:
+        staged = sum(len(df) for df in chunks)
+        print(f"[DONE] {staged} breaks enriched (dry run)")
+        return
+
+    conn = await asyncpg.connect(DATABASE_URL)
+    staged = 0
+    try:
+        async with conn.transaction():
+            await conn.execute(STAGING_SQL)
+            for df in chunks:
+                await conn.copy_records_to_table("surf_spots_import", records=to_records(df),
+                                                 columns=list(IMPORT_COLUMNS))
+                staged += len(df)
+                print(f"[INFO] Staged {staged} breaks")
+            ungeolocated = await conn.fetchval(UNGEOLOCATED_SQL)
+            result = await conn.execute(INSERT_SQL)
+    finally:
+        await conn.close()
+    if ungeolocated:
+        print(f"[WARNING] Skipped {ungeolocated} breaks without coordinates")
+    print(f"[DONE] {int(result.split()[-1])} new spots imported from {staged} breaks")
+    if csv_out:
+        print(f"[DONE] Enriched data saved to {csv_out}")
 
-def remove_duplicates(df: pd.DataFrame) -> pd.DataFrame:
-    return df.drop_duplicates()
-
-def extract_best_swell_direction(text: str) -> Optional[str]:
-    match = re.search(r"when a\s*([A-Za-z\s-]+?)\s*swell", text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip().title()
-    return None
-
-def extract_best_wind_direction(text: str) -> Optional[str]:
-    match = re.search(r"from the\s*([A-Za-z\s-]+?)[\.\,]", text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip().title()
-    return None
-
-def direction_to_deg(direction: Optional[str]) -> Optional[int]:
-    if not direction:
-        return None
-    return DIRECTION_TO_DEG.get(direction.strip().title())
-
-def compute_swell_dir_range(best_deg: Optional[int]) -> Optional[Tuple[int, int]]:
-    if best_deg is None:
-        return None
-    return ((best_deg - 30) % 360, (best_deg + 30) % 360)
-
-def compute_facing_deg(wind_deg: Optional[int]) -> Optional[int]:
-    if wind_deg is None:
-        return None
-    return (wind_deg + 180) % 360
-
-def generate_forecast_url(name: str) -> str:
-    name_slug = name.strip().replace(" ", "-")
-    return f"https://www.surf-forecast.com/breaks/{name_slug}/forecasts/latest"
-
-def enrich_spots(csv_path: str, output_path: str):
-    df = pd.read_csv(csv_path)
-    df = remove_duplicates(df)
-
-    swell_dirs = []
-    wind_dirs = []
-    swell_ranges = []
-    facing_dirs = []
-    forecast_urls = []
-    swell_mins = []
-
-    for _, row in df.iterrows():
-        desc = row.get("Best surf description", "")
-        name = row.get("Spot Name", "")
-
-        swell_dir = extract_best_swell_direction(desc)
-        wind_dir = extract_best_wind_direction(desc)
-        swell_deg = direction_to_deg(swell_dir)
-        wind_deg = direction_to_deg(wind_dir)
-
-        swell_dirs.append(swell_dir)
-        wind_dirs.append(wind_dir)
-        swell_ranges.append(compute_swell_dir_range(swell_deg))
-        facing_dirs.append(compute_facing_deg(wind_deg))
-        forecast_urls.append(generate_forecast_url(name))
-        swell_mins.append(1.0)  # Default for now
-
-    df["Best swell direction"] = swell_dirs
-    df["Best wind direction"] = wind_dirs
-    df["Swell dir range"] = swell_ranges
-    df["Facing direction deg"] = facing_dirs
-    df["Swell min m"] = swell_mins
-    df["Surf forecast URL"] = forecast_urls
-
-    df.to_csv(output_path, index=False)
-    print(f"[DONE] Enriched data saved to {output_path}")
 
 if __name__ == "__main__":
-    enrich_spots("./app/indonesia_surf_spots.csv", "./enriched_indonesia_surf_spots.csv")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv_path", nargs="?", default="./app/indonesia_surf_spots.csv")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--csv-out", help="Also write the enriched rows to this CSV")
+    parser.add_argument("--dry-run", action="store_true", help="Enrich only; don't touch the database")
+    args = parser.parse_args()
+    asyncio.run(import_spots(args.csv_path, args.chunk_rows, args.csv_out, args.dry_run))
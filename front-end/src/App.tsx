@@ -132,7 +132,7 @@ export default function App(){
   useEffect(()=>{
     if(!location) return;
     setLoading(true);setError(null);
-    fetch(`${API_BASE}/api/spots/forecasted?lat=${location.lat}&lon=${location.lon}&max_distance_km=500`)
+    fetch(`${API_BASE}/api/spots/forecasted?lat=${location.lat}&lon=${location.lon}&max_distance_km=500&explain=true`)
       .then(r=>r.ok?r.json() as Promise<Spot[]>:Promise.reject(r.statusText))
       .then(data=>{
         const aug=data.map(s=>({
@@ -0,0 +1,304 @@
+# load_test.py
+"""
+Replays a realistic traffic mix against the API and reports per-endpoint
+latency (p50/p95/p99), throughput and error rate, checked against latency SLOs
+and, optionally, a stored baseline run.
+
+The mix (weights are relative):
+  forecasted      radius searches around real spot coordinates
+  spot_forecasts  per-spot hourly forecast fetches
+  spot            spot detail lookups
+  alerts          alert creation (POST /api/alerts)
+
+Meant for a local Postgres + PostGIS seeded with seed_synthetic_data.py:
+
+    python load_test.py --start-app --concurrency 50 --duration 60 --save-baseline loadtest_baseline.json
+    python load_test.py --start-app --concurrency 50 --duration 60 --baseline loadtest_baseline.json
+
+Exits with status 1 when an SLO is missed or a metric regressed past --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import asyncpg
+import httpx
+import numpy as np
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+
+DEFAULT_MIX = "forecasted=45,spot_forecasts=35,spot=15,alerts=5"
+RADII_KM = (10, 25, 50, 100, 200)
+QUALITY_LEVELS = ("Good", "Okay", "Poor")
+# p95 latency targets (ms); every endpoint must also stay under SLO_ERROR_RATE
+SLO_P95_MS = {"forecasted": 500, "spot_forecasts": 250, "spot": 150, "alerts": 300}
+SLO_ERROR_RATE = 0.01
+READY_TIMEOUT_SEC = 60
+
+
+class Traffic:
+    """Builds requests for each scenario from the spots actually in the database."""
+
+    def __init__(self, spots: List[asyncpg.Record], rng: random.Random):
+        self.spots = spots
+        self.rng = rng
+        self.alert_count = 0
+
+    def forecasted(self):
+        spot = self.rng.choice(self.spots)
+        # Users search from roughly where they are, i.e. near a coast, not exactly on a spot
+        lat = spot["lat"] + self.rng.uniform(-0.2, 0.2)
+        lon = spot["lon"] + self.rng.uniform(-0.2, 0.2)
+        params = {"lat": round(lat, 4), "lon": round(lon, 4), "max_distance_km": self.rng.choice(RADII_KM)}
+        return "GET", "/api/spots/forecasted", params, None
+
+    def spot_forecasts(self):
+        spot = self.rng.choice(self.spots)
+        return "GET", f"/api/spots/{spot['id']}/forecasts", {"days": self.rng.choice((1, 3, 5))}, None
+
+    def spot(self):
+        return "GET", f"/api/spots/{self.rng.choice(self.spots)['id']}", None, None
+
+    def alerts(self):
+        self.alert_count += 1
+        spot = self.rng.choice(self.spots)
+        body = {
+            "email": f"loadtest+{self.alert_count}@example.com",
+            "town": spot["town"] or spot["name"],
+            "lat": spot["lat"],
+            "lon": spot["lon"],
+            "radius_km": self.rng.choice(RADII_KM),
+            "quality_levels": self.rng.sample(QUALITY_LEVELS, self.rng.randint(1, 2)),
+            "region": spot["region"] or "",
+            "country": "Load Test",
+        }
+        return "POST", "/api/alerts", None, body
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SLO_P95_MS:
+            raise SystemExit(f"Unknown scenario '{name.strip()}' (choose from {', '.join(SLO_P95_MS)})")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def load_spots(limit: int) -> List[asyncpg.Record]:
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        return await conn.fetch(
+            "SELECT id, name, lat, lon, town, region FROM surf_spots ORDER BY random() LIMIT $1", limit,
+        )
+    finally:
+        await conn.close()
+
+
+async def worker(client: httpx.AsyncClient, traffic: Traffic, weights: Dict[str, float],
+                 warmup_until: float, deadline: float, results: Dict[str, list]):
+    names, shares = list(weights), list(weights.values())
+    while time.perf_counter() < deadline:
+        name = traffic.rng.choices(names, shares)[0]
+        method, path, params, body = getattr(traffic, name)()
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, params=params, json=body)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        if start >= warmup_until:
+            results[name].append((elapsed, status))
+
+
+def summarise(results: Dict[str, list], duration: float) -> Dict[str, dict]:
+    report = {}
+    for name, samples in sorted(results.items()):
+        latencies = np.array([s[0] for s in samples]) * 1000
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[str(status)] += 1
+        errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+        report[name] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / duration, 1),
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1),
+            "max_ms": round(float(latencies.max()), 1) if len(latencies) else 0.0,
+            "statuses": dict(statuses),
+        }
+    return report
+
+
+def check_slos(report: Dict[str, dict]) -> List[str]:
+    misses = []
+    for name, r in report.items():
+        if r["p95_ms"] > SLO_P95_MS[name]:
+            misses.append(f"{name}: p95 {r['p95_ms']}ms > SLO {SLO_P95_MS[name]}ms")
+        if r["error_rate"] > SLO_ERROR_RATE:
+            misses.append(f"{name}: error rate {r['error_rate']:.2%} > SLO {SLO_ERROR_RATE:.0%}")
+    return misses
+
+
+def compare(report: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Regressions vs baseline: latency up or throughput down by more than `tolerance`, or new errors."""
+    regressions = []
+    print(f"\n{'vs baseline':<16} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>9} {'errors':>9}")
+    for name, r in report.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<16} (not in baseline)")
+            continue
+
+        def delta(key):
+            return (r[key] - base[key]) / base[key] if base[key] else 0.0
+
+        print(f"{name:<16} {delta('p50_ms'):>+9.1%} {delta('p95_ms'):>+9.1%} {delta('p99_ms'):>+9.1%} "
+              f"{delta('throughput_rps'):>+9.1%} {r['error_rate'] - base['error_rate']:>+9.2%}")
+        for key in ("p95_ms", "p99_ms"):
+            if delta(key) > tolerance:
+                regressions.append(f"{name}: {key} {base[key]} -> {r[key]} ({delta(key):+.1%})")
+        if delta("throughput_rps") < -tolerance:
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {r['throughput_rps']} rps")
+        if r["error_rate"] - base["error_rate"] > SLO_ERROR_RATE:
+            regressions.append(f"{name}: error rate {base['error_rate']:.2%} -> {r['error_rate']:.2%}")
+    return regressions
+
+
+def print_report(report: Dict[str, dict]):
+    print(f"\n{'endpoint':<16} {'requests':>9} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'errors':>8}")
+    for name, r in report.items():
+        print(f"{name:<16} {r['requests']:>9} {r['throughput_rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['max_ms']:>8} {r['error_rate']:>8.2%}")
+        other = {s: n for s, n in r["statuses"].items() if not s.startswith("2")}
+        if other:
+            print(f"{'':<16} non-2xx: {other}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_ready(base_url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + READY_TIMEOUT_SEC
+    async with httpx.AsyncClient(base_url=base_url, timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"API exited during startup (status {process.returncode})")
+            try:
+                if (await client.get("/api/stats/coalescing")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise SystemExit(f"API not ready after {READY_TIMEOUT_SEC}s")
+
+
+async def main(args) -> int:
+    weights = parse_mix(args.mix)
+    spots = await load_spots(args.spots)
+    if not spots:
+        raise SystemExit("No spots in surf_spots; run seed_synthetic_data.py first")
+    traffic = Traffic(spots, random.Random(args.seed))
+
+    process = None
+    if args.start_app:
+        process = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ])
+        await wait_ready(args.base_url, process)
+
+    try:
+        results: Dict[str, list] = defaultdict(list)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+            print(f"[LOAD] {args.concurrency} clients for {args.duration}s (+{args.warmup}s warmup) "
+                  f"against {args.base_url}, {len(spots)} spots, mix {weights}")
+            start = time.perf_counter()
+            warmup_until = start + args.warmup
+            deadline = warmup_until + args.duration
+            await asyncio.gather(*(
+                worker(client, traffic, weights, warmup_until, deadline, results) for _ in range(args.concurrency)
+            ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = summarise(results, args.duration)
+    print_report(report)
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "concurrency": args.concurrency,
+        "duration_sec": args.duration,
+        "mix": weights,
+        "spots": len(spots),
+        "endpoints": report,
+    }
+
+    failures = check_slos(report)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline.get("concurrency"), baseline.get("mix")) != (args.concurrency, weights):
+            print(f"[WARNING] Baseline was recorded with concurrency {baseline.get('concurrency')} "
+                  f"and mix {baseline.get('mix')}; deltas are not like-for-like")
+        failures += compare(report, baseline["endpoints"], args.tolerance)
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"[LOAD] Report written to {path}")
+
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    if not failures:
+        print("[LOAD] All SLOs met" + (" and no regressions vs baseline" if args.baseline else ""))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="Defaults to http://127.0.0.1:<port>")
+    parser.add_argument("--start-app", action="store_true", help="Start uvicorn app.main:app for the run")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --start-app")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients (closed loop)")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unrecorded seconds before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. 'forecasted=3,spot=1'")
+    parser.add_argument("--spots", type=int, default=5000, help="Spots sampled from the database as targets")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Compare against this stored report")
+    parser.add_argument("--save-baseline", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args()
+    args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,56 @@
+# load_test_coalescing.py
+"""
+Fires bursts of identical concurrent requests at one spot and reports how many
+DB queries the API actually ran (from /api/stats/coalescing) at each level.
+With coalescing working, queries per burst stay at ~1 whatever the concurrency.
+
+Run the API with SERVE_FROM_SNAPSHOT=0 so reads go to the database:
+
+    python load_test_coalescing.py --spot-id <uuid> --levels 1 10 50 200
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def stats(client: httpx.AsyncClient, name: str) -> dict:
+    response = await client.get("/api/stats/coalescing")
+    response.raise_for_status()
+    return response.json().get(name, {"requests": 0, "fetches": 0})
+
+
+async def burst(client: httpx.AsyncClient, path: str, concurrency: int):
+    responses = await asyncio.gather(*(client.get(path) for _ in range(concurrency)), return_exceptions=True)
+    return sum(1 for r in responses if isinstance(r, Exception) or r.status_code >= 500)
+
+
+async def main(args):
+    path = f"/api/spots/{args.spot_id}/forecasts?days={args.days}"
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0, limits=limits) as client:
+        print(f"{'concurrency':>11} {'requests':>9} {'db queries':>10} {'queries/burst':>13} {'errors':>6} {'req/s':>8}")
+        for level in args.levels:
+            before = await stats(client, "spot_forecasts")
+            errors = 0
+            start = time.perf_counter()
+            for _ in range(args.bursts):
+                errors += await burst(client, path, level)
+            elapsed = time.perf_counter() - start
+            after = await stats(client, "spot_forecasts")
+
+            requests = after["requests"] - before["requests"]
+            queries = after["fetches"] - before["fetches"]
+            print(f"{level:>11} {requests:>9} {queries:>10} {queries / args.bursts:>13.2f} {errors:>6} "
+                  f"{level * args.bursts / elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spot-id", required=True)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--bursts", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,138 @@
+# seed_synthetic_data.py
+"""
+Seeds a local Postgres + PostGIS with synthetic surf spots and forecasts for
+load testing. Spots are scattered along real surf coastlines; their forecasts
+are random but evaluated with the production heuristics, so the rating mix and
+row layout match what the cron writes in the default "hourly" storage mode: one
+surf_forecast_hourly row per RELEVANT_HOURS hour. --all-hours stores all 24
+hours instead, e.g. to load-test a denser table.
+
+    psql "$SUPABASE_DB_URL" -f sql/local_schema.sql
+    for f in sql/*.sql; do psql "$SUPABASE_DB_URL" -f "$f"; done
+    SUPABASE_DB_URL=postgresql://localhost/surf python seed_synthetic_data.py --spots 2000 --days 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+import pytz
+
+from app.heuristics import evaluate_surf_quality
+from app.models import MarineForecast
+from app.registry import SPOT_COLUMNS, SpotRecord
+from app.storage import HOURLY_COLUMNS, RELEVANT_HOURS, build_hourly_records
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("[WARNING] variable not loaded from .env, environment variables will only load from prod environment")
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL")
+
+# (lat, lon, facing_direction, timezone, region) anchors on real coastlines
+COASTLINES = [
+    (38.97, -9.42, 280, "Europe/Lisbon", "Ericeira"),
+    (39.60, -9.07, 290, "Europe/Lisbon", "Peniche"),
+    (43.48, -1.56, 290, "Europe/Paris", "Basque Coast"),
+    (43.66, -1.44, 270, "Europe/Paris", "Landes"),
+    (50.41, -5.09, 300, "Europe/London", "Cornwall"),
+    (43.46, -3.80, 0, "Europe/Madrid", "Cantabria"),
+    (30.54, -9.71, 270, "Africa/Casablanca", "Taghazout"),
+    (-34.05, 18.35, 250, "Africa/Johannesburg", "Cape Peninsula"),
+    (-8.81, 115.09, 200, "Asia/Makassar", "Bukit"),
+    (-28.00, 153.43, 90, "Australia/Brisbane", "Gold Coast"),
+    (-33.89, 151.28, 100, "Australia/Sydney", "Northern Beaches"),
+    (21.66, -158.06, 320, "Pacific/Honolulu", "North Shore"),
+    (36.95, -122.03, 190, "America/Los_Angeles", "Santa Cruz"),
+    (33.38, -117.59, 240, "America/Los_Angeles", "San Clemente"),
+    (-38.37, 144.28, 160, "Australia/Melbourne", "Surf Coast"),
+    (9.60, -85.13, 240, "America/Costa_Rica", "Nicoya"),
+]
+
+
+def synthetic_spot(i: int) -> dict:
+    lat, lon, facing, tz, region = random.choice(COASTLINES)
+    spot = dict.fromkeys(SPOT_COLUMNS)
+    spot.update(
+        id=uuid.uuid4(),
+        name=f"{region} #{i}",
+        lat=lat + random.uniform(-0.4, 0.4),
+        lon=lon + random.uniform(-0.4, 0.4),
+        facing_direction=(facing + random.uniform(-30, 30)) % 360,
+        swell_min_m=random.choice([None, 0.6, 0.8, 1.0]),
+        swell_dir_min=(facing - 70) % 360 if facing >= 70 else 0,
+        swell_dir_max=min(facing + 70, 360),
+        preferred_wind_wave_max_m=random.choice([None, 0.8, 1.2]),
+        town=region,
+        region=region,
+        timezone=tz,
+    )
+    return spot
+
+
+def synthetic_forecasts(spot, days: int, hours=RELEVANT_HOURS):
+    tz = pytz.timezone(spot.timezone)
+    start = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    swell, period = random.uniform(0.5, 2.5), random.uniform(7, 15)
+    evaluated = []
+    for h in range(days * 24):
+        # Smooth random walks look more like real series than independent draws
+        swell = min(max(swell + random.gauss(0, 0.08), 0.1), 5)
+        period = min(max(period + random.gauss(0, 0.25), 4), 20)
+        f = MarineForecast(
+            time=(start + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M"),
+            swell_wave_height=round(swell, 2),
+            swell_wave_direction=round((spot.facing_direction + random.gauss(0, 40)) % 360, 1),
+            swell_wave_peak_period=round(period, 1),
+            wind_wave_height_m=round(random.uniform(0, 1.2), 2),
+            wind_speed_kmh=round(random.uniform(0, 30), 1),
+            wind_direction_deg=round(random.uniform(0, 360), 1),
+        )
+        evaluated.append((f, evaluate_surf_quality(spot, f)))
+    return build_hourly_records(spot.id, tz, evaluated, hours=hours)
+
+
+async def main(args):
+    random.seed(args.seed)
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        if args.reset:
+            await conn.execute("TRUNCATE surf_forecast_hourly, surf_spots CASCADE")
+
+        spots = [synthetic_spot(i) for i in range(args.spots)]
+        spot_columns = list(SPOT_COLUMNS)
+        await conn.copy_records_to_table(
+            "surf_spots", records=[tuple(s[c] for c in spot_columns) for s in spots], columns=spot_columns,
+        )
+        await conn.execute("UPDATE surf_spots SET geom = ST_SetSRID(ST_MakePoint(lon, lat), 4326) WHERE geom IS NULL")
+        print(f"[SEED] {len(spots)} spots")
+
+        hours = range(24) if args.all_hours else RELEVANT_HOURS
+        rows = 0
+        for spot in spots:
+            records = synthetic_forecasts(SpotRecord(spot), args.days, hours)
+            await conn.copy_records_to_table(
+                "surf_forecast_hourly",
+                records=[tuple(r[c] for c in HOURLY_COLUMNS) for r in records],
+                columns=list(HOURLY_COLUMNS),
+            )
+            rows += len(records)
+        await conn.execute("ANALYZE surf_spots; ANALYZE surf_forecast_hourly")
+        print(f"[SEED] {rows} forecast rows ({args.days} days x {len(hours)} hours per spot)")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spots", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--all-hours", action="store_true", help="Store all 24 hours, not just RELEVANT_HOURS")
+    parser.add_argument("--reset", action="store_true", help="Truncate spots and forecasts first")
+    asyncio.run(main(parser.parse_args()))
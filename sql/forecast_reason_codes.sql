@@ -0,0 +1,14 @@
+-- Rating reason codes (REASON_* in app/heuristics.py) replace the stored
+-- explanation text; the API renders the text from the code and metrics on read.
+-- New rows leave `explanation` NULL; rows written before this migration keep
+-- their text and are served as-is until they age out.
+ALTER TABLE surf_forecast_hourly ADD COLUMN IF NOT EXISTS reason_code smallint;
+-- surf_forecast_daily only exists with packed storage, and sql/surf_forecast_daily.sql
+-- (which sorts after this file) creates it with reason_code already
+DO $$
+BEGIN
+    IF to_regclass('surf_forecast_daily') IS NOT NULL THEN
+        ALTER TABLE surf_forecast_daily ADD COLUMN IF NOT EXISTS reason_code smallint[];
+    END IF;
+END
+$$;
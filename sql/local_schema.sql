@@ -0,0 +1,67 @@
+-- Base tables for a local Postgres + PostGIS used by seed_synthetic_data.py and
+-- load_test.py. Mirrors the columns the app reads and writes; production keeps
+-- its own (Supabase-managed) definitions. Apply this file first, then the other
+-- files in sql/ in alphabetical order (they only depend on the tables created
+-- here); sql/surf_forecast_daily.sql is only needed with FORECAST_STORAGE_MODE=packed.
+CREATE EXTENSION IF NOT EXISTS postgis;
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+CREATE TABLE IF NOT EXISTS surf_spots (
+    id                        uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    name                      text NOT NULL,
+    lat                       double precision NOT NULL,
+    lon                       double precision NOT NULL,
+    facing_direction          real,
+    swell_min_m               real,
+    swell_dir_min             real,
+    swell_dir_max             real,
+    preferred_wind_wave_max_m real,
+    best_swell_dir_label      text,
+    best_wind_dir_label       text,
+    post_code                 text,
+    town                      text,
+    region                    text,
+    surf_benchmark_url        text,
+    geom                      geography(Point, 4326),
+    image_url                 text,
+    image_credit              text,
+    image_credit_url          text,
+    image_source_url          text,
+    timezone                  text
+);
+CREATE INDEX IF NOT EXISTS surf_spots_geom_idx ON surf_spots USING gist (geom);
+
+CREATE TABLE IF NOT EXISTS surf_forecast_hourly (
+    id                     bigserial PRIMARY KEY,
+    spot_id                uuid NOT NULL REFERENCES surf_spots (id) ON DELETE CASCADE,
+    timestamp_local        timestamp NOT NULL,
+    timestamp_utc          timestamp NOT NULL,
+    date_local             date NOT NULL,
+    swell_wave_height      real,
+    swell_wave_direction   real,
+    swell_wave_peak_period real,
+    wind_speed_kmh         real,
+    wind_direction_deg     real,
+    wind_wave_height_m     real,
+    wind_type              text,
+    wind_severity          text,
+    surf_rating            text,
+    reason_code            smallint,
+    explanation            text,
+    UNIQUE (spot_id, timestamp_local)
+);
+CREATE INDEX IF NOT EXISTS surf_forecast_hourly_utc_idx ON surf_forecast_hourly (spot_id, timestamp_utc);
+
+CREATE TABLE IF NOT EXISTS surf_alerts (
+    id             bigserial PRIMARY KEY,
+    alert_uuid     uuid NOT NULL DEFAULT gen_random_uuid() UNIQUE,
+    email          text NOT NULL,
+    location_name  text,
+    lat            double precision NOT NULL,
+    lon            double precision NOT NULL,
+    radius_km      real NOT NULL,
+    quality_levels text[] NOT NULL,
+    region         text,
+    country        text,
+    created_at     timestamptz NOT NULL DEFAULT now()
+);
@@ -0,0 +1,15 @@
+-- Upstream (Open-Meteo) coverage per spot, written by check_forecast_availability.py
+-- and read by crons/forecast_cron.py to skip or defer spots (app/coverage.py).
+CREATE TABLE IF NOT EXISTS spot_upstream_coverage (
+    spot_id              uuid PRIMARY KEY REFERENCES surf_spots (id) ON DELETE CASCADE,
+    checked_at           timestamptz NOT NULL DEFAULT now(),
+    status               text NOT NULL CHECK (status IN ('ok', 'degraded', 'unusable', 'unreachable')),
+    marine_ok            boolean NOT NULL,
+    weather_ok           boolean NOT NULL,
+    hours                integer NOT NULL DEFAULT 0,
+    usable_ratio         real,
+    missing_vars         text[] NOT NULL DEFAULT '{}',
+    null_ratios          jsonb NOT NULL DEFAULT '{}',
+    consecutive_unusable integer NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS spot_upstream_coverage_status_idx ON spot_upstream_coverage (status);
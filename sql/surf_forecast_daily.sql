@@ -0,0 +1,22 @@
+-- Packed storage for hourly forecasts: one row per spot per local day,
+-- with the hourly values held in parallel typed arrays indexed like `hours`.
+-- Enum columns hold the codes defined in app/storage.py (-1 = unknown/null).
+CREATE TABLE IF NOT EXISTS surf_forecast_daily (
+    spot_id                uuid        NOT NULL REFERENCES surf_spots (id) ON DELETE CASCADE,
+    date_local             date        NOT NULL,
+    hours                  smallint[]  NOT NULL,
+    swell_wave_height      real[]      NOT NULL,
+    swell_wave_direction   real[]      NOT NULL,
+    swell_wave_peak_period real[]      NOT NULL,
+    wind_speed_kmh         real[]      NOT NULL,
+    wind_direction_deg     real[]      NOT NULL,
+    wind_wave_height_m     real[]      NOT NULL,
+    surf_rating            smallint[]  NOT NULL,
+    wind_type              smallint[]  NOT NULL,
+    wind_severity          smallint[]  NOT NULL,
+    reason_code            smallint[],
+    updated_at             timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (spot_id, date_local)
+);
+-- Explanations are rendered from reason_code on read (sql/forecast_reason_codes.sql)
+ALTER TABLE surf_forecast_daily DROP COLUMN IF EXISTS explanation;
@@ -0,0 +1,26 @@
+-- Top spots per region and local day, rebuilt from surf_session_windows by the
+-- forecast cron after each run (app/rollups.py) and served by /api/regions/{region}/best.
+-- region_key is the lower-cased, trimmed surf_spots.region.
+CREATE TABLE IF NOT EXISTS surf_region_daily_best (
+    region_key             text        NOT NULL,
+    region                 text        NOT NULL,
+    date_local             date        NOT NULL,
+    rank                   smallint    NOT NULL,
+    spot_id                uuid        NOT NULL REFERENCES surf_spots (id) ON DELETE CASCADE,
+    spot_name              text        NOT NULL,
+    town                   text,
+    lat                    double precision,
+    lon                    double precision,
+    timezone               text,
+    best_time              time        NOT NULL,
+    rating                 text        NOT NULL,
+    swell_wave_height      real,
+    swell_wave_peak_period real,
+    swell_wave_direction   real,
+    wind_wave_height_m     real,
+    wind_speed_kmh         real,
+    wind_type              text,
+    wind_severity          text,
+    reason_code            smallint,
+    PRIMARY KEY (region_key, date_local, rank)
+);
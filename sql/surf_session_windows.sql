@@ -0,0 +1,22 @@
+-- Runs of consecutive surfable hours per spot (app/sessions.py), maintained by
+-- the forecast cron and served by /api/spots/{spot_id}/windows.
+-- Times are the spot's local wall-clock time; end_local is exclusive.
+CREATE TABLE IF NOT EXISTS surf_session_windows (
+    spot_id                     uuid        NOT NULL REFERENCES surf_spots (id) ON DELETE CASCADE,
+    date_local                  date        NOT NULL,
+    start_local                 timestamp   NOT NULL,
+    end_local                   timestamp   NOT NULL,
+    hours                       smallint    NOT NULL,
+    peak_rating                 text        NOT NULL,
+    peak_time                   timestamp   NOT NULL,
+    peak_swell_wave_height      real,
+    peak_swell_wave_peak_period real,
+    peak_swell_wave_direction   real,
+    peak_wind_wave_height_m     real,
+    peak_wind_speed_kmh         real,
+    peak_wind_type              text,
+    peak_wind_severity          text,
+    peak_reason_code            smallint,
+    PRIMARY KEY (spot_id, start_local)
+);
+CREATE INDEX IF NOT EXISTS surf_session_windows_end_idx ON surf_session_windows (spot_id, end_local);
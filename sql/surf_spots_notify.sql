@@ -0,0 +1,21 @@
+-- Publishes every change to surf_spots as a `spot_changed` event on the
+-- invalidation bus channel (app/events.py), so in-process spot registries
+-- (app/registry.py) can refresh just the spots that changed.
+CREATE OR REPLACE FUNCTION notify_surf_spot_change() RETURNS trigger AS $$
+DECLARE
+    changed_id uuid;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD.id;
+    ELSE
+        changed_id := NEW.id;
+    END IF;
+    PERFORM pg_notify('surfcast_events', json_build_object('event', 'spot_changed', 'op', TG_OP, 'id', changed_id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS surf_spots_notify ON surf_spots;
+CREATE TRIGGER surf_spots_notify
+    AFTER INSERT OR UPDATE OR DELETE ON surf_spots
+    FOR EACH ROW EXECUTE FUNCTION notify_surf_spot_change();